@@ -38,6 +38,13 @@ class PyOBD2:
 
         return responses[0].values[0].value
 
+    def doRequests(self, sid=None, pids=[]):
+
+        if not self.interface:
+            self.startInterface()
+
+        return self.interface.request_values(sid, pids)
+
 
     def resetInterface(self):
 
@@ -103,25 +110,29 @@ class PyOBD2:
         mpg_total = None
 
         try:
-            resp = self.doRequest(sid=0x01, pid=0x04)
+            values = self.doRequests(
+                sid=0x01, pids=[0x04, 0x05, 0x0c, 0x10, 0x0d, 0x42]
+            )
+
+            resp = values[0x04]
             return_responses['calc_engine_load_pct'] = resp 
 
-            resp = self.doRequest(sid=0x01, pid=0x05)
+            resp = values[0x05]
             return_responses['engine_coolant_temp_degC'] = resp
             return_responses['engine_coolant_temp_degF'] = (
                 (resp * 1.8) + 32.0
             )
 
-            resp = self.doRequest(sid=0x01, pid=0x0c)
+            resp = values[0x0c]
             return_responses['engine_rpm'] = resp
 
-            resp = self.doRequest(sid=0x01, pid=0x10)
+            resp = values[0x10]
             return_responses['maf_air_flow_rate_gps'] = resp
             return_responses['engine_consumption_gph'] = (
                 resp * 0.0805
             )
 
-            resp = self.doRequest(sid=0x01, pid=0x0d)
+            resp = values[0x0d]
             return_responses['velocity_kph'] = resp
 
             return_responses['instant_mpg'] = (
@@ -153,7 +164,7 @@ class PyOBD2:
             )
             return_responses['average_mpg'] = self.average_mpg
 
-            resp = self.doRequest(sid=0x01, pid=0x42)
+            resp = values[0x42]
             return_responses['control_module_voltage'] = resp
 
             return return_responses
@@ -182,6 +193,8 @@ class PyOBD2:
             print(ve)
         except IndexError as ie:
             print(ie)
+        except KeyError as ke:
+            print("No response for PID %r" % ke.args[0])
         except AttributeError as ae:
             print(ae)
             self.resetInterface()
@@ -65,34 +65,21 @@ def displayOBDGauges():
 	while True:
 	
 		try:
-			request = obd.message.OBDRequest(sid=0x01, pid=0x05)
+			values = interface.request_values(0x01, [0x05, 0x0c, 0x10, 0x0d, 0x42])
 	
-			responses = interface.send_request(request)
-			stdscreen.addstr(0, 0, str((responses[0].values[0].value * 1.8) + 32.0).rjust(9, ' ') + ' deg F')
+			stdscreen.addstr(0, 0, str((values[0x05] * 1.8) + 32.0).rjust(9, ' ') + ' deg F')
+			stdscreen.addstr(1, 0, str(int(round(values[0x0c]))).rjust(7, ' ') + ' rpm')
+			stdscreen.addstr(2, 0, str(round((values[0x10] * 0.0805), 3)).ljust(5, '0').rjust(11, ' ') + ' gph')
 	
-			request = obd.message.OBDRequest(sid=0x01, pid=0x0c)
-			responses = interface.send_request(request)
-			stdscreen.addstr(1, 0, str(int(round(responses[0].values[0].value))).rjust(7, ' ') + ' rpm')
-	
-			request = obd.message.OBDRequest(sid=0x01, pid=0x10)
-			responses = interface.send_request(request)
-			stdscreen.addstr(2, 0, str(round((responses[0].values[0].value * 0.0805), 3)).ljust(5, '0').rjust(11, ' ') + ' gph')
-	
-			request = obd.message.OBDRequest(sid=0x01, pid=0x0d)
-			responses = interface.send_request(request)
-			velocity_kph = responses[0].values[0].value
-			request = obd.message.OBDRequest(sid=0x01, pid=0x10)
-			responses = interface.send_request(request)
-			mass_af_gps = responses[0].values[0].value
+			velocity_kph = values[0x0d]
+			mass_af_gps = values[0x10]
 			instant_mpg = velocity_kph * 7.718 / mass_af_gps
 			mpg_total = (average_mpg * mpg_counter) + instant_mpg
 			mpg_counter += 1
 			average_mpg = mpg_total / mpg_counter
 			stdscreen.addstr(3, 0, str(round(average_mpg, 3)).ljust(5, '0').rjust(11, ' ') + ' mpgc')
 	
-			request = obd.message.OBDRequest(sid=0x01, pid=0x42)
-			responses = interface.send_request(request)
-			stdscreen.addstr(4, 0, str(round(responses[0].values[0].value, 3)).ljust(6, '0').rjust(11,' ') + ' V')
+			stdscreen.addstr(4, 0, str(round(values[0x42], 3)).ljust(6, '0').rjust(11,' ') + ' V')
 
 			stdscreen.addstr(5, 0, str(round(velocity_kph * 0.621371)).ljust(4, '0').rjust(10, ' ') + ' MPH')
 
@@ -116,6 +103,10 @@ def displayOBDGauges():
 			pass
 		except ValueError as ve:
 			pass
+		except KeyError as ke:
+			stdscreen.addstr(6, 0, "No response for PID %r" % ke.args[0])
+			stdscreen.clrtoeol()
+			stdscreen.refresh()
 		except AttributeError as ae:
 			if interface:
 				interface.close()
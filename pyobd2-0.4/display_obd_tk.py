@@ -176,34 +176,21 @@ class Application(tk.Frame):
                 while True:
 
                         try:
-                                request = obd.message.OBDRequest(sid=0x01, pid=0x05)
+                                values = self.interface.request_values(0x01, [0x05, 0x0c, 0x10, 0x0d, 0x42])
 
-                                responses = self.interface.send_request(request)
-                                self.oneLabelVar.set(str((responses[0].values[0].value * 1.8) + 32.0).ljust(5, '0')[:5] + '\ndeg F')
+                                self.oneLabelVar.set(str((values[0x05] * 1.8) + 32.0).ljust(5, '0')[:5] + '\ndeg F')
+                                self.twoLabelVar.set(str(int(values[0x0c])) + '\nRPM')
+                                self.threeLabelVar.set(str(values[0x10] * 0.0805).ljust(5, '0')[:5] + '\nGPH')
 
-                                request = obd.message.OBDRequest(sid=0x01, pid=0x0c)
-                                responses = self.interface.send_request(request)
-                                self.twoLabelVar.set(str(int(responses[0].values[0].value)) + '\nRPM')
-
-                                request = obd.message.OBDRequest(sid=0x01, pid=0x10)
-                                responses = self.interface.send_request(request)
-                                self.threeLabelVar.set(str(responses[0].values[0].value * 0.0805).ljust(5, '0')[:5] + '\nGPH')
-
-                                request = obd.message.OBDRequest(sid=0x01, pid=0x0d)
-                                responses = self.interface.send_request(request)
-                                velocity_kph = responses[0].values[0].value
-                                request = obd.message.OBDRequest(sid=0x01, pid=0x10)
-                                responses = self.interface.send_request(request)
-                                mass_af_gps = responses[0].values[0].value
+                                velocity_kph = values[0x0d]
+                                mass_af_gps = values[0x10]
                                 instant_mpg = velocity_kph * 7.718 / mass_af_gps
                                 mpg_total = (self.average_mpg * self.mpg_counter) + instant_mpg
                                 self.mpg_counter += 1
                                 self.average_mpg = mpg_total / self.mpg_counter
                                 self.fourLabelVar.set(str(self.average_mpg).ljust(6, '0')[:6] + '\nMPGc')
 
-                                request = obd.message.OBDRequest(sid=0x01, pid=0x42)
-                                responses = self.interface.send_request(request)
-                                self.fiveLabelVar.set(str(responses[0].values[0].value).ljust(5, '0')[:5] + '\nV')
+                                self.fiveLabelVar.set(str(values[0x42]).ljust(5, '0')[:5] + '\nV')
 
                                 self.sixLabelVar.set(str(velocity_kph * 0.621371).ljust(5, '0')[:5] + '\nMPH')
                                 
@@ -226,6 +213,8 @@ class Application(tk.Frame):
                         except ValueError as ve:
                                 print(ve)
                                 self.interface._flush_frames()
+                        except KeyError as ke:
+                                print("No response for PID %r" % ke.args[0])
             except IndexError as ie:
                 print(ie)
                 self.interface._flush_frames()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Serial port support for Interfaces driven by an asyncio event loop.
+
+AsyncSerialPort mirrors obd.serialport.SerialPort, except that
+read_until_string() is a coroutine that yields to the event loop while
+waiting for data, which is delivered by the loop's file descriptor
+reader rather than a blocking read.  This lets a single thread drive
+any number of ports.
+
+This tree targets Python 2, so the coroutines are written for trollius
+(the Python 2 port of asyncio), e.g.:
+
+    response = yield From(port.read_until_string(">"))
+"""
+
+import sys
+try:
+    import trollius as asyncio
+    from trollius import From, Return
+except ImportError:
+    sys.stderr.write("trollius is needed for asyncio support (pip install trollius)\n")
+    raise
+try:
+    import serial as pyserial
+except ImportError:
+    sys.stderr.write("pyserial is needed")
+    sys.exit()
+
+import obd.exception as exception
+from obd.serialport import SerialPort, SerialPortPlayback
+
+
+class AsyncSerialPort(object):
+    """An asynchronous counterpart to SerialPort.  See SerialPort for
+    the details of each method; the only difference is that
+    read_until_string() is a coroutine.
+    """
+    def __init__(self, port, loop=None):
+        """port -- the serial port name or ID needed for pyserial
+            to open the port; e.g., /dev/cu.1234, COM1, etc.
+        loop -- the event loop on which to wait for data, or None
+            (the default) for the current event loop
+        """
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self.loop = loop
+        self._rx_buffer = bytearray()
+        self._rx_waiter = None
+        self._last_rx_time = 0
+        self.interval = 2
+        self.timeout = loop.time()
+        # a zero timeout makes reads return immediately with whatever's arrived
+        self.port = pyserial.Serial(port,
+                                    baudrate=38400,
+                                    parity=pyserial.PARITY_NONE,
+                                    stopbits=1,
+                                    bytesize=8,
+                                    timeout=0)
+        self.name = port
+        loop.add_reader(self.port.fileno(), self._data_received)
+        return
+
+    def close(self):
+        """Stop waiting for data and close the port"""
+        self.loop.remove_reader(self.port.fileno())
+        self.port.close()
+        return
+
+    def _data_received(self):
+        """Called by the event loop when the port has data to read"""
+        try:
+            data = self.port.read(max(1, self.port.inWaiting()))
+        except Exception as e:
+            self.loop.remove_reader(self.port.fileno())
+            self._wake_reader(e)
+            return
+        # FIXME: move 0x00 test to ELM327
+        if '\x00' in data:
+            data = data.replace('\x00', '')  # per note on p.6 of ELM327 data sheet
+        self._rx_buffer.extend(data)
+        self._last_rx_time = self.loop.time()
+        self._wake_reader()
+        return
+
+    def _wake_reader(self, error=None):
+        """Resume any read_until_string() waiting for data"""
+        waiter = self._rx_waiter
+        if waiter is not None and not waiter.done():
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(None)
+        return
+
+    def write(self, str):
+        """Write the given string to the port"""
+        self.port.flushOutput()
+        self._clear_rx_buffer()
+        self.port.write(str)
+        return
+
+    @asyncio.coroutine
+    def read_until_string(self, str, last=False):
+        """(Coroutine) Read from the port until the given string is
+        detected or the read times out, whichever comes first.  See
+        SerialPort.read_until_string() for details.
+        """
+        wait_start = self.loop.time()
+        searched = 0
+        while True:
+            end = SerialPort._find_string(self._rx_buffer, str, searched, last)
+            if end:
+                raise Return(self._take_rx_buffer(end))
+            searched = max(0, len(self._rx_buffer) - len(str) + 1)
+            now = self.loop.time()
+            remaining = self.timeout - now
+            if (remaining <= 0):
+                raise exception.ReadTimeout(response=self._take_rx_buffer())
+            idle = now - max(wait_start, self._last_rx_time)
+            if idle >= self.interval:
+                raise exception.IntervalTimeout(response=self._take_rx_buffer())
+            self._rx_waiter = asyncio.Future(loop=self.loop)
+            try:
+                yield From(asyncio.wait_for(self._rx_waiter,
+                                            min(remaining, self.interval - idle),
+                                            loop=self.loop))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._rx_waiter = None
+
+    def _take_rx_buffer(self, end=None):
+        """Remove and return the receive buffer's contents up to (but
+        not including) the given position, or all of it if None.
+        """
+        if end is None:
+            end = len(self._rx_buffer)
+        result = bytes(self._rx_buffer[:end])
+        del self._rx_buffer[:end]
+        return result
+
+    def get_baudrate(self):
+        """Return the currently configured baud rate."""
+        return self.port.baudrate
+
+    def set_baudrate(self, baud):
+        """Set the serial port baud rate."""
+        self.port.baudrate = baud
+        return
+
+    def set_timeout(self, timeout, interval=None):
+        """Set the timeout and polling interval for read operations.
+        
+        timeout -- the maximum time to spend before raising a timeout
+            exception
+        interval -- the polling interval; the maximum time to wait
+            without receiving any data
+        """
+        self.timeout = self.loop.time() + timeout
+        if interval == None:
+            interval = timeout
+        self.interval = interval
+        return
+
+    def clear_rx_buffer(self):
+        """Clear the receive buffer"""
+        return self._clear_rx_buffer()
+
+    def _clear_rx_buffer(self):
+        """Clear the receive buffer (without any logging by subclasses)"""
+        self.port.flushInput()
+        del self._rx_buffer[:]
+        return
+
+    def clear_tx_buffer(self):
+        """Clear the transmission buffer"""
+        self.port.flushOutput()
+        return
+
+
+class AsyncSerialPortPlayback(AsyncSerialPort):
+    """An AsyncSerialPort variant which replays activity previously
+    recorded to a file, for regression testing.  See SerialPortPlayback
+    for details.
+    """
+    def __init__(self, filename, mimic_timing=False, loop=None):
+        """filename -- the file containing serial port activity to replay
+        mimic_timing -- True to cause calls to methods to take as
+            long to return as they did during the recording session;
+            otherwise they return immediately.
+        loop -- the event loop, or None (the default) for the current
+            event loop
+        """
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self.loop = loop
+        self.playback = SerialPortPlayback(filename, mimic_timing=False)
+        self.name = self.playback.name
+        self.mimic_timing = mimic_timing
+        return
+
+    def close(self):
+        """Close the log file being replayed"""
+        self.playback.close()
+        return
+
+    def write(self, str):
+        """Pretend to write the given string to the port, raising an
+        exception if that's not what was written in the recorded session.
+        """
+        return self.playback.write(str)
+
+    @asyncio.coroutine
+    def read_until_string(self, str, last=False):
+        """(Coroutine) Pretend to read from the port until the given
+        string is detected or the read times out.  Return the
+        previously recorded result.
+        """
+        timestamp = self.playback.timestamp
+        try:
+            result = self.playback.read_until_string(str, last)
+        finally:
+            if self.mimic_timing and timestamp:
+                yield From(asyncio.sleep(self.playback.timestamp - timestamp,
+                                         loop=self.loop))
+        raise Return(result)
+
+    def get_baudrate(self):
+        """Return the currently configured baud rate"""
+        return self.playback.get_baudrate()
+
+    def set_baudrate(self, baud):
+        """Pretend to set the serial port baud rate"""
+        return self.playback.set_baudrate(baud)
+
+    def set_timeout(self, timeout, interval=None):
+        """Pretend to set the timeout and polling interval"""
+        return self.playback.set_timeout(timeout, interval)
+
+    def clear_rx_buffer(self):
+        """Pretend to clear the receive buffer"""
+        return self.playback.clear_rx_buffer()
+
+    def clear_tx_buffer(self):
+        """Pretend to clear the transmission buffer"""
+        return self.playback.clear_tx_buffer()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
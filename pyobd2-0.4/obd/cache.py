@@ -0,0 +1,197 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""A persistent cache of how to reach each interface and vehicle.
+
+Detecting an interface's baud rate and searching for a vehicle's
+protocol can take many seconds, yet rarely give a different answer
+from one session to the next.  When a ConnectionCache is installed via
+set_connection_cache(), the baud rate last detected on each port is
+tried first by obd.interface.elm, and the protocol last established
+through each interface (or with each vehicle, by VIN) is tried first by
+Interface.search_for_protocol().  The full search is only made if the
+cached value fails.
+"""
+
+import os
+import json
+import threading
+
+from obd.util import info, warn
+
+_cache = None
+
+def set_connection_cache(cache):
+    """Install the ConnectionCache to use (or None for no cache)"""
+    global _cache
+    _cache = cache
+    return
+
+def get_connection_cache():
+    """Return the installed ConnectionCache, or None"""
+    return _cache
+
+
+class ConnectionCache(object):
+    """Remembers, in a JSON file, the baud rate at which the interface
+    on each port was detected and the protocol each interface and each
+    vehicle last connected with, along with how long the full searches
+    for them took.
+
+    filename -- the file in which the cache is kept (by default,
+        DEFAULT_FILENAME in the user's home directory)
+    hits -- the number of cached values that worked
+    misses -- the number of full searches made
+    time_saved -- the estimated time saved by the cache (seconds),
+        based on the duration of the last full search for each value
+
+    A cache may be shared by threads (e.g. those probing ports in
+    obd.interface.elm.enumerate()).
+    """
+    DEFAULT_FILENAME = "~/.pyobd2-connections.json"
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = os.path.expanduser(self.DEFAULT_FILENAME)
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+        self._lock = threading.RLock()
+        self._entries = self._load()
+        return
+
+    def _load(self):
+        """Return the cache entries read from the file (if any)"""
+        entries = {"ports": {}, "vehicles": {}}
+        try:
+            f = open(self.filename, "r")
+            try:
+                entries.update(json.load(f))
+            finally:
+                f.close()
+        except IOError:
+            pass  # no cache yet
+        except ValueError as e:
+            warn("ignoring corrupt connection cache %s: %s" % (self.filename, e))
+        return entries
+
+    def save(self):
+        """Write the cache entries to the file"""
+        temp_filename = self.filename + ".tmp"
+        self._lock.acquire()
+        try:
+            f = open(temp_filename, "w")
+            try:
+                json.dump(self._entries, f, indent=1, sort_keys=True)
+            finally:
+                f.close()
+            os.rename(temp_filename, self.filename)
+        except (IOError, OSError) as e:
+            warn("unable to save connection cache %s: %s" % (self.filename, e))
+        finally:
+            self._lock.release()
+        return
+
+    def _port(self, port):
+        return self._entries["ports"].setdefault(port, {})
+
+    def _vehicle(self, vin):
+        return self._entries["vehicles"].setdefault(vin, {})
+
+    def baud(self, port):
+        """Return the baud rate last detected on the given port, or None"""
+        return self._entries["ports"].get(port, {}).get("baud")
+
+    def found_baud(self, port, baud, elapsed, cached):
+        """Record the baud rate detected on the given port.
+
+        elapsed -- the time taken to detect it (seconds)
+        cached -- True if the cached baud rate was the one detected
+        """
+        self._lock.acquire()
+        try:
+            entry = self._port(port)
+            entry["baud"] = baud
+            self._record_time(entry, "detect_time", elapsed, cached,
+                              "baud rate of %s" % port)
+            self.save()
+        finally:
+            self._lock.release()
+        return
+
+    def protocol(self, port, vin=None):
+        """Return the name of the protocol last established with the
+        given vehicle (if its VIN is given and known) or else through
+        the interface on the given port, or None.
+        """
+        if vin is not None:
+            protocol = self._entries["vehicles"].get(vin, {}).get("protocol")
+            if protocol is not None:
+                return protocol
+        return self._entries["ports"].get(port, {}).get("protocol")
+
+    def connected(self, port, protocol, elapsed, cached, vin=None):
+        """Record the protocol established through the interface on the
+        given port (and with the given vehicle, if its VIN is known).
+
+        protocol -- the name of the protocol
+        elapsed -- the time taken to find it (seconds)
+        cached -- True if the cached protocol was the one established
+        """
+        self._lock.acquire()
+        try:
+            entries = [self._port(port)]
+            if vin is not None:
+                entries.append(self._vehicle(vin))
+            for entry in entries:
+                entry["protocol"] = protocol
+            self._record_time(entries[-1], "search_time", elapsed, cached,
+                              "protocol of %s" % (vin or port))
+            self.save()
+        finally:
+            self._lock.release()
+        return
+
+    def _record_time(self, entry, key, elapsed, cached, description):
+        """Account for the time taken to find a value: the time saved
+        if the cached value was used, otherwise the duration of the
+        full search (as entry[key]) to measure later savings against.
+        """
+        if not cached:
+            self.misses += 1
+            entry[key] = elapsed
+            return
+        self.hits += 1
+        saved = max(0.0, entry.get(key, elapsed) - elapsed)
+        self.time_saved += saved
+        info("cached %s saved %.2f s" % (description, saved))
+        return
+
+    def __str__(self):
+        return ("%d hits, %d misses, %.2f s saved" %
+                (self.hits, self.misses, self.time_saved))
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
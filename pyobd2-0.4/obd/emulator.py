@@ -0,0 +1,594 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""An ELM327 emulator attached to a pseudo-terminal, for testing and
+benchmarking without an interface or a vehicle.
+
+The emulator speaks enough of the ELM327's AT command set for
+obd.interface.elm to attach to it unchanged, and answers OBD requests
+on behalf of a SimulatedVehicle: one or more SimulatedECUs on an
+ISO 15765-4 (11- or 29-bit CAN) or ISO 9141-2 bus, each with its own
+response latency.  Output is throttled to the emulated baud rate, and
+nothing gets through while the client's port is set to another rate.
+
+    vehicle = SimulatedVehicle(obd.protocol.ISO15765_4(id_length=11), [
+        SimulatedECU(0x7E8, {"0100": "4100BE3EB811", "010C": "410C1AF8"}),
+        SimulatedECU(0x7E9, {"0100": "410098180010"}, latency=0.03)])
+    emulator = ELM327Emulator(vehicle)
+    emulator.start()
+    port = obd.serialport.SerialPort(emulator.port_name)
+    interface = obd.interface.elm.create(port)
+
+Given an STI response (e.g. "STN1110 v4.2.0"), the emulator also
+answers the STN11xx commands used by obd.interface.elm.STN11XX:
+STPX requests and STSBR baud rate switches.
+
+Run "python -m obd.emulator --help" to serve a sample vehicle from the
+command line.  Pseudo-terminals require a POSIX platform.
+"""
+
+import os
+import sys
+import time
+import binascii
+import select
+import termios
+import threading
+from optparse import OptionParser
+
+import obd.protocol
+from obd.util import debug
+
+# the baud rates of the termios speed settings, to tell the client's rate
+_TERMIOS_BAUDS = {}
+for _baud in [9600, 19200, 38400, 57600, 115200, 230400]:
+    if hasattr(termios, "B%d" % _baud):
+        _TERMIOS_BAUDS[getattr(termios, "B%d" % _baud)] = _baud
+
+class SimulatedECU(object):
+    """An ECU of a SimulatedVehicle.
+
+    address -- the ECU's response address: its CAN identifier
+        (e.g. 0x7E8 or 0x18DAF110) or its ISO 9141 source address
+        (e.g. 0x10)
+    responses -- a dict mapping each request (in hex, e.g. "010C") to
+        the ECU's response (e.g. "410C1AF8"), or to a list of responses
+        for requests answered with several ISO 9141 messages
+    latency -- the time (in seconds) the ECU takes to respond
+    """
+    def __init__(self, address, responses, latency=0.01):
+        self.address = address
+        self.responses = responses
+        self.latency = latency
+        return
+
+    def respond(self, request, multiple_pids=False):
+        """Return the list of responses (in hex) to the given request,
+        which is empty if the ECU doesn't respond.
+
+        multiple_pids -- True to answer a Service $01 request for
+            several PIDs (as CAN ECUs do) from the responses for each
+        """
+        response = self.responses.get(request)
+        if isinstance(response, list):
+            return response
+        if response is not None:
+            return [response]
+        if not multiple_pids or not request.startswith("01") or len(request) <= 4:
+            return []
+        data = ""
+        for pos in range(2, len(request), 2):
+            response = self.responses.get("01" + request[pos:pos+2])
+            if response is not None:
+                data += response[2:]
+        if not data:
+            return []
+        return ["41" + data]
+
+
+class SimulatedVehicle(object):
+    """A vehicle answering OBD requests through its ECUs.
+
+    protocol -- the vehicle's protocol: ISO15765_4 (with 11- or 29-bit
+        IDs) or ISO9141_2
+    ecus -- the list of SimulatedECUs
+    voltage -- the voltage at the OBD port, as read by ATRV
+    """
+    def __init__(self, protocol, ecus, voltage=12.6):
+        if not isinstance(protocol, (obd.protocol.ISO15765_4, obd.protocol.ISO9141_2)):
+            raise ValueError("Unsupported emulated protocol: %s" % protocol)
+        self.protocol = protocol
+        self.ecus = ecus
+        self.voltage = voltage
+        return
+
+    def is_can(self):
+        """Return True if the vehicle uses CAN"""
+        return isinstance(self.protocol, obd.protocol.ISO15765_4)
+
+    def responses(self, request):
+        """Return a list of (latency, frames) pairs, one for each ECU
+        responding to the given request (in hex), in order of latency.
+        Each frame is a (header, data) pair of bytearrays; CAN data
+        includes the ISO 15765-2 PCI byte(s), but isn't padded.
+        """
+        responses = []
+        for ecu in self.ecus:
+            frames = []
+            for response in ecu.respond(request, multiple_pids=self.is_can()):
+                frames.extend(self._frames(ecu, bytearray(binascii.unhexlify(response))))
+            if frames:
+                responses.append((ecu.latency, frames))
+        responses.sort(key=lambda response: response[0])
+        return responses
+
+    def _frames(self, ecu, data):
+        """Return the list of (header, data) frames carrying the given
+        response from the given ECU"""
+        if not self.is_can():
+            header = bytearray([0x48, 0x6B, ecu.address])
+            checksum = sum(header + data) & 0xFF
+            return [(header, data + bytearray([checksum]))]
+        if self.protocol.id_length == 11:
+            header = bytearray([ecu.address >> 8, ecu.address & 0xFF])
+        else:
+            header = bytearray([(ecu.address >> shift) & 0xFF for shift in (24, 16, 8, 0)])
+        if len(data) <= 7:
+            return [(header, bytearray([len(data)]) + data)]
+        frames = [(header, bytearray([0x10 | (len(data) >> 8), len(data) & 0xFF]) + data[:6])]
+        index, pos = 1, 6
+        while pos < len(data):
+            frames.append((header, bytearray([0x20 | (index & 0x0F)]) + data[pos:pos+7]))
+            index, pos = index + 1, pos + 7
+        return frames
+
+    def traffic(self):
+        """Return a list of (header, data) frames representative of the
+        vehicle's bus traffic, as seen by ATMA (none but on CAN)"""
+        if not self.is_can():
+            return []
+        return [frames[0] for latency, frames in self.responses("0100")]
+
+
+class ELM327Emulator(object):
+    """An ELM327 attached to a pseudo-terminal, connected to a
+    SimulatedVehicle.  See the module documentation for usage.
+
+    port_name -- the name of the pseudo-terminal to open (e.g. with
+        obd.serialport.SerialPort)
+    baud -- the emulated baud rate, to which output is throttled
+    identifier -- the response to ATI
+    extended -- the response to STI, or None if the extended (STN)
+        command set isn't supported
+    command_time -- the time the chip takes to start carrying out
+        each command
+    monitor_limit -- the number of frames ATMA shows before its buffer
+        fills (BUFFER FULL), or None if it keeps up
+    output_limit -- the highest baud rate at which output arrives
+        intact (as over a cable that can't carry faster rates), or None
+        if there's no limit
+    commands -- the commands received, in order
+    """
+    # protocol numbers (as in ATSP/ATTP) and their ATDP descriptions
+    PROTOCOLS = {
+        "1": (obd.protocol.PWM(), "SAE J1850 PWM"),
+        "2": (obd.protocol.VPW(), "SAE J1850 VPW"),
+        "3": (obd.protocol.ISO9141_2(), "ISO 9141-2"),
+        "4": (obd.protocol.ISO14230_4("5BAUD"), "ISO 14230-4 (KWP 5BAUD)"),
+        "5": (obd.protocol.ISO14230_4("FAST"), "ISO 14230-4 (KWP FAST)"),
+        "6": (obd.protocol.ISO15765_4(id_length=11, baud=500000), "ISO 15765-4 (CAN 11/500)"),
+        "7": (obd.protocol.ISO15765_4(id_length=29, baud=500000), "ISO 15765-4 (CAN 29/500)"),
+        "8": (obd.protocol.ISO15765_4(id_length=11, baud=250000), "ISO 15765-4 (CAN 11/250)"),
+        "9": (obd.protocol.ISO15765_4(id_length=29, baud=250000), "ISO 15765-4 (CAN 29/250)"),
+        }
+    # the time taken to give up on each protocol the vehicle doesn't use
+    FAILED_CONNECT_TIMES = {"1": 0.3, "2": 0.3, "3": 3.0, "4": 3.0, "5": 0.5,
+                            "6": 0.1, "7": 0.1, "8": 0.1, "9": 0.1}
+    # the interval between the frames shown by ATMA
+    MONITOR_INTERVAL = 0.02
+
+    def __init__(self, vehicle, baud=38400, identifier="ELM327 v1.5", extended=None,
+                 command_time=0.0):
+        self.vehicle = vehicle
+        self.baud = baud
+        self.identifier = identifier
+        self.extended = extended
+        self.command_time = command_time
+        self.monitor_limit = None
+        self.output_limit = None
+        self.commands = []
+        self._thread = None
+        self._running = False
+        self._master, self._slave = os.openpty()
+        self.port_name = os.ttyname(self._slave)
+        self._defaults()
+        return
+
+    def _defaults(self):
+        """Restore the settings made by ATZ, ATWS and ATD"""
+        self.echo = True
+        self.linefeeds = False
+        self.headers = False
+        self.spaces = True
+        self.selected_protocol = "0"
+        self.timeout = 0x32
+        self.connected_protocol = None
+        self.receive_address = None
+        self._searched = False
+        self._last_command = ""
+        return
+
+    def start(self):
+        """Start answering commands on a background thread"""
+        if self._thread: return
+        self._running = True
+        self._thread = threading.Thread(target=self._serve,
+                                        name="ELM327 emulator (%s)" % self.port_name)
+        self._thread.setDaemon(True)
+        self._thread.start()
+        return
+
+    def stop(self):
+        """Stop answering commands and close the pseudo-terminal"""
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        os.close(self._master)
+        os.close(self._slave)
+        return
+
+    def _serve(self):
+        """Answer each command received until stop() is called"""
+        pending = ""
+        while self._running:
+            if not select.select([self._master], [], [], 0.1)[0]:
+                continue
+            try:
+                pending += os.read(self._master, 1024)
+            except OSError:
+                continue  # no client attached
+            if not self._baud_matches():
+                pending = ""  # unintelligible at the wrong rate
+                continue
+            while "\r" in pending and self._running:
+                command, pending = pending.split("\r", 1)
+                if self.echo:
+                    self._send(command + "\r")
+                response = self._respond(command)
+                if response is not None:
+                    self._send(response + "\r\r>")
+        return
+
+    def _baud_matches(self):
+        """Return whether the client's port is set to the emulated baud
+        rate (or to a rate the emulator can't tell)"""
+        speed = termios.tcgetattr(self._slave)[5]
+        return _TERMIOS_BAUDS.get(speed, self.baud) == self.baud
+
+    def _send(self, text):
+        """Write the given text to the client, taking as long as it
+        would at the emulated baud rate (10 bits per character), and
+        garbling it beyond the output limit"""
+        if self.linefeeds:
+            text = text.replace("\r", "\r\n")
+        time.sleep(len(text) * 10.0 / self.baud)
+        if self.output_limit is not None and self.baud > self.output_limit:
+            text = "\xFF" * len(text)
+        os.write(self._master, text)
+        return
+
+    def _respond(self, command):
+        """Carry out the given command and return the response,
+        less the trailing prompt (or None if the response has been
+        sent already)"""
+        command = command.replace(" ", "").upper()
+        self.commands.append(command)
+        debug("emulator received %r" % command)
+        time.sleep(self.command_time)
+        if not command:
+            command = self._last_command  # repeat the last command
+            if not command:
+                return "?"
+        if command.startswith("AT"):
+            return self._at_command(command[2:])
+        if command.startswith("ST"):
+            if not self.extended:
+                return "?"
+            return self._st_command(command[2:])
+        try:
+            int(command, 16)
+        except ValueError:
+            return "?"
+        self._last_command = command
+        return self._obd_request(command)
+
+    def _at_command(self, command):
+        """Carry out the given AT command (less the "AT") and return
+        the response"""
+        if command in ("Z", "WS"):
+            self._defaults()
+            return "\r\r" + self.identifier
+        if command == "D":
+            self._defaults()
+            return "OK"
+        if command == "I":
+            return self.identifier
+        if command == "@1":
+            return "OBDII to RS232 Interpreter"
+        if command == "RV":
+            return "%.1fV" % self.vehicle.voltage
+        if command in ("E0", "E1", "L0", "L1", "H0", "H1", "S0", "S1"):
+            value = command[1] == "1"
+            setting = {"E": "echo", "L": "linefeeds", "H": "headers", "S": "spaces"}[command[0]]
+            setattr(self, setting, value)
+            return "OK"
+        if command[:2] in ("SP", "TP"):
+            protocol = command[2:].lstrip("A")
+            if protocol != "0" and protocol not in self.PROTOCOLS:
+                return "?"
+            self.selected_protocol = protocol
+            self.connected_protocol = None
+            self._searched = False
+            return "OK"
+        if command == "DP":
+            if self.connected_protocol is None:
+                return "AUTO"
+            description = self.PROTOCOLS[self.connected_protocol][1]
+            if self.selected_protocol == "0":
+                return "AUTO, " + description
+            return description
+        if command == "DPN":
+            protocol = self.connected_protocol or self.selected_protocol
+            if self.selected_protocol == "0":
+                return "A" + protocol
+            return protocol
+        if command == "PC":
+            self.connected_protocol = None
+            return "OK"
+        if command.startswith("ST") and len(command) == 4:
+            self.timeout = int(command[2:], 16)
+            return "OK"
+        if command == "MA":
+            return self._monitor()
+        if command.startswith("CRA"):
+            self.receive_address = None
+            if command[3:]:
+                self.receive_address = int(command[3:], 16)
+            return "OK"
+        if command[:2] in ("AT", "SH", "AL", "NL", "CA", "CF", "M0", "M1", "R0", "R1"):
+            return "OK"
+        return "?"
+
+    def _st_command(self, command):
+        """Carry out the given ST command (less the "ST") and return
+        the response"""
+        if command == "I":
+            return self.extended
+        if command.startswith("PX"):
+            options = {}
+            for option in command[2:].split(","):
+                key, separator, value = option.partition(":")
+                options[key] = value
+            try:
+                int(options["D"], 16)
+                count = timeout = None
+                if "R" in options:
+                    count = int(options["R"])
+                if "T" in options:
+                    timeout = int(options["T"]) / 1000.0
+            except (KeyError, ValueError):
+                return "?"
+            return self._obd_request(options["D"], count, timeout)
+        if command.startswith("SBR"):
+            try:
+                baud = int(command[3:])
+            except ValueError:
+                return "?"
+            self._send("OK\r")
+            self.baud = baud  # switching without a prompt
+            return None
+        return "?"
+
+    def _protocol_number(self):
+        """Return the ELM protocol number of the vehicle's protocol"""
+        for number, (protocol, description) in self.PROTOCOLS.items():
+            if protocol == self.vehicle.protocol:
+                return number
+        return None
+
+    def _connect(self):
+        """Establish the connection with the vehicle if need be,
+        returning any status line to print first, or raising a
+        ValueError with the error to print if unable to connect."""
+        if self.connected_protocol is not None:
+            return ""
+        number = self._protocol_number()
+        status = ""
+        if self.selected_protocol == "0":
+            if not self._searched:
+                status = "SEARCHING...\r"
+                self._searched = True
+        elif self.selected_protocol != number:
+            time.sleep(self.FAILED_CONNECT_TIMES[self.selected_protocol])
+            if self.selected_protocol in ("3", "4", "5"):
+                raise ValueError("BUS INIT: ...ERROR")
+            raise ValueError("UNABLE TO CONNECT")
+        elif not self.vehicle.is_can():
+            status = "BUS INIT: ...OK\r"
+        self.connected_protocol = number
+        return status
+
+    def _obd_request(self, request, count=None, timeout=None):
+        """Send the given OBD request (in hex, with any response count
+        hint) to the vehicle and return the frames received
+
+        count -- the number of frames to await, if not hinted
+        timeout -- the time (in seconds) to wait for responses, or
+            None for the time set by ATST
+        """
+        if len(request) % 2:
+            request, count = request[:-1], int(request[-1], 16)
+        try:
+            output = self._connect()
+        except ValueError as e:
+            return str(e)
+
+        if timeout is None:
+            timeout = self.timeout * 0.004
+        elapsed = 0.0
+        lines = []
+        frame_count = 0
+        for latency, frames in self.vehicle.responses(request):
+            if latency - elapsed > timeout:
+                break  # the ELM stopped waiting
+            time.sleep(latency - elapsed)
+            elapsed = latency
+            lines.extend(self._format(frames))
+            frame_count += len(frames)
+            if count and frame_count >= count:
+                break
+        else:
+            time.sleep(timeout)  # waiting for any other responses
+        if not lines:
+            return output + "NO DATA"
+        return output + "\r".join(lines)
+
+    def _format(self, frames):
+        """Return the lines the ELM prints for the given frames"""
+        separator = " " if self.spaces else ""
+        def hex(data):
+            return separator.join(["%02X" % b for b in data])
+        if self.headers:
+            lines = []
+            for header, data in frames:
+                if self.vehicle.is_can() and self.vehicle.protocol.id_length == 11:
+                    text = "%03X" % ((header[0] << 8) | header[1])
+                else:
+                    text = hex(header)
+                lines.append(text + separator + hex(data) + separator)
+            return lines
+        if not self.vehicle.is_can():
+            return [hex(data[:-1]) for header, data in frames]  # sans checksum
+        header, data = frames[0]
+        if len(frames) == 1:
+            return [hex(data[1:]) + separator]
+        lines = ["%03X" % (((data[0] & 0x0F) << 8) | data[1]),
+                 "0:" + separator + hex(data[2:])]
+        for header, data in frames[1:]:
+            lines.append("%X:" % (data[0] & 0x0F) + separator + hex(data[1:]))
+        return lines
+
+    def _monitor(self):
+        """Show the vehicle's bus traffic until any character arrives
+        (ATMA)"""
+        traffic = []
+        if (self.connected_protocol or self.selected_protocol) in ("6", "7", "8", "9"):
+            traffic = self.vehicle.traffic()
+        if self.receive_address is not None:
+            traffic = [(header, data) for header, data in traffic
+                       if _address(header) == self.receive_address]
+        index = 0
+        while self._running:
+            if select.select([self._master], [], [], self.MONITOR_INTERVAL)[0]:
+                os.read(self._master, 1024)  # stops the monitor
+                break
+            if traffic:
+                if index == self.monitor_limit:
+                    return "BUFFER FULL"
+                self._send(self._format([traffic[index % len(traffic)]])[0] + "\r")
+                index += 1
+        return ""
+
+
+def _address(header):
+    """Return the CAN ID in the given header bytes"""
+    address = 0
+    for b in header:
+        address = (address << 8) | b
+    return address
+
+
+def sample_vehicle(protocol=obd.protocol.ISO15765_4(id_length=11), ecu_count=2, latency=0.02):
+    """Return a SimulatedVehicle with the given number of ECUs, each
+    answering a handful of common requests after the given latency"""
+    vin = "1D4GP00R55B123456".encode("hex").upper()
+    can = isinstance(protocol, obd.protocol.ISO15765_4)
+    ecus = []
+    for index in range(ecu_count):
+        if not can:
+            address = 0x10 + index
+        elif protocol.id_length == 11:
+            address = 0x7E8 + index
+        else:
+            address = 0x18DAF110 + (index << 3)
+        responses = {
+            "0100": "4100BE3EB811",
+            "0101": "410100076500",
+            "0105": "41057B",
+            "010C": "410C1AF8",
+            "010D": "410D32",
+            "0120": "412080000000",
+            }
+        if index == 0:
+            if can:
+                responses["0902"] = "490201" + vin
+            else:
+                responses["0902"] = ["4902%02X%s" % (n + 1, ("000000" + vin)[n*8:n*8+8])
+                                     for n in range(5)]
+        ecus.append(SimulatedECU(address, responses, latency * (index + 1)))
+    return SimulatedVehicle(protocol, ecus)
+
+
+def main():
+    usage = "Usage: python -m obd.emulator [options]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("-p", "--protocol", default="6",
+                      help="the vehicle's protocol number, 3 or 6-9 (default 6)")
+    parser.add_option("-b", "--baud", type="int", default=38400,
+                      help="the emulated baud rate (default 38400)")
+    parser.add_option("-e", "--ecus", type="int", default=2,
+                      help="the number of ECUs (default 2)")
+    parser.add_option("-l", "--latency", type="float", default=0.02,
+                      help="the first ECU's latency in seconds (default 0.02)")
+    options, args = parser.parse_args()
+
+    protocol = ELM327Emulator.PROTOCOLS[options.protocol][0]
+    vehicle = sample_vehicle(protocol, options.ecus, options.latency)
+    emulator = ELM327Emulator(vehicle, options.baud)
+    emulator.start()
+    sys.stderr.write("Emulating an ELM327 on %s (Ctrl-C to stop)\n" % emulator.port_name)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    emulator.stop()
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
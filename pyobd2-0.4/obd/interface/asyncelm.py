@@ -0,0 +1,215 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""
+Support for ELM327-compatible interfaces driven by an asyncio event loop
+
+Basic usage, from within a coroutine:
+
+    port = obd.asyncserialport.AsyncSerialPort("/dev/ttyUSB0")
+    interface = yield From(obd.interface.asyncelm.create(port))
+
+    yield From(interface.open())
+    yield From(interface.set_protocol(None))
+    yield From(interface.connect_to_vehicle())
+
+    responses = yield From(interface.send_request(request))
+
+    yield From(interface.disconnect_from_vehicle())
+    yield From(interface.close())
+
+Every method that communicates with the interface is a coroutine.  The
+operations themselves (and the frame parsing, message reassembly, and
+response decoding) are those of the synchronous classes in
+obd.interface.elm, written as steps (see obd.interface.steps); only
+the I/O primitives here are coroutines of their own.  A single event
+loop can thus drive many interfaces at once, without a thread per
+interface.
+
+This tree targets Python 2, so the coroutines are written for trollius
+(the Python 2 port of asyncio); see obd.asyncserialport.
+"""
+
+import sys
+
+import obd.exception
+from obd.asyncserialport import asyncio, From, Return, AsyncSerialPort
+from obd.interface.elm import ELM32X, ELM327, OBDLinkCI, STN11XX, _create_steps
+from obd.interface.steps import Stepper
+
+
+def create(port, callback=None, baud=None):
+    """(Coroutine) Create an instance of the appropriate AsyncELM327
+    subclass at the given port
+
+    port -- the AsyncSerialPort to which the interface is attached
+    callback -- the callback function used to provide status updates
+        (default None)
+    baud -- the baud rate to use, or None (default) to auto-detect
+    """
+    return _run(_create_steps(AsyncELM327, _classes, port, callback, baud))
+
+
+@asyncio.coroutine
+def _run(steps):
+    """(Coroutine) Run the given generator of steps (see
+    obd.interface.steps), yielding From each call, and return its
+    result"""
+    stepper = Stepper(steps)
+    step = stepper.advance()
+    while step is not None:
+        function, args, kwargs = step
+        try:
+            value = yield From(function(*args, **kwargs))
+        except Exception:
+            step = stepper.advance(error=sys.exc_info())
+        else:
+            step = stepper.advance(value)
+    raise Return(stepper.result())
+
+
+class AsyncInterface(object):
+    """Mixin running the operations of an Interface (see
+    obd.interface.steps) as coroutines.  Subclasses list it ahead of
+    their synchronous Interface base class and implement the I/O
+    primitives (at_cmd(), etc.) as coroutines; the operations built on
+    them (send_request(), connect_to_vehicle(), etc.) then return
+    coroutines too.
+    """
+
+    # Runs the steps of an operation, yielding From each call
+    _run = staticmethod(_run)
+
+    def _sleep(self, seconds):
+        """(Coroutine) Wait for the given number of seconds without
+        blocking the event loop"""
+        return asyncio.sleep(seconds, loop=self.port.loop)
+
+
+class AsyncELM327(AsyncInterface, ELM327):
+    """Class representing an ELM327 OBD-II interface driven by an
+    asyncio event loop.
+
+    See obd.interface.elm.ELM327 for usage; the methods which
+    communicate with the interface are coroutines.  The port is an
+    AsyncSerialPort.
+    """
+
+    _port_classes = (AsyncSerialPort,)
+
+    def detect_baudrate(port, timeout=0.03, first=None):
+        """(Static coroutine) Detect, select, and return the baud rate
+        at which a connected ELM32x interface is operating.  See
+        ELM32X.detect_baudrate().
+        """
+        return _run(ELM32X._detect_baudrate_steps(port, timeout, first))
+    detect_baudrate = staticmethod(detect_baudrate)
+
+    @asyncio.coroutine
+    def _at_cmd(port, cmd, timeout=None):
+        """(Static coroutine) Send a command to the port and return the
+        response.  See ELM32X._at_cmd().
+        """
+        port.write("%s\r" % cmd)
+        if timeout is None: timeout = ELM32X.AT_TIMEOUT
+        port.set_timeout(timeout)
+        response = yield From(port.read_until_string(ELM32X.PROMPT))
+        raise Return(ELM32X._strip_prompt(response))
+    _at_cmd = staticmethod(_at_cmd)
+
+    @asyncio.coroutine
+    def at_cmd(self, cmd, timeout=None):
+        """(Coroutine) Send a command to the interface and return the
+        response.  See ELM32X.at_cmd().
+        """
+        assert self.interface_configured
+        response = yield From(AsyncELM327._at_cmd(self.port, cmd, timeout))
+        raise Return(response)
+
+    @asyncio.coroutine
+    def _read_until_string(self, str):
+        """(Coroutine) Read from the interface's port until the given
+        string is detected or the read times out, whichever comes first.
+        See ELM32X._read_until_string().
+        """
+        result = yield From(self.port.read_until_string(str))
+        if result.startswith("STOPPED"):
+            raise obd.exception.InterfaceBusy(result)
+        raise Return(result)
+
+    @asyncio.coroutine
+    def _read_until_prompt(self):
+        """(Coroutine) Read from the interface until the prompt is
+        received and return the response.
+        """
+        response = yield From(self.port.read_until_string(ELM32X.PROMPT))
+        raise Return(ELM32X._strip_prompt(response))
+
+    @asyncio.coroutine
+    def _read_response(self, previous_data=""):
+        """(Coroutine) Read ASCII OBD frames from the interface until
+        the prompt is received, and return the list of frames.  See
+        ELM32X._read_response().
+        """
+        response = yield From(self._read_until_prompt())
+        raise Return(self._parse_response(previous_data + response))
+
+    def set_baudrate(self, new_baud):
+        """Changing the baud rate is not supported asynchronously;
+        create a synchronous ELM327 to do so.
+        """
+        raise obd.exception.CommandNotSupported("Baud rate changes require a synchronous interface")
+
+    def monitor(self, receive_address=None, duration=None):
+        """Monitoring the bus is not supported asynchronously; create
+        a synchronous ELM327 to do so.
+        """
+        raise obd.exception.CommandNotSupported("Monitoring requires a synchronous interface")
+
+
+class AsyncOBDLinkCI(AsyncELM327):
+    """Class representing an OBDLink CI (ELM327-compatible) OBD-II
+    interface driven by an asyncio event loop.
+
+    See AsyncELM327 for usage.
+    """
+    _supported_protocols = OBDLinkCI._supported_protocols
+
+
+class AsyncSTN11XX(AsyncELM327, STN11XX):
+    """Class representing an STN11xx-based OBD-II interface driven by
+    an asyncio event loop, sending requests with STPX.
+
+    See AsyncELM327 and obd.interface.elm.STN11XX for usage.
+    """
+
+_classes = {
+    "ELM327": AsyncELM327,
+    "OBDLink CI": AsyncOBDLinkCI,
+    }
+for chip in STN11XX.CHIPS:
+    _classes[chip] = AsyncSTN11XX
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
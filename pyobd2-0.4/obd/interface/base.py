@@ -29,8 +29,13 @@ import copy
 import Queue
 import time
 
+import obd.cache
+import obd.exception
+import obd.interface.search
 import obd.message
 import obd.protocol
+import obd.reassembly
+from obd.interface.steps import call, run, Result
 from obd.util import info, debug, untested
 
 class Interface(object):
@@ -42,6 +47,7 @@ class Interface(object):
         interface.connect_to_vehicle()
 
         responses = interface.send_request(request)
+        results = interface.send_requests([request1, request2, ...])
 
         interface.disconnect_from_vehicle()
         interface.close()
@@ -67,8 +73,9 @@ class Interface(object):
         """
         self._current_status = None
         self._status_callback_fn = callback
+        self._search_strategy = None
         self._token = None
-        self._frames_received = {}
+        self._reassembler = obd.reassembly.StreamReassembler(parse_frame=self._parse_frame)
         self._complete_messages = Queue.Queue(0)
         self.identifier = identifier
         self.name = name
@@ -105,6 +112,15 @@ class Interface(object):
         self._status_callback_fn = fn
         return
 
+    def set_search_strategy(self, strategy):
+        """Set the strategy (see obd.interface.search) used to order
+        the protocols tried by search_for_protocol(), or None to use
+        obd.interface.search.default_strategy (or, if that's None, a
+        ProbableFirstSearch of the interface's own).
+        """
+        self._search_strategy = strategy
+        return
+
     def _verify_token(self, token):
         """Raise an exception if the given token does not match the value
         specified by the previous ResetRequiresConfirmation exception.
@@ -180,6 +196,16 @@ class Interface(object):
         raise NotImplementedError()
         return
 
+    # Runs the steps of an operation which communicates with the
+    # interface, making each call directly; see obd.interface.steps
+    _run = staticmethod(run)
+
+    def _sleep(self, seconds):
+        """Wait for the given number of seconds (between the steps of an
+        operation; see obd.interface.steps)"""
+        time.sleep(seconds)
+        return
+
     def _send_obd_message(self, message, header=None, token=None):
         """Transmit an OBD message on the bus.
         
@@ -229,25 +255,137 @@ class Interface(object):
             "bus_messages" -- return a list of reassembled bus messages,
                 each message represented as a BusMessage instance
             "raw_frames" -- return a list of each frame received, each frame
-                represented as a list of raw bytes
+                represented as a bytearray of raw bytes
             function pointer -- called with the list of raw frames to allow
                 for any other processing or transformation
         
         See obd.message.base.BusMessage and obd.message.base.Message for
         further details on the distinction between these options.
         """
+        return self._run(self._send_request_steps(request, header, token, response_type))
+
+    def _send_request_steps(self, request, header, token, response_type):
+        """The steps of send_request() (see obd.interface.steps)"""
         assert self.interface_configured
         assert self.connected_to_vehicle
+        message = request.message(self.vehicle_protocol)
+        raw_frames = yield call(self._send_obd_message, message, header, token)
+        raise Result(self._encapsulate_response(raw_frames, response_type, request))
+
+    # Services whose single-PID requests send_requests() may combine
+    # into multi-PID requests
+    BATCHED_SIDS = [0x01]
+
+    def send_requests(self, requests):
+        """Send a list of requests to the vehicle, using as few bus
+        transactions as possible, and return the OBD responses received
+        as a dict keyed by (sid, pid, tx_id) tuples, where tx_id
+        identifies the responding ECU.
+
+        Duplicate requests are sent only once.  On ISO 15765-4 (CAN)
+        vehicles, single-PID requests for a service in BATCHED_SIDS are
+        combined into multi-PID requests (see OBDRequest); on other
+        protocols, each request is sent on its own.  PIDs unsupported by
+        an ECU are simply absent from the result.
+
+        requests -- a list of Request instances (see send_request())
+        """
+        return self._run(self._send_requests_steps(requests))
+
+    def _send_requests_steps(self, requests):
+        """The steps of send_requests() (see obd.interface.steps)"""
+        results = {}
+        for request in self._plan_requests(requests):
+            responses = yield call(self.send_request, request, response_type="obd_responses")
+            self._collect_responses(responses, results)
+        raise Result(results)
+
+    def request_values(self, sid, pids):
+        """Request the given PIDs of the given service (see
+        send_requests()) and return a dict mapping each PID to the
+        value of the first item in its response.  Where several ECUs
+        respond, the value is that of the first ECU (the one with the
+        lowest tx_id); PIDs no ECU supports are absent from the result.
+
+        sid -- the service (e.g. 0x01)
+        pids -- a list of the PIDs to request
+        """
+        return self._run(self._request_values_steps(sid, pids))
+
+    def _request_values_steps(self, sid, pids):
+        """The steps of request_values() (see obd.interface.steps)"""
+        requests = [obd.message.OBDRequest(sid=sid, pid=pid) for pid in pids]
+        results = yield call(self.send_requests, requests)
+        values = {}
+        for key in sorted(results.keys()):
+            response_sid, pid, ecu = key
+            if pid not in values:
+                values[pid] = results[key].values[0].value
+        raise Result(values)
+
+    def _plan_requests(self, requests):
+        """Return the list of requests which send_requests() should
+        send to fulfil the given ones, deduplicated and (if the
+        protocol allows) combined into multi-PID requests.
+        """
+        batch = isinstance(self.vehicle_protocol, obd.protocol.ISO15765_4)
+        planned = []
+        sent = set()
+        batches = {}
+        for request in requests:
+            message = tuple(request.message(self.vehicle_protocol))
+            if message in sent:
+                continue
+            sent.add(message)
+            if (batch and isinstance(request, obd.message.OBDRequest) and
+                request.sid in self.BATCHED_SIDS and len(request.pids) == 1):
+                # SAE J1979 forbids mixing PID-supported PIDs with others
+                pid = request.pids[0]
+                key = (request.sid, (pid & 0x1F) == 0)
+                if key not in batches:
+                    batches[key] = []
+                    planned.append(key)
+                batches[key].append(pid)
+            else:
+                planned.append(request)
+
+        result = []
+        for item in planned:
+            if item not in batches:
+                result.append(item)
+                continue
+            sid, pids = item[0], batches[item]
+            max_pids = obd.message.OBDRequest.MAX_PIDS
+            for i in range(0, len(pids), max_pids):
+                chunk = pids[i:i+max_pids]
+                if len(chunk) == 1:
+                    chunk = chunk[0]
+                result.append(obd.message.OBDRequest(sid=sid, pid=chunk))
+        return result
+
+    def _collect_responses(self, responses, results):
+        """Add the given OBD responses to the send_requests() results"""
+        for response in responses:
+            key = (response.sid, response.pid, response.bus_message.header.tx_id)
+            results[key] = response
+        return
+
+    def _encapsulate_response(self, raw_frames, response_type="default", request=None):
+        """Return the raw frames received in response to a request,
+        encapsulated as specified by response_type.  See send_request()
+        for the valid settings.
+
+        request -- the Request which elicited the response, needed to
+            split responses to requests for multiple PIDs
+        """
         if response_type == "default":
             response_type = self.response_type
-        message = request.message(self.vehicle_protocol)
-        raw_frames = self._send_obd_message(message, header, token)            
         if response_type == "raw_frames":
             result = self._return_raw_frames(raw_frames)
         elif response_type == "bus_messages":
             result = self._return_bus_messages(raw_frames)
         elif response_type == "obd_responses":
-            result = self._return_obd_responses(raw_frames)
+            result = self._return_obd_responses(raw_frames, request)
         else:
             # let clients provide their own custom handler via function
             result = response_type(self, raw_frames)
@@ -259,9 +397,8 @@ class Interface(object):
         exception if there were any data errors.
         """
         for f in raw_frames:
-            if None in f:
-                untested("frames with data errors")
-                raise DataError(raw=raw_frame)
+            if obd.message.base.missing_bytes(f):
+                raise obd.exception.DataError(raw=f)
         return raw_frames
 
     def _return_bus_messages(self, raw_frames):
@@ -273,21 +410,29 @@ class Interface(object):
         for r in bus_messages:
             if r.incomplete:
                 untested("messages with bad frames")
-                raise DataError(raw=bus_messages)
+                raise obd.exception.DataError(raw=bus_messages)
         return bus_messages
 
-    def _return_obd_responses(self, raw_frames):
+    def _return_obd_responses(self, raw_frames, request=None):
         """Reassemble a list of raw frames into complete OBD responses,
         each represented as the appropriate Response subclass, and
         raise an exception if there were any data errors.  Otherwise
         return the list of OBD responses.
+
+        If the request asked for multiple PIDs, each bus message is
+        split into a separate response for each PID it contains.
         """
         bus_messages = self._process_obd_response(raw_frames)
-        obd_messages = [obd.message.create(m) for m in bus_messages]
+        if request is not None and len(request.pids) > 1:
+            obd_messages = []
+            for m in bus_messages:
+                obd_messages.extend(obd.message.create_all(m, request.pids))
+        else:
+            obd_messages = [obd.message.create(m) for m in bus_messages]
         for r in obd_messages:
             if r.incomplete:
                 untested("messages with bad frames")
-                raise DataError(raw=obd_messages)
+                raise obd.exception.DataError(raw=obd_messages)
         return obd_messages
 
     def _process_obd_response(self, raw_frames):
@@ -295,10 +440,21 @@ class Interface(object):
         assuming that the list of raw frames constitutes a complete
         response.
         """
+        frames = [self._parse_frame(raw_frame) for raw_frame in raw_frames]
+        # Most responses are single frames, each a complete message,
+        # which need no reassembly
+        if (self._single_frames(frames) and len(self._reassembler) == 0 and
+            self._complete_messages.empty()):
+            result = [obd.message.BusMessage(f.message_header(), f.assemble_message([f]), [f])
+                      for f in frames]
+            debug([str(r) for r in result])
+            return result
+
         # When we get an OBD response from the interface, we assume that it's
         # basically complete, having taken into account any relevant timeouts
-        for frame in raw_frames:
-            self._received_obd_frame(frame)
+        for frame in frames:
+            for bus_message in self._reassembler.add_frame(frame):
+                self._complete_messages.put(bus_message, False)
         self._flush_frames()
         result = []
         try:
@@ -312,6 +468,16 @@ class Interface(object):
         debug([str(r) for r in result])
         return result
 
+    def _single_frames(frames):
+        """(Static) Return whether each of the given frames is a
+        complete, single-frame message (e.g. an ISO 15765 single frame,
+        or a legacy frame of a SID whose messages aren't split)"""
+        for frame in frames:
+            if frame.sequence_length() != 1:
+                return False
+        return True
+    _single_frames = staticmethod(_single_frames)
+
     def _parse_frame(self, raw_frame):
         """Return an instance of the appropriate Frame subclass given
         the current protocol.
@@ -332,57 +498,8 @@ class Interface(object):
         whether a message is complete.  See _flush_frames()
         for resolution.
         """
-        frame = self._parse_frame(raw_frame)
-        key = frame.sequence_key()
-
-        # Get the set of incomplete frames for the given transmitter and receiver
-        try:
-            frames, last_sequence_number, sequence_length = self._frames_received[key]
-        except KeyError as e:
-            frames, last_sequence_number, sequence_length = [], 0, None
-            self._frames_received[key] = [frames, last_sequence_number, sequence_length]
-
-        # Compute the current frame's sequence number
-        sequence_number = frame.sequence_number(last_sequence_number)
-
-        # Determine the number of frames needed to complete this response
-        if sequence_length is None:
-            sequence_length = frame.sequence_length()
-        frames_needed = sequence_length
-        if not frames_needed:
-            # If we can't tell how many frames are needed for this message, we know
-            # the response needs at least enough frames for this one
-            if sequence_number is None:
-                frames_needed = 0
-            else:
-                frames_needed = sequence_number + 1
-
-        # Make sure there's room in the list of frames
-        if len(frames) < frames_needed:
-            frames_needed -= len(frames)
-            frames.extend([None] * frames_needed)
-
-        # Save the current frame
-        if sequence_number is not None:
-            frames[sequence_number] = frame
-        else:
-            # Store unordered frames in the first available slot
-            try:
-                frames[frames.index(None)] = frame
-            except ValueError:
-                frames.append(frame)
-
-        # When all the needed frames are received,
-        sequence_length_known = (sequence_length is not None)
-        if sequence_length_known and None not in frames:
-            # Post the completed message and clear the (now) completed frames
-            data = frames[0].assemble_message(frames)
-            bus_message = obd.message.BusMessage(frame.header, data, frames)
+        for bus_message in self._reassembler.add(raw_frame):
             self._complete_messages.put(bus_message, False)
-            del self._frames_received[key]
-        else:
-            # Save the most recent sequence number seen
-            self._frames_received[key] = [frames, sequence_number, sequence_length]
         return
     
     def _flush_frames(self):
@@ -396,36 +513,14 @@ class Interface(object):
         This function should be called when it is determined
         that a response is complete.  In the case of discrete
         request/response transactions, this is often trivial.
-        In the case of bus monitoring, more complex logic
-        must be employed to determine when frames should be
-        flushed.
+        For continuous bus monitoring, see
+        obd.reassembly.StreamReassembler, which expires pending
+        messages on timers instead.
         """
-        try:
-            # Iterate over all pending messages
-            for frames, sequence_number, sequence_length in self._frames_received.values():
-                # If the message is pending because it is incomplete
-                if None in frames:
-                    untested("flushing incomplete messages")
-                    # Find the first received (non-None) frame, in case we missed the
-                    # first frame(s).  The assertions check for bugs in received_frame().
-                    for first_received in frames:
-                        if first_received != None: break
-                    else:
-                        assert False, "message with no frames received"
-                else:
-                    # If the sequence length was known, the message should have been
-                    # flushed as soon as it was complete.
-                    sequence_length_known = (sequence_length is not None)
-                    assert not sequence_length_known, "message not flushed upon completion"
-                    first_received = frames[0]
-                # Post the pending message
-                header = first_received.header
-                data = first_received.assemble_message(frames)
-                bus_message = obd.message.BusMessage(header, data, frames)
-                self._complete_messages.put(bus_message, False)
-        finally:
-            # Clear the pending messages
-            self._frames_received = {}
+        for bus_message in self._reassembler.flush():
+            if bus_message.incomplete:
+                untested("flushing incomplete messages")
+            self._complete_messages.put(bus_message, False)
         return
         
     def close(self):
@@ -445,7 +540,7 @@ class Interface(object):
         raise NotImplementedError()
         return
         
-    def search_for_protocol(self):
+    def search_for_protocol(self, vin=None):
         """Perform a robust search for the vehicle's protocol and
         initiate a communication session with the vehicle's ECU,
         returning the session protocol if successful.
@@ -453,10 +548,98 @@ class Interface(object):
         This may take many seconds, as some protocols require a
         delay after a failed test.  To mitigate this, the specified
         callback function will be called before trying each
-        supported protocol.
+        supported protocol, the protocols are tried in the order
+        given by the search strategy (see set_search_strategy()),
+        and if a connection cache is installed (see obd.cache),
+        the protocol last established is tried first.
         
         Raises an exception if unable to determine the protocol
         and establish the connection.
+
+        vin -- the vehicle's VIN, if known, to look up the protocol
+            last established with that vehicle in the connection cache
+        """
+        return self._run(self._search_for_protocol_steps(vin))
+
+    def _search_for_protocol_steps(self, vin):
+        """The steps of search_for_protocol() (see obd.interface.steps)"""
+        cached = self._cached_protocol(vin)
+        start = time.time()
+        search_order = self._cached_search_order(cached)
+        if cached is None and self._get_search_strategy().precheck:
+            search_order = yield call(self._precheck_protocols, search_order)
+        for protocol, delay in search_order:
+            self._status_callback("Trying %s protocol..." % str(protocol))
+            yield call(self.set_protocol, protocol)
+            try:
+                yield call(self.connect_to_vehicle)
+                break
+            except obd.exception.ConnectionError as e:
+                debug("%s, delaying %f" % (str(e), delay))
+                yield call(self._sleep, delay)
+        else:
+            raise obd.exception.ProtocolError("unable to determine vehicle protocol")
+        self._found_protocol(protocol, cached, start, vin)
+
+        protocol = yield call(self.get_protocol)
+        raise Result(protocol)
+
+    def _cached_protocol(self, vin=None):
+        """Return the supported protocol last established through this
+        interface (or with the vehicle of the given VIN) according to
+        the connection cache, or None.
+        """
+        cache = obd.cache.get_connection_cache()
+        if not cache:
+            return None
+        name = cache.protocol(self.identifier, vin)
+        for protocol in self.get_supported_protocols():
+            if protocol is not None and str(protocol) == name:
+                return protocol
+        return None
+
+    def _get_search_strategy(self):
+        """Return the search strategy in effect for this interface"""
+        if self._search_strategy is not None:
+            return self._search_strategy
+        if obd.interface.search.default_strategy is not None:
+            return obd.interface.search.default_strategy
+        self._search_strategy = obd.interface.search.ProbableFirstSearch()
+        return self._search_strategy
+
+    def _cached_search_order(self, cached):
+        """Return the protocol search order given by the search
+        strategy, moving the given cached protocol (if any) to the front.
+        """
+        search_order = self._get_search_strategy().order(self._protocol_search_order())
+        if cached is not None:
+            search_order.sort(key=lambda pair: pair[0] != cached)
+        return search_order
+
+    def _found_protocol(self, protocol, cached, start, vin=None):
+        """Record the protocol established in the connection cache (if
+        any), given the cached protocol and the time the search started.
+        """
+        cache = obd.cache.get_connection_cache()
+        if cache:
+            cache.connected(self.identifier, str(protocol), time.time() - start,
+                            protocol == cached, vin)
+        self._get_search_strategy().connected(protocol)
+        return
+
+    def _precheck_protocols(self, search_order):
+        """Return the given list of [protocol, delay] pairs less any
+        protocols which a quick check shows can't be in use, or raise
+        a ConnectionError if no vehicle can be present.  Called before
+        searching if the search strategy asks for it; interfaces
+        without any such checks return the list unchanged.
+        """
+        return search_order
+
+    def _protocol_search_order(self):
+        """Return the list of [protocol, delay] pairs to try, in order,
+        when searching for the vehicle's protocol; the delay is the
+        time to wait after a failed attempt.
         """
         search_order = [
             [obd.protocol.PWM(), 1.0],
@@ -470,22 +653,8 @@ class Interface(object):
             [obd.protocol.ISO15765_4(id_length=29, baud=250000), 0.0],
             ]
         supported_protocols = self.get_supported_protocols()
-
-        for protocol, delay in search_order:
-            if protocol not in supported_protocols:
-                continue
-            self._status_callback("Trying %s protocol..." % str(protocol))
-            self.set_protocol(protocol)
-            try:
-                self.connect_to_vehicle()
-                break
-            except obd.exception.ConnectionError as e:
-                debug("%s, delaying %f" % (str(e), delay))
-                time.sleep(delay)
-        else:
-            raise obd.exception.ProtocolError("unable to determine vehicle protocol")
-
-        return self.get_protocol()
+        return [[protocol, delay] for protocol, delay in search_order
+                if protocol in supported_protocols]
 
 # vim: softtabstop=4 shiftwidth=4 expandtab                                     
 
@@ -44,43 +44,89 @@ interface specified by the given identifier.
 """
 
 import re
+import math
 import time
 import copy
+import Queue
+import binascii
+import threading
 import serial.serialutil
 
+import obd.cache
 import obd.serialport
 import obd.exception
+import obd.interface.steps
 import obd.message
 import obd.protocol
 from obd.util import debug, unimplemented, untested
 from obd.interface import register_interface_class
-from obd.exception import InterfaceError
+from obd.exception import InterfaceError, InterfaceBusy
 from obd.interface.base import Interface
+from obd.interface.steps import call, Result
+from obd.latency import LatencyStats
 
 
 def enumerate(callback=None):
     """Return a list of attached ELM32x OBD-II interfaces, each
     of which is an instance of the appropriate ELM32X subclass.
     
+    The ports are probed concurrently (by up to PROBE_THREADS threads),
+    so finding many interfaces takes about as long as finding one; the
+    interfaces are listed in the order of SerialPort.enumerate().
+
     callback -- the callback function to pass to the initializer
     """
-    interfaces = []
     ports = obd.serialport.SerialPort.enumerate()
-    for port in ports:
-        try:
-            serialport = obd.serialport.SerialPort(port)
-            baud = ELM32X.detect_baudrate(serialport)
-            if baud:
-                interface = create(serialport, callback, baud)
-                interfaces.append(interface)
-        except serial.serialutil.SerialException as e:
-            raise InterfaceError(str(e))
-        except InterfaceError as e:
-            pass
-        except Exception as e:
-            debug(e)
+    results = [None] * len(ports)
+    pending = Queue.Queue()
+    for index in range(len(ports)):
+        pending.put(index)
+
+    def probe_ports():
+        while True:
+            try:
+                index = pending.get_nowait()
+            except Queue.Empty:
+                return
+            results[index] = _probe_port(ports[index], callback)
+
+    threads = [threading.Thread(target=probe_ports, name="ELM probe")
+               for i in range(min(PROBE_THREADS, len(ports)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    interfaces = []
+    for result in results:
+        if isinstance(result, InterfaceError):
+            raise result
+        if result is not None:
+            interfaces.append(result)
     return interfaces
 
+# the maximum number of ports probed at once by enumerate()
+PROBE_THREADS = 16
+
+def _probe_port(port, callback=None):
+    """Return the ELM32X instance attached to the given port, None if
+    there isn't one, or an InterfaceError if the port can't be opened.
+    Runs on one of enumerate()'s threads.
+    """
+    try:
+        serialport = obd.serialport.SerialPort(port)
+        baud = _detect_baudrate(serialport)
+        if baud:
+            return create(serialport, callback, baud)
+    except serial.serialutil.SerialException as e:
+        return InterfaceError(str(e))
+    except InterfaceError as e:
+        pass
+    except Exception as e:
+        debug(e)
+    return None
+
 
 _classes = {}
 def create(port, callback=None, baud=None):
@@ -92,31 +138,34 @@ def create(port, callback=None, baud=None):
         (default None)
     baud -- the baud rate to use, or None (default) to auto-detect
     """
+    return obd.interface.steps.run(_create_steps(ELM32X, _classes, port, callback, baud))
+
+
+def _create_steps(elm, classes, port, callback, baud):
+    """The steps of create() (see obd.interface.steps), detecting the
+    interface with the given ELM32X class's detect_baudrate() and
+    _at_cmd() and creating it from the given dict of classes
+    """
     # Use the appropriate baud rate, auto-detecting if requested
     if baud:
         if port.get_baudrate() != baud:
             untested("specifying the baud rate for obd.interface.elm.create()")
             port.set_baudrate(baud)
     else:
-        current_baud = ELM32X.detect_baudrate(port)
+        cached = _cached_baudrate(port)
+        start = time.time()
+        current_baud = yield call(elm.detect_baudrate, port, first=cached)
+        _found_baudrate(port, current_baud, cached, start)
         if not current_baud:
             raise InterfaceError("Unable to connect to ELM; does it have power?")
-    # Query the interface for its identity
-    identifier = ELM32X._at_cmd(port, "ATI")
-    if identifier.startswith("ATI\r"): identifier = identifier[4:]
-    debug(identifier)
-    chip_identifier, chip_version = identifier.split(" ")
-
-    # Check for extended command set
-    extended = ELM32X._at_cmd(port, "STI")
-    if extended.startswith("STI\r"): extended = extended[4:]
-    if extended != "?":
-        untested(extended)
-        chip_identifier, chip_version = extended.rsplit(" ", 1)
+    # Query the interface for its identity (and extended command set)
+    identifier = yield call(elm._at_cmd, port, "ATI")
+    extended = yield call(elm._at_cmd, port, "STI")
+    chip_identifier = _chip_identifier(identifier, extended)
 
     # Create an instance of the appropriate ELM32X subclass
     try:
-        elm_class = _classes[chip_identifier]
+        elm_class = classes[chip_identifier]
     except KeyError as e:
         untested("unknown ELM response to ATI")
         raise InterfaceError("Unknown response to ATI: %r" % identifier)
@@ -124,8 +173,77 @@ def create(port, callback=None, baud=None):
 
     debug("%s detected on port %s at %d baud" %
           (chip_identifier, interface.port.name, interface.port.get_baudrate()))
-    return interface
-    
+    raise Result(interface)
+
+
+def _detect_baudrate(port):
+    """Detect, select, and return the baud rate at which the ELM32x
+    interface at the given port is operating, trying the baud rate in
+    the connection cache (if any) first.  See ELM32X.detect_baudrate().
+    """
+    cached = _cached_baudrate(port)
+    start = time.time()
+    baud = ELM32X.detect_baudrate(port, first=cached)
+    _found_baudrate(port, baud, cached, start)
+    return baud
+
+def _cached_baudrate(port):
+    """Return the baud rate cached for the given port, or None"""
+    cache = obd.cache.get_connection_cache()
+    if not cache:
+        return None
+    return cache.baud(port.name)
+
+def _found_baudrate(port, baud, cached, start):
+    """Record the baud rate detected on the given port (if any) in the
+    connection cache, given the cached baud rate and the time at which
+    detection started.
+    """
+    cache = obd.cache.get_connection_cache()
+    if cache and baud:
+        cache.found_baud(port.name, baud, time.time() - start, baud == cached)
+    return
+
+def _hex_bytes(ascii):
+    """Return a bytearray of the bytes encoded by the given string of
+    hex digits (without spaces)."""
+    return bytearray(binascii.unhexlify(ascii))
+
+def _squeeze(line):
+    """Return the given line without spaces, for comparison with ELM
+    messages (which may lack their spaces when spaces are turned off)."""
+    return line.replace(" ", "")
+
+# The ELM's error messages (which may lack their spaces when spaces
+# are turned off), scanned for in one pass over each response.  Each
+# named group is mapped to an exception by ELM32X._raise_error().  The
+# leading lookahead, listing the first character of every message, lets
+# the scan skip most positions without trying each alternative.
+_ERROR_SCANNER = re.compile(r"""
+    (?= [?NBDFLCR<E] ) (?:
+      (?: ^ | (?<=\r) ) (?: (?P<unsupported> \? ) | (?P<no_data> NO\ ?DATA ) ) (?= \r | $ )
+    | (?P<frame_error> <DATA\ ?ERROR )
+    | (?P<data_error> BUS\ ?BUSY | DATA\ ?ERROR ) (?= \r | $ )
+    | (?P<bus_error> BUS\ ?ERROR | FB\ ?ERROR | LV\ ?RESET ) (?= \r | $ )
+    | (?P<protocol_error> CAN\ ?ERROR | RX\ ?ERROR ) (?= \r | $ )
+    | (?P<buffer_full> BUFFER\ ?FULL ) (?= \r | $ )
+    | (?P<elm_error> ERR\d\d )
+    )""", re.VERBOSE)
+
+def _chip_identifier(identifier, extended):
+    """Return the chip identifier given the interface's responses
+    to ATI and STI (the latter being "?" unless the interface
+    supports the extended command set).
+    """
+    if identifier.startswith("ATI\r"): identifier = identifier[4:]
+    debug(identifier)
+    chip_identifier, chip_version = identifier.split(" ")
+
+    # Check for extended command set
+    if extended.startswith("STI\r"): extended = extended[4:]
+    if extended != "?":
+        chip_identifier, chip_version = extended.rsplit(" ", 1)
+    return chip_identifier
 
 
 class ELM32X(Interface):
@@ -136,8 +254,39 @@ class ELM32X(Interface):
 
     ATZ_TIMEOUT = 1.5
     AT_TIMEOUT  = 0.13
+    OBD_REQUEST_INTERVAL = 3.0
     PROMPT = ">"
 
+    # The timing selected by a reset: the interface's own adaptive
+    # timing (ATAT1) within the default response timeout (ATST 32,
+    # about 200 ms)
+    DEFAULT_TIMING = (1, 0x32)
+
+    # 38400, 9600 are the possible boot bauds (unless reprogrammed via
+    # PP 0C).  19200, 38400, 57600, 115200, 230400, 500000 are listed on
+    # p.46 of the ELM327 datasheet.
+    #
+    # Once pyserial supports non-standard baud rates on platforms other
+    # than Linux, we'll add 500K to this list.
+    #
+    # We check the two default baud rates first, then go fastest to
+    # slowest, on the theory that anyone who's using a slow baud rate is
+    # going to be less picky about the time required to detect it.
+    DETECT_BAUDRATES = [ 38400, 9600, 230400, 115200, 57600, 19200 ]
+
+    # Send a nonsense command to get a prompt back from the scanner
+    # (an empty command runs the risk of repeating a dangerous command)
+    # The first character might get eaten if the interface was busy,
+    # so write a second one (again so that the lone CR doesn't repeat
+    # the previous command)
+    DETECT_COMMAND = "\x7F\x7F\r"
+
+    # Commands sent by open() to configure the interface
+    SETUP_COMMANDS = ["ATE0", "ATL0", "ATH1"]
+
+    # The classes of port through which the interface is driven
+    _port_classes = (obd.serialport.SerialPort,)
+
     def __init__(self, port, name=None, callback=None):
         """
         port -- a SerialPort instance corresponding to the port to which
@@ -152,7 +301,7 @@ class ELM32X(Interface):
         set_status_callback().
         """
         assert type(self) != ELM32X, "ELM32X should only be instantiated via obd.interface.elm.create()"
-        assert isinstance(port, obd.serialport.SerialPort)
+        assert isinstance(port, self._port_classes)
         if name is None:
             untested()
             name = "%s compatible" % self.__class__.__name__
@@ -160,6 +309,16 @@ class ELM32X(Interface):
         self.port = port
         self.interface_configured = False
         self.connected_to_vehicle = False
+        self.response_counts = None
+        self.adaptive_timing = None
+        self._elm_timing = ELM32X.DEFAULT_TIMING
+        self.compact_output = False
+        self.omit_headers = False
+        self._synthetic_header = None
+        self._current_protocol = None
+        self.protocol_hits = 0
+        self.protocol_misses = 0
+        self.monitor_overruns = 0
         return
 
     def enumerate(callback=None):
@@ -185,38 +344,29 @@ class ELM32X(Interface):
         return interface
     create = staticmethod(create)
 
-    def detect_baudrate(port, timeout=0.03):
+    def detect_baudrate(port, timeout=0.03, first=None):
         """Detect, select, and return the baud rate at which a connected
         ELM32x interface is operating.
 
         Return None if the baud rate couldn't be determined.
+
+        first -- a baud rate to try before DETECT_BAUDRATES (e.g. the
+            one last detected)
         """
-        # 38400, 9600 are the possible boot bauds (unless reprogrammed via
-        # PP 0C).  19200, 38400, 57600, 115200, 230400, 500000 are listed on
-        # p.46 of the ELM327 datasheet.
-        #
-        # Once pyserial supports non-standard baud rates on platforms other
-        # than Linux, we'll add 500K to this list.
-        #
-        # We check the two default baud rates first, then go fastest to
-        # slowest, on the theory that anyone who's using a slow baud rate is
-        # going to be less picky about the time required to detect it.
-        bauds = [ 38400, 9600, 230400, 115200, 57600, 19200 ]
-
-        for baud in bauds:
+        return obd.interface.steps.run(ELM32X._detect_baudrate_steps(port, timeout, first))
+    detect_baudrate = staticmethod(detect_baudrate)
+
+    def _detect_baudrate_steps(port, timeout, first):
+        """(Static) The steps of detect_baudrate() (see
+        obd.interface.steps)"""
+        for baud in ELM32X._baudrate_search_order(first):
             port.set_baudrate(baud)
             port.clear_rx_buffer()
             port.clear_tx_buffer()
-
-            # Send a nonsense command to get a prompt back from the scanner
-            # (an empty command runs the risk of repeating a dangerous command)
-            # The first character might get eaten if the interface was busy,
-            # so write a second one (again so that the lone CR doesn't repeat
-            # the previous command)
-            port.write("\x7F\x7F\r")
+            port.write(ELM32X.DETECT_COMMAND)
             port.set_timeout(timeout)
             try:
-                response = port.read_until_string(ELM32X.PROMPT)
+                response = yield call(port.read_until_string, ELM32X.PROMPT)
             except obd.exception.Timeout:
                 continue
 
@@ -227,8 +377,17 @@ class ELM32X(Interface):
         else:
             baud = None
 
-        return baud
-    detect_baudrate = staticmethod(detect_baudrate)
+        raise Result(baud)
+    _detect_baudrate_steps = staticmethod(_detect_baudrate_steps)
+
+    def _baudrate_search_order(first=None):
+        """(Static) Return the baud rates to try, in order, when
+        detecting the baud rate, starting with the given one (if any).
+        """
+        if not first:
+            return ELM32X.DETECT_BAUDRATES
+        return [first] + [b for b in ELM32X.DETECT_BAUDRATES if b != first]
+    _baudrate_search_order = staticmethod(_baudrate_search_order)
 
     def open(self):
         """Configure the interface (scan tool) for use.
@@ -237,15 +396,18 @@ class ELM32X(Interface):
         opens the connection between the computer and the interface.
         See connect_to_vehicle() for comparison.
         """
+        return self._run(self._open_steps())
+
+    def _open_steps(self):
+        """The steps of open() (see obd.interface.steps)"""
         if self.interface_configured: return
 
         self.interface_configured = True  # set initially to keep at_cmd from barking
         complete = False
         try:
-            self.reset()
-            self.at_cmd("ATE0")
-            self.at_cmd("ATL0")
-            self.at_cmd("ATH1")
+            yield call(self.reset)
+            for cmd in self._setup_commands():
+                yield call(self.at_cmd, cmd)
             complete = True
         finally:
             # set to its true state before raising any exceptions up the chain
@@ -253,21 +415,38 @@ class ELM32X(Interface):
 
         return
 
+    def _setup_commands(self):
+        """Return the list of commands sent by open() to configure the
+        interface, including ATS0 if compact output is enabled.
+        """
+        commands = list(self.SETUP_COMMANDS)
+        if self.compact_output:
+            commands.append("ATS0")
+        return commands
+
     def reset(self, quick=True):
         """Reset the interface (scan tool)
         
         quick -- peform a quick reset (if supported), otherwise perform
             a slower, full reset
         """
+        return self._run(self._reset_steps(quick))
+
+    def _reset_steps(self, quick):
+        """The steps of reset() (see obd.interface.steps)"""
+        self._elm_timing = ELM32X.DEFAULT_TIMING
+        self._synthetic_header = None
+        self._current_protocol = None
         if quick:
-            self.at_cmd("ATWS")
+            yield call(self.at_cmd, "ATWS")
         else:
             # Since the baud rate might change after the ATZ, we just wait
             # and clear the receive buffer.
             self._write("ATZ\r")
-            time.sleep(ELM32X.ATZ_TIMEOUT)
+            yield call(self._sleep, ELM32X.ATZ_TIMEOUT)
             self.port.clear_rx_buffer()  # ignore any garbage due to wrong baud rate
-            debug("baud on reset = %s" % ELM32X.detect_baudrate(self.port))
+            baud = yield call(self.detect_baudrate, self.port)
+            debug("baud on reset = %s" % baud)
         return
 
     def close(self):
@@ -275,9 +454,13 @@ class ELM32X(Interface):
         or may not disconnect the communication session between
         the interface and the vehicle, depending on implementation.
         """
+        return self._run(self._close_steps())
+
+    def _close_steps(self):
+        """The steps of close() (see obd.interface.steps)"""
         if not self.interface_configured: return
 
-        self.reset(quick=False)
+        yield call(self.reset, quick=False)
         return
 
     def _at_cmd(port, cmd, timeout=None):
@@ -312,6 +495,135 @@ class ELM32X(Interface):
         token -- the token required to send a Reset message
             (if applicable)
         """
+        return self._run(self._send_obd_message_steps(message, header, token))
+
+    def _send_obd_message_steps(self, message, header, token):
+        """The steps of _send_obd_message() (see obd.interface.steps)"""
+        timing = self._timing_for(message)
+        for cmd in self._timing_commands(timing):
+            yield call(self.at_cmd, cmd)
+        self._elm_timing = timing
+
+        command, count = self._hint_response_count(message, self._obd_command(message, header, token))
+        start = time.time()
+        self._write(command)
+        self._set_timeout(*self._request_timeout(message))
+        try:
+            response = yield call(self._read_response)
+        except obd.exception.OBDException as e:
+            self._response_count_failed(message, count, e)
+            self._timing_failed(message)
+            raise e
+        raw_frames = self._message_bytes_from_ascii(response)
+        self._learn_response_count(message, count, raw_frames, start)
+        self._learn_timing(message, count, raw_frames, start)
+        raise Result(raw_frames)
+
+    def _timing_for(self, message):
+        """Return the (ATAT, ATST) timing with which to send the given
+        message: a fixed timeout learned for its service if adaptive
+        timing is enabled (see ELM327.enable_adaptive_timing()) and the
+        latencies are known, otherwise the interface defaults.
+        """
+        if not self.adaptive_timing:
+            return ELM32X.DEFAULT_TIMING
+        current = None
+        if self._elm_timing[0] == 0:
+            current = self._elm_timing[1]
+        timeout = self.adaptive_timing.elm_timeout(message[0], current)
+        if timeout is None:
+            return ELM32X.DEFAULT_TIMING
+        return (0, timeout)
+
+    def _timing_commands(self, timing):
+        """Return the list of AT commands which change the interface's
+        current timing to the given (ATAT, ATST) timing.
+        """
+        commands = []
+        if timing[0] != self._elm_timing[0]:
+            commands.append("ATAT%d" % timing[0])
+        if timing[1] != self._elm_timing[1]:
+            commands.append("ATST %02X" % timing[1])
+        return commands
+
+    def _request_timeout(self, message):
+        """Return the (timeout, interval) to allow for the response to
+        the given message, which is shortened to fit the learned
+        latencies when the interface's timeout has been programmed to
+        match them.
+        """
+        timeout = Interface.OBD_REQUEST_TIMEOUT
+        interval = ELM32X.OBD_REQUEST_INTERVAL
+        if self.adaptive_timing and self._elm_timing[0] == 0:
+            timeout, interval = self.adaptive_timing.host_timeout(
+                message[0], self._elm_timing[1], timeout, interval)
+        return timeout, interval
+
+    def _learn_timing(self, message, count, raw_frames, start):
+        """Record the latency of the response to the message, given the
+        count hinted (if any) and the time at which it was sent.
+        """
+        if not self.adaptive_timing or not raw_frames:
+            return
+        elapsed = time.time() - start
+        latency = elapsed
+        if count is None and self._elm_timing[0] == 0:
+            # the interface waited out its timeout after the last response
+            latency -= self._elm_timing[1] * AdaptiveTiming.ST_UNIT
+        ecus = set([self.vehicle_protocol.create_header(f).tx_id for f in raw_frames])
+        self.adaptive_timing.received(message[0], ecus, elapsed, max(0.0, latency))
+        return
+
+    def _timing_failed(self, message):
+        """Drop the learned latencies for the service of a message whose
+        request failed under a timeout programmed to match them (in case
+        the timeout was too short).
+        """
+        if self.adaptive_timing and self._elm_timing[0] == 0:
+            self.adaptive_timing.forget(message[0])
+        return
+
+    def _hint_response_count(self, message, command):
+        """Return the command with the expected number of response
+        frames appended (if known and hints are enabled; see
+        ELM327.enable_response_counts()), along with that count
+        (or None).
+        """
+        if not self.response_counts:
+            return command, None
+        count = self.response_counts.expected(message)
+        if count is None:
+            return command, None
+        return "%s %X\r" % (command[:-1], count), count
+
+    def _learn_response_count(self, message, count, raw_frames, start):
+        """Record the number of frames received in response to the
+        message, given the count hinted (if any) and the time at
+        which the request was sent.
+        """
+        if self.response_counts:
+            self.response_counts.received(message, len(raw_frames),
+                                          time.time() - start, count)
+        return
+
+    def _response_count_failed(self, message, count, e):
+        """Drop any learned response count for a message whose request
+        raised the given exception, disabling the hints altogether if
+        the interface doesn't understand them.
+        """
+        if not self.response_counts:
+            return
+        if count is not None and isinstance(e, obd.exception.CommandNotSupported):
+            untested("interface without response count support")
+            self.response_counts = None
+            return
+        self.response_counts.forget(message)
+        return
+
+    def _obd_command(self, message, header=None, token=None):
+        """Return the command string which transmits the given OBD
+        message.  See _send_obd_message() for the arguments.
+        """
         assert self.interface_configured
         assert self.connected_to_vehicle
         if header:
@@ -321,17 +633,17 @@ class ELM32X(Interface):
         # it's intentional (raising an exception if not)
         if message[0] == 0x04:
             self._verify_token(token)
-        message = " ".join(["%02X" % b for b in message])
-        self._write("%s\r" % message)
-
-        self._set_timeout(Interface.OBD_REQUEST_TIMEOUT, 3.0)
-        response = self._read_response()
-        return self._message_bytes_from_ascii(response)
+        separator = " "
+        if self.compact_output: separator = ""
+        message = separator.join(["%02X" % b for b in message])
+        return "%s\r" % message
 
     def _message_bytes_from_ascii(self, ascii_messages):
-        """Convert each ASCII message into a list of raw bytes
+        """Convert each ASCII message into a bytearray of raw bytes
         and return the list of raw messages.
         """
+        if self._synthetic_header:
+            return self._message_bytes_from_headerless_ascii(ascii_messages)
         raw_messages = []
         debug(ascii_messages)
         for message in ascii_messages:
@@ -339,10 +651,43 @@ class ELM32X(Interface):
             # pad 11-bit CAN headers out to 32 bits for consistency,
             # since ELM already does this for 29-bit CAN headers
             if len(message) & 1: message = "00000" + message
-            raw_message = []
-            for i in range(0, len(message), 2):
-                raw_message.append(int(message[i:i+2], 16))
-            raw_messages.append(raw_message)
+            raw_messages.append(_hex_bytes(message))
+        debug(raw_messages)
+        return raw_messages
+
+    def _message_bytes_from_headerless_ascii(self, ascii_messages):
+        """Convert ASCII CAN messages received with headers off into
+        raw frames, restoring the header of the one ECU in the session
+        and the PCI bytes which the ELM omits.
+
+        With headers off, the ELM prints single frames as their data
+        alone, and multi-frame messages as a line giving the message
+        length followed by numbered lines of data (e.g. "014", "0: 49
+        02 01 31 44 34", "1: 47 ...").
+        """
+        raw_messages = []
+        debug(ascii_messages)
+        length = None
+        for message in ascii_messages:
+            message = message.replace(" ", "")
+            if len(message) & 1:
+                # the length line of a multi-frame message
+                length = int(message, 16)
+                continue
+            index = message.find(":")
+            if index == -1:
+                data = _hex_bytes(message)
+                pci = bytearray([len(data)])
+            elif length is not None:
+                # the first frame (numbered 0, as are later consecutive
+                # frames once the sequence numbers wrap around)
+                data = _hex_bytes(message[index+1:])
+                pci = bytearray([0x10 | (length >> 8), length & 0xFF])
+                length = None
+            else:
+                data = _hex_bytes(message[index+1:])
+                pci = bytearray([0x20 | int(message[:index], 16)])
+            raw_messages.append(self._synthetic_header + pci + data)
         debug(raw_messages)
         return raw_messages
 
@@ -374,7 +719,13 @@ class ELM32X(Interface):
         (such as create()) to read an ELM response.  The publicly
         exposed version of this is an instance method.
         """
-        response = port.read_until_string(ELM32X.PROMPT)
+        return ELM32X._strip_prompt(port.read_until_string(ELM32X.PROMPT))
+    _static_read_until_prompt = staticmethod(_static_read_until_prompt)
+
+    def _strip_prompt(response):
+        """(Static) Return the given response, read through the prompt,
+        without the prompt and surrounding EOLs.
+        """
         # remove trailing prompt string
         if response.endswith(ELM32X.PROMPT):
             response = response[:-len(ELM32X.PROMPT)]
@@ -384,7 +735,7 @@ class ELM32X(Interface):
         if response.startswith("STOPPED"):
             raise InterfaceBusy(response)
         return response
-    _static_read_until_prompt = staticmethod(_static_read_until_prompt)
+    _strip_prompt = staticmethod(_strip_prompt)
 
     def _read_until_prompt(self):
         """Read from the interface until the prompt is received
@@ -415,13 +766,12 @@ class ELM32X(Interface):
         On an ELM32x interface, this sends an initial OBD command to
         initiate the connection.
         """
-        self._current_status = ""
-        self.open()
-        if self.connected_to_vehicle:
-            raise obd.exception.CommandNotSupported("Already connected to vehicle")
-        self._protocol_response = None
-        
-        self._status_callback("Connecting to vehicle...")
+        return self._run(self._connect_to_vehicle_steps())
+
+    def _connect_to_vehicle_steps(self):
+        """The steps of connect_to_vehicle() (see obd.interface.steps)"""
+        yield call(self.open)
+        self._begin_connection()
         self._write("0100\r")  # must be supported by all OBD-II vehicles
         self._set_timeout(Interface.OBD_REQUEST_TIMEOUT)
 
@@ -430,56 +780,110 @@ class ELM32X(Interface):
         status_line = False
         while not line.endswith("\r"):
             try:
-                line += self._read_until_string("")
+                data = yield call(self._read_until_string, "")
             except obd.exception.ReadTimeout as e:
                 raise InterfaceError(raw=line+e.response)
-
-            if not status_line:
-                if line.startswith("SEARCHING..."):
-                    status_line = True
-                    self._status_callback("Searching for protocol...")
-                elif line.startswith("BUS INIT: "):
-                    status_line = True
-                    self._status_callback("Initializing bus...")
-
-            if status_line and line == "SEARCHING...\r":
-                # The subsequent line will either be the error message
-                # or the OBD response, so eat this line and keep going.
-                status_line = False
-                line = ""
-            continue
+            line += data
+            line, status_line = self._connection_status(line, status_line)
 
         # Handle connection failures
-        line = line[:-1] # strip \r
         try:
-            if line.startswith("STOPPED"):
-                raise obd.exception.InterfaceBusy(line)
-            if line.endswith("UNABLE TO CONNECT") or line.endswith("ERROR"):
-                raise obd.exception.ConnectionError(raw=line)
-            if line.startswith("BUS INIT: ") and not line.endswith("OK"):
-                raise obd.exception.ConnectionError(raw=line)
-            if line == "NO DATA":
-                raise obd.exception.ConnectionError(raw=line) # probably not SAE J1850
+            self._check_connection(line)
         except obd.exception.OBDException as e:
-            self._read_until_prompt() # swallow the rest of the response
+            yield call(self._read_until_prompt) # swallow the rest of the response
             raise e
-        line += "\r" # re-add \r
     
         # Read the actual OBD response
         if status_line: line = ""  # swallow any status line
-        lines = self._read_response(previous_data=line)
+        lines = yield call(self._read_response, previous_data=line)
         debug("result: " + str(lines))
 
         # Determine and verify the protocol established
         self.connected_to_vehicle = True
-        self.vehicle_protocol = self.get_protocol()
+        self.vehicle_protocol = yield call(self.get_protocol)
 
         # Process the response to make sure we got valid data
         raw_frames = self._message_bytes_from_ascii(lines)
         self._process_obd_response(raw_frames)
+        if self.response_counts:
+            self.response_counts.received([0x01, 0x00], len(raw_frames))
+
+        # Turn headers off if only one ECU responded (and it's wanted)
+        header = self._single_ecu_header(raw_frames)
+        if header:
+            yield call(self.at_cmd, "ATH0")
+            self._synthetic_header = header
 
         # Return the actual protocol established
-        return self.vehicle_protocol
+        raise Result(self.vehicle_protocol)
+
+    def _single_ecu_header(self, raw_frames):
+        """Return the header shared by the given frames, received in
+        response to the connection request, if headers are to be omitted
+        (see ELM327.enable_compact_output()) and can be restored from it;
+        otherwise return None.
+        """
+        if not self.omit_headers or not raw_frames:
+            return None
+        if not isinstance(self.vehicle_protocol, obd.protocol.ISO15765_4):
+            return None
+        size = self.vehicle_protocol.header_size
+        header = raw_frames[0][:size]
+        for frame in raw_frames:
+            if frame[:size] != header:
+                return None
+        return header
+
+    def _begin_connection(self):
+        """Prepare to initiate a communication session with the
+        vehicle, raising an exception if one is already active.
+        """
+        self._current_status = ""
+        if self.connected_to_vehicle:
+            raise obd.exception.CommandNotSupported("Already connected to vehicle")
+        self._protocol_response = None
+        self._current_protocol = None
+        self._status_callback("Connecting to vehicle...")
+        return
+
+    def _connection_status(self, line, status_line):
+        """Provide status updates for the partial line read so far in
+        response to the connection request, and return the updated
+        (line, status_line) pair.
+
+        line -- the partial line read so far
+        status_line -- True if the line is known to be a status line
+        """
+        if not status_line:
+            if line.startswith("SEARCHING..."):
+                status_line = True
+                self._status_callback("Searching for protocol...")
+            elif _squeeze(line).startswith("BUSINIT:"):
+                status_line = True
+                self._status_callback("Initializing bus...")
+
+        if status_line and line == "SEARCHING...\r":
+            # The subsequent line will either be the error message
+            # or the OBD response, so eat this line and keep going.
+            status_line = False
+            line = ""
+        return line, status_line
+
+    def _check_connection(self, line):
+        """Raise an exception if the first complete line of the
+        response to the connection request reports a failure.
+        """
+        line = line[:-1] # strip \r
+        squeezed = _squeeze(line)
+        if line.startswith("STOPPED"):
+            raise obd.exception.InterfaceBusy(line)
+        if squeezed.endswith("UNABLETOCONNECT") or line.endswith("ERROR"):
+            raise obd.exception.ConnectionError(raw=line)
+        if squeezed.startswith("BUSINIT:") and not line.endswith("OK"):
+            raise obd.exception.ConnectionError(raw=line)
+        if squeezed == "NODATA":
+            raise obd.exception.ConnectionError(raw=line) # probably not SAE J1850
+        return
     
     def disconnect_from_vehicle(self):
         """Terminate an existing communication session with a
@@ -487,10 +891,19 @@ class ELM32X(Interface):
         
         Raises an exception if there is no active session.
         """
+        return self._run(self._disconnect_from_vehicle_steps())
+
+    def _disconnect_from_vehicle_steps(self):
+        """The steps of disconnect_from_vehicle() (see
+        obd.interface.steps)"""
         if not self.connected_to_vehicle:
             raise obd.exception.CommandNotSupported("Already disconnected from vehicle")
-        self.at_cmd("ATPC")
+        yield call(self.at_cmd, "ATPC")
         self.connected_to_vehicle = False
+        self._current_protocol = None
+        if self._synthetic_header:
+            yield call(self.at_cmd, "ATH1")
+            self._synthetic_header = None
         return
         
     def _read_response(self, previous_data=""):
@@ -503,46 +916,60 @@ class ELM32X(Interface):
         previous_data -- data previously read from the interface
             which should be considered part of the response
         """
-        response = previous_data + self._read_until_prompt()
+        return self._parse_response(previous_data + self._read_until_prompt())
+
+    def _parse_response(self, response):
+        """Split the given response into ASCII OBD frames and return
+        the list of frames.  See _read_response() for details.
+        """
         response = response.strip("\r")
-        lines = response.split("\r")
-        for line in lines:
-            # Raise exceptions for any errors
-            if line == "?":
-                raise obd.exception.CommandNotSupported()
-
-            if line == "NO DATA":
-                raise obd.exception.DataError(raw=line)            
-            if line.endswith("BUS BUSY") or line.endswith("DATA ERROR"):
-                untested("data error")
-                raise obd.exception.DataError(raw=line)
-            if line.endswith("BUS ERROR") or line.endswith("FB ERROR") or line.endswith("LV RESET"):
-                untested("bus error")
-                raise obd.exception.BusError(raw=line)
-            if line.endswith("CAN ERROR") or line.endswith("RX ERROR"):
-                untested("protocol error")
-                raise obd.exception.ProtocolError(raw=line)
-            if line.endswith("BUFFER FULL"):
-                untested("buffer overflow")
-                raise BufferOverflowError()
-
-            if line.find("<DATA ERROR") != -1:
-                untested("frame data error")
-                # Once we have a test case, we should probably simply replace
-                # lines with bad bytes with "None" for each byte; then
-                # process_obd_response or send_request will raise the error.
-                raise obd.exception.DataError(raw=line)
-
-            matched = re.search(r"ERR\d\d", line)
-            if (matched):
-                untested("internal ELM error")  # or does this only occur on connection?
-                error = matched.group(0)
-                if error == "ERR94":
-                    # ERR94 is a fatal CAN error according to p.52-53 of the ELM327 datasheet
-                    raise obd.exception.BusError(raw=line)
-                raise ELM32XError(error)
-
-        return lines
+        # Raise an exception for the first error in the response
+        matched = _ERROR_SCANNER.search(response)
+        if matched:
+            self._raise_error(response, matched)
+        return response.split("\r")
+
+    def _raise_error(self, response, matched):
+        """Raise the exception corresponding to the error message found
+        by _ERROR_SCANNER in the given response.
+        """
+        start = response.rfind("\r", 0, matched.start()) + 1
+        end = response.find("\r", matched.end())
+        if end == -1: end = len(response)
+        line = response[start:end]
+
+        error = matched.lastgroup
+        if error == "unsupported":
+            raise obd.exception.CommandNotSupported()
+        if error == "no_data":
+            raise obd.exception.DataError(raw=line)
+        if error == "data_error":
+            untested("data error")
+            raise obd.exception.DataError(raw=line)
+        if error == "bus_error":
+            untested("bus error")
+            self._current_protocol = None  # the bus may have been reset
+            raise obd.exception.BusError(line)
+        if error == "protocol_error":
+            untested("protocol error")
+            raise obd.exception.ProtocolError(raw=line)
+        if error == "buffer_full":
+            untested("buffer overflow")
+            raise obd.exception.BufferOverflowError(raw=line)
+        if error == "frame_error":
+            untested("frame data error")
+            # Once we have a test case, we should probably simply replace
+            # lines with bad bytes with "None" for each byte; then
+            # process_obd_response or send_request will raise the error.
+            raise obd.exception.DataError(raw=line)
+
+        untested("internal ELM error")  # or does this only occur on connection?
+        error = matched.group(error)
+        if error == "ERR94":
+            # ERR94 is a fatal CAN error according to p.52-53 of the ELM327 datasheet
+            self._current_protocol = None
+            raise obd.exception.BusError(line)
+        raise ELM32XError(error)
 
 register_interface_class(ELM32X)
 
@@ -565,6 +992,15 @@ class ELM327(ELM32X):
         "9": obd.protocol.ISO15765_4(id_length=29, baud=250000),
         "A": obd.protocol.SAE_J1939(id_length=29, baud=250000)
         }
+    # the lowest voltage (read by ATRV) at which a vehicle may be present
+    MIN_VEHICLE_VOLTAGE = 8.0
+    # the time to listen for traffic when checking for a CAN bus
+    CAN_MONITOR_TIME = 0.1
+    # the longest monitor() waits for a line before checking its duration
+    MONITOR_POLL_TIME = 0.1
+    # how long monitor() listens between resetting its read timeout, if
+    # given no duration
+    MONITOR_TIMEOUT = 3600.0
 
     def __init__(self, port, name=None, callback=None):
         """
@@ -591,6 +1027,64 @@ class ELM327(ELM32X):
     supported_protocols = property(get_supported_protocols,
                                    doc="The list of supported protocols for this interface.")
 
+    def enable_response_counts(self, enabled=True):
+        """Enable (or disable) response count hints.
+
+        Unless told how many responses to expect, the ELM327 waits out
+        its full response timeout for any further ECUs to respond before
+        returning the prompt.  When enabled, the interface learns how many
+        frames are returned for each distinct request and appends that
+        count to subsequent requests, letting the ELM327 return as soon
+        as they arrive.  See ResponseCounts for details, including how
+        the counts are verified.
+
+        The statistics (including an estimate of the time saved) are
+        available via the response_counts attribute.
+        """
+        if not enabled:
+            self.response_counts = None
+        elif not self.response_counts:
+            self.response_counts = ResponseCounts()
+        return
+
+    def enable_adaptive_timing(self, enabled=True):
+        """Enable (or disable) adaptive timing.
+
+        By default, every request waits out the interface's response
+        timeout (about 200 ms, less whatever the ELM327's own adaptive
+        timing trims) and allows the host a generous deadline on top.
+        When enabled, the interface learns the latency of each ECU's
+        responses to each service and programs the ELM327's timeout
+        (ATST, with ATAT0) to fit them, shortening the host deadlines to
+        match.  See AdaptiveTiming for details.
+
+        The latency statistics are available via the adaptive_timing
+        attribute.  Disabling restores the default timing with the
+        next request.
+        """
+        if not enabled:
+            self.adaptive_timing = None
+        elif not self.adaptive_timing:
+            self.adaptive_timing = AdaptiveTiming()
+        return
+
+    def enable_compact_output(self, enabled=True, omit_headers=False):
+        """Enable (or disable) compact output, taking effect the next
+        time the interface is opened (e.g. by connect_to_vehicle()).
+
+        By default, the ELM327 separates each byte it prints with a
+        space and prefixes each frame with its header.  When enabled,
+        spaces are turned off (ATS0) and requests are sent without them,
+        cutting the characters sent per byte from three to two.
+
+        omit_headers -- also turn headers off (ATH0) if only one ECU
+            responds when connecting to an ISO 15765-4 vehicle, restoring
+            that ECU's header (and the PCI bytes) to each frame received
+        """
+        self.compact_output = enabled
+        self.omit_headers = enabled and omit_headers
+        return
+
     def set_protocol(self, protocol):
         """Select the protocol to use for communicating with the vehicle.
         This will disconnect any communication session with the vehicle
@@ -599,25 +1093,264 @@ class ELM327(ELM32X):
         protocol -- the protocol to use, or None for automatic selection
             by the interface
         """
-        if self.connected_to_vehicle: self.disconnect_from_vehicle()
-        for key, value in self._supported_protocols.items():
-            if value == protocol:
-                self.at_cmd("ATTP %s" % key)
-                break
+        return self._run(self._set_protocol_steps(protocol))
+
+    def _set_protocol_steps(self, protocol):
+        """The steps of set_protocol() (see obd.interface.steps)"""
+        if self.connected_to_vehicle:
+            yield call(self.disconnect_from_vehicle)
+        if self.response_counts: self.response_counts.clear()
+        if self.adaptive_timing: self.adaptive_timing.clear()
+        self._current_protocol = None
+        yield call(self.at_cmd, "ATTP %s" % self._protocol_key(protocol))
+        return
+
+    def _precheck_protocols(self, search_order):
+        """Rule out protocols before searching (see
+        Interface._precheck_protocols()).  Raises a ConnectionError if
+        the voltage at the OBD port (ATRV) is too low for a vehicle to
+        be present, and if CAN frames are heard when monitoring the bus
+        (ATMA) at 500 kbps, leaves only the ISO 15765-4 protocols.
+        """
+        return self._run(self._precheck_protocols_steps(search_order))
+
+    def _precheck_protocols_steps(self, search_order):
+        """The steps of _precheck_protocols() (see obd.interface.steps)"""
+        response = yield call(self.at_cmd, "ATRV")
+        self._check_voltage(response)
+        if not self._can_search_order(search_order):
+            raise Result(search_order)
+        yield call(self.set_protocol, self._supported_protocols["6"])
+        self._write("ATMA\r")
+        self._set_timeout(ELM327.CAN_MONITOR_TIME)
+        try:
+            line = yield call(self.port.read_until_string, "\r")
+        except obd.exception.Timeout:
+            line = ""
+        # any character stops the monitor
+        self._write("\r")
+        self._set_timeout(ELM32X.AT_TIMEOUT)
+        try:
+            yield call(self.port.read_until_string, ELM32X.PROMPT)
+        except obd.exception.Timeout:
+            pass
+        raise Result(self._search_order_for_traffic(search_order, line))
+
+    def _check_voltage(self, response):
+        """Raise a ConnectionError if the given response to ATRV
+        (e.g. "12.6V") is too low a voltage for a vehicle to be present.
+        Other responses (such as "?" from ELM327s predating ATRV) are
+        ignored.
+        """
+        try:
+            voltage = float(response.strip().rstrip("V"))
+        except ValueError:
+            return
+        if voltage < ELM327.MIN_VEHICLE_VOLTAGE:
+            raise obd.exception.ConnectionError("No vehicle detected (%.1fV)" % voltage)
+        return
+
+    def _can_search_order(search_order):
+        """(Static) Return the given list of [protocol, delay] pairs
+        less any protocols other than ISO 15765-4 (CAN).
+        """
+        return [pair for pair in search_order
+                if isinstance(pair[0], obd.protocol.ISO15765_4)]
+    _can_search_order = staticmethod(_can_search_order)
+
+    def _search_order_for_traffic(self, search_order, line):
+        """Return the given search order, restricted to the CAN
+        protocols if the given line received while monitoring the bus
+        is a CAN frame.
+        """
+        line = _squeeze(line.strip("\r"))
+        try:
+            int(line, 16)
+        except ValueError:
+            debug("no CAN traffic: %r" % line)
+            return search_order
+        debug("CAN traffic: %r" % line)
+        return self._can_search_order(search_order)
+
+    def monitor(self, receive_address=None, duration=None):
+        """Listen to the vehicle's bus without sending any requests,
+        yielding a (timestamp, frame) pair for each frame received,
+        where the frame is the appropriate Frame subclass for the
+        session protocol and the timestamp is the time.time() at which
+        it was read.  (An obd.reassembly.StreamReassembler can turn the
+        frames into bus messages.)
+
+        receive_address -- on CAN, the ID (e.g. 0x7E8) of the only
+            transmitter to listen to (ATCRA), or None (the default)
+            for all traffic
+        duration -- the time (in seconds) to listen for, or None (the
+            default) to listen until the generator is closed
+
+        The interface monitors the bus (ATMA) with headers on.  Each
+        read takes every complete line received so far, so frames
+        read together share a timestamp.  If the interface's buffer
+        fills (BUFFER FULL), the frames it dropped are lost but
+        monitoring resumes, counting the overrun in monitor_overruns
+        rather than raising a BufferOverflowError.  Lines that aren't
+        frames (e.g. "<DATA ERROR") are skipped.
+
+        Raises an exception if not connected with a vehicle.
+        """
+        if not self.connected_to_vehicle:
+            raise obd.exception.CommandNotSupported("Not connected to vehicle")
+        setup, cleanup = self._monitor_commands(receive_address)
+        for cmd in setup:
+            self.at_cmd(cmd)
+        end = None
+        if duration is not None:
+            end = time.time() + duration
+        try:
+            self._write("ATMA\r")
+            self._set_monitor_timeout(end)
+            partial = ""
+            while end is None or time.time() < end:
+                try:
+                    data = self.port.read_until_string("\r", last=True)
+                except obd.exception.Timeout as e:
+                    partial += e.response
+                    if partial.endswith(ELM32X.PROMPT):
+                        # the interface stopped monitoring on its own
+                        partial = ""
+                        self._write("ATMA\r")
+                    if isinstance(e, obd.exception.ReadTimeout):
+                        self._set_monitor_timeout(end)
+                    continue
+                # keep any incomplete line for the next read
+                lines = (partial + data).split("\r")
+                partial = lines.pop()
+                timestamp = time.time()
+                for line in lines:
+                    squeezed = _squeeze(line.strip(">"))
+                    if squeezed == "BUFFERFULL":
+                        self._resume_monitor()
+                        self._set_monitor_timeout(end)
+                        break
+                    raw_frame = self._monitor_frame(squeezed)
+                    if raw_frame is not None:
+                        yield timestamp, self._parse_frame(raw_frame)
+        finally:
+            self._stop_monitor()
+            for cmd in cleanup:
+                self.at_cmd(cmd)
+        return
+
+    def _monitor_commands(self, receive_address):
+        """Return the lists of AT commands to send before and after
+        monitoring (see monitor()) for the given receive address.
+        """
+        setup, cleanup = [], []
+        if receive_address is not None:
+            if not isinstance(self.vehicle_protocol, obd.protocol.CAN):
+                raise ValueError("Receive addresses are only supported on CAN")
+            if self.vehicle_protocol.id_length == 11:
+                setup.append("ATCRA %03X" % receive_address)
+            else:
+                setup.append("ATCRA %08X" % receive_address)
+            cleanup.append("ATCRA")
+        if self._synthetic_header:
+            setup.append("ATH1")
+            cleanup.append("ATH0")
+        return setup, cleanup
+
+    def _set_monitor_timeout(self, end):
+        """Set the timeout for reading monitor output until the given
+        time (or for MONITOR_TIMEOUT if None), waiting no longer than
+        MONITOR_POLL_TIME for each read.
+        """
+        if end is None:
+            timeout = ELM327.MONITOR_TIMEOUT
         else:
-            untested("unsupported protocol requested of ELM")
-            raise ValueError("Unsupported protocol: %s" % str(protocol))
+            timeout = max(0.0, end - time.time())
+        self._set_timeout(timeout, ELM327.MONITOR_POLL_TIME)
+        return
+
+    def _monitor_frame(self, line):
+        """Return the raw frame shown by the given line (without
+        spaces) of monitor output, or None if it isn't a frame.
+        """
+        # pad 11-bit CAN headers out to 32 bits, as for responses
+        if len(line) & 1: line = "00000" + line
+        try:
+            raw_frame = _hex_bytes(line)
+        except TypeError:
+            return None
+        if len(raw_frame) <= self.vehicle_protocol.header_size:
+            return None
+        return raw_frame
+
+    def _resume_monitor(self):
+        """Resume monitoring after the interface's buffer filled,
+        which stops the monitor.
+        """
+        self.monitor_overruns += 1
+        debug("monitor buffer full; resuming")
+        self._set_timeout(ELM32X.AT_TIMEOUT)
+        try:
+            self.port.read_until_string(ELM32X.PROMPT)
+        except obd.exception.Timeout:
+            pass
+        self._write("ATMA\r")
         return
+
+    def _stop_monitor(self):
+        """Stop monitoring, discarding any frames not yet read"""
+        # any character stops the monitor
+        self._write("\r")
+        self._set_timeout(ELM32X.AT_TIMEOUT)
+        try:
+            self.port.read_until_string(ELM32X.PROMPT)
+        except obd.exception.Timeout:
+            pass
+        return
+
+    def _protocol_key(self, protocol):
+        """Return the ELM protocol number of the given protocol,
+        raising a ValueError if it's not supported.
+        """
+        for key, value in self._supported_protocols.items():
+            if value == protocol:
+                return key
+        untested("unsupported protocol requested of ELM")
+        raise ValueError("Unsupported protocol: %s" % str(protocol))
     
     def get_protocol(self):
         """Return the current protocol being used in communication with the
         vehicle.
 
+        The protocol is read from the interface (ATDPN) once per
+        session and cached until the protocol is changed, the session
+        ends, or a bus error suggests the bus was reset; the
+        protocol_hits and protocol_misses attributes count the calls
+        answered from the cache and from the interface.  Each call
+        returns a copy, which the caller is free to modify.
+
         Raises an exception if not connected with a vehicle.
         """
+        return self._run(self._get_protocol_steps())
+
+    def _get_protocol_steps(self):
+        """The steps of get_protocol() (see obd.interface.steps)"""
         if not self.connected_to_vehicle:
             raise obd.exception.CommandNotSupported("Not connected to vehicle")
-        response = self.at_cmd("ATDPN")
+        if self._current_protocol is not None:
+            self.protocol_hits += 1
+        else:
+            self.protocol_misses += 1
+            response = yield call(self.at_cmd, "ATDPN")
+            self._current_protocol = self._protocol_from_response(response)
+        # return a copy to prevent muddling the cached protocol
+        raise Result(copy.copy(self._current_protocol))
+
+    def _protocol_from_response(self, response):
+        """Return a copy of the protocol identified by the given
+        response to ATDPN (for the protocol cache), raising an exception if it's unknown or
+        differs from the protocol in use.
+        """
         # suppress any "automatic" prefix
         if len(response) > 1 and response.startswith("A"):
             response = response[1:]
@@ -754,6 +1487,186 @@ class _ELM323(ELM32X):
 _classes["ELM323"] = _ELM323
 
 
+class ResponseCounts(object):
+    """Learns how many frames the vehicle returns in response to each
+    distinct OBD request, for use as ELM327 response count hints.
+
+    A count is only used once it has been observed without a hint, so
+    that a hint never cuts a response short.  Every VERIFY_INTERVAL
+    hinted requests, the request is sent without its hint to check that
+    the count hasn't changed.  Counts are forgotten after any error.
+
+    hinted -- the number of requests sent with a hint
+    verified -- the number of unhinted checks of a learned count
+    mismatches -- the number of times a hint proved wrong
+    time_saved -- the estimated time saved by hinted requests (seconds),
+        based on the average time taken by the same request unhinted
+    """
+    VERIFY_INTERVAL = 50
+    MAX_COUNT = 0xF  # a single hex digit
+
+    def __init__(self):
+        self.hinted = 0
+        self.verified = 0
+        self.mismatches = 0
+        self.time_saved = 0.0
+        self.clear()
+        return
+
+    def clear(self):
+        """Forget all learned counts (e.g. when changing protocols)"""
+        self._counts = {}
+        self._unhinted_times = {}
+        self._until_verify = {}
+        return
+
+    def expected(self, message):
+        """Return the count to hint for the given message, or None if
+        it should be sent without a hint.
+        """
+        key = tuple(message)
+        count = self._counts.get(key)
+        if count is None or count > self.MAX_COUNT:
+            return None
+        if self._until_verify[key] <= 0:
+            return None
+        return count
+
+    def received(self, message, frame_count, elapsed=None, hint=None):
+        """Record the number of frames received in response to the
+        given message.
+
+        elapsed -- the time taken by the request, if known
+        hint -- the count hinted with the request, or None
+        """
+        key = tuple(message)
+        if hint is not None:
+            self.hinted += 1
+            self._until_verify[key] -= 1
+            if frame_count != hint:
+                # fewer frames arrived (the ELM waited out its timeout);
+                # relearn the count without a hint
+                self.mismatches += 1
+                self.forget(key)
+            elif elapsed is not None and key in self._unhinted_times:
+                self.time_saved += max(0.0, self._unhinted_times[key][0] - elapsed)
+            return
+
+        if key in self._counts:
+            self.verified += 1
+            if frame_count != self._counts[key]:
+                self.mismatches += 1
+        self._counts[key] = frame_count
+        self._until_verify[key] = self.VERIFY_INTERVAL
+        if elapsed is not None:
+            # keep a running average of the unhinted request time
+            average, n = self._unhinted_times.get(key, (0.0, 0))
+            self._unhinted_times[key] = ((average * n + elapsed) / (n + 1), n + 1)
+        return
+
+    def forget(self, message):
+        """Forget the learned count for the given message"""
+        key = tuple(message)
+        self._counts.pop(key, None)
+        self._until_verify.pop(key, None)
+        return
+
+    def __str__(self):
+        return ("%d hinted requests, %d verified, %d mismatches, %.3f s saved" %
+                (self.hinted, self.verified, self.mismatches, self.time_saved))
+
+
+class AdaptiveTiming(object):
+    """Learns how quickly each ECU responds to each service, so that
+    the ELM327's response timeout (ATST) and the host's read deadlines
+    can be sized to the vehicle rather than to the worst case.
+
+    Once MIN_SAMPLES responses to a service have been seen, its requests
+    are sent with the ELM's adaptive timing disabled (ATAT0) and its
+    timeout set to MARGIN times the 95th percentile latency of the
+    slowest ECU known to respond to that service, within MIN_TIMEOUT and
+    MAX_TIMEOUT.  The timeout is only lowered once the estimate falls
+    by more than a quarter, to avoid reprogramming it on every request.
+    The latencies learned for a service are forgotten after any error
+    under such a timeout, reverting to the defaults until relearned.
+
+    The latency of a request is measured from its transmission to the
+    prompt, less the timeout the ELM waits after the last response, and
+    is attributed to each ECU which responded.
+
+    latency -- LatencyStats of the response latency per (ECU, SID)
+    elapsed -- LatencyStats of the total time taken per SID
+    """
+    ST_UNIT = 0.004  # seconds per ATST count
+    MIN_SAMPLES = 5
+    MARGIN = 2.0
+    MIN_TIMEOUT = 0x05  # 20 ms
+    MAX_TIMEOUT = 0xFF  # about 1 s
+    HOST_MARGIN = 3.0
+    HOST_SLACK = 0.1
+
+    def __init__(self):
+        self.clear()
+        return
+
+    def clear(self):
+        """Forget all learned latencies (e.g. when changing protocols)"""
+        self.latency = LatencyStats()
+        self.elapsed = LatencyStats()
+        self._responders = {}
+        return
+
+    def elm_timeout(self, sid, current=None):
+        """Return the ATST value to use for requests of the given
+        service, or None if its latencies aren't known well enough.
+
+        current -- the ATST value currently programmed (if fixed)
+        """
+        keys = [(ecu, sid) for ecu in self._responders.get(sid, ())]
+        if not keys or min([self.latency.count(k) for k in keys]) < self.MIN_SAMPLES:
+            return None
+        latency = max([self.latency.percentile(k) for k in keys])
+        timeout = int(math.ceil(latency * self.MARGIN / self.ST_UNIT))
+        timeout = max(self.MIN_TIMEOUT, min(self.MAX_TIMEOUT, timeout))
+        if current is not None and current * 3 // 4 <= timeout <= current:
+            return current
+        return timeout
+
+    def host_timeout(self, sid, elm_timeout, timeout, interval):
+        """Return the (timeout, interval) for the host to allow for a
+        response to a request of the given service, sent with the given
+        ATST value, shortened from the given defaults.
+        """
+        interval = min(interval, 2 * elm_timeout * self.ST_UNIT + self.HOST_SLACK)
+        elapsed = self.elapsed.percentile(sid)
+        if elapsed is not None:
+            timeout = min(timeout, self.HOST_MARGIN * elapsed + interval)
+        return timeout, interval
+
+    def received(self, sid, ecus, elapsed, latency):
+        """Record a response to a request of the given service.
+
+        ecus -- the set of IDs of the ECUs which responded
+        elapsed -- the total time taken by the request (seconds)
+        latency -- the estimated response latency (seconds)
+        """
+        for ecu in ecus:
+            self.latency.record((ecu, sid), latency)
+        self._responders.setdefault(sid, set()).update(ecus)
+        self.elapsed.record(sid, elapsed)
+        return
+
+    def forget(self, sid):
+        """Forget the latencies learned for the given service"""
+        for ecu in self._responders.pop(sid, ()):
+            self.latency.forget((ecu, sid))
+        self.elapsed.forget(sid)
+        return
+
+    def __str__(self):
+        return str(self.latency)
+
+
 class ELM32XError(InterfaceError):
     """ELM-specific internal errors"""
     def __init__(self, id):
@@ -782,5 +1695,109 @@ class OBDLinkCI(ELM327):
         }
 _classes["OBDLink CI"] = OBDLinkCI
 
+
+class STN11XX(ELM327):
+    """Class representing an OBD-II interface built on an STN11xx (or
+    later) chip, such as most of the OBDLink family, which supports the
+    ELM327 command set along with its own extended (ST) commands.
+
+    Requests are sent with STPX, which carries the response timeout
+    and count hint (see ELM327.enable_adaptive_timing() and
+    ELM327.enable_response_counts()) along with the request itself, so
+    changes of timing cost no extra ATST/ATAT round trips; and
+    set_baudrate() switches with STSBR, without ATBRD's handshake.
+    Otherwise the interface is used exactly as an ELM327.
+
+    See obd.interface.base.Interface for usage.
+    """
+    # the chips (as identified by STI) with the extended command set
+    CHIPS = ["STN1100", "STN1110", "STN1130", "STN1150", "STN1151",
+             "STN1155", "STN1170", "STN2100", "STN2120"]
+
+    def _timing_commands(self, timing):
+        """Return no commands: the timing is sent along with each
+        request instead (see _obd_command())."""
+        return []
+
+    def _obd_command(self, message, header=None, token=None):
+        """Return the STPX command which transmits the given OBD
+        message with the current timing.  See _send_obd_message() for
+        the arguments.
+        """
+        data = _squeeze(ELM327._obd_command(self, message, header, token)[:-1])
+        options = ["d:%s" % data]
+        if self._elm_timing != ELM32X.DEFAULT_TIMING:
+            timeout = self._elm_timing[1] * AdaptiveTiming.ST_UNIT
+            options.append("t:%d" % int(math.ceil(timeout * 1000)))
+        return "STPX %s\r" % ", ".join(options)
+
+    def _hint_response_count(self, message, command):
+        """Return the STPX command with the expected number of response
+        frames added (if known and hints are enabled), along with that
+        count (or None).
+        """
+        if not self.response_counts:
+            return command, None
+        count = self.response_counts.expected(message)
+        if count is None:
+            return command, None
+        return "%s, r:%d\r" % (command[:-1], count), count
+
+    def set_baudrate(self, new_baud):
+        """Change the baud rate between computer and interface.
+
+        STSBR switches the interface's baud rate as soon as it has
+        acknowledged the command; the new rate is then verified by
+        reading the interface's identity (STI).  If that fails, the
+        interface is sent back to the old rate (STSBR has no handshake
+        to fall back on its own) and its rate is detected again.
+
+        Raises an exception if unable to change the baud rate as requested.
+        """
+        self.open()
+        old_baud = self.port.get_baudrate()
+        identifier = self.at_cmd("STI")
+
+        self._write("STSBR %d\r" % new_baud)
+        self._set_timeout(ELM32X.AT_TIMEOUT)
+        try:
+            response = self._read_until_string("OK\r")
+        except obd.exception.Timeout as e:
+            response = e.response
+        if not response.endswith("OK\r"):
+            raise obd.exception.CommandNotSupported("Interface doesn't support %d baud; " % new_baud +
+                                                    "staying at %d" % old_baud)
+
+        self.port.set_baudrate(new_baud)
+        self.port.clear_rx_buffer()
+        try:
+            response = self.at_cmd("STI")
+        except obd.exception.Timeout:
+            response = None
+        if response != identifier:
+            baud = self._restore_baudrate(old_baud)
+            if baud is None:
+                raise InterfaceError("Test of %d baud failed; " % new_baud +
+                                     "unable to detect the interface's baud rate")
+            raise InterfaceError("Test of %d baud failed; now at %d" % (new_baud, baud))
+        return
+
+    def _restore_baudrate(self, old_baud):
+        """Send the interface back to the given baud rate after a failed
+        switch with STSBR, then detect (and return) the rate at which it
+        is actually operating, or None if it couldn't be determined."""
+        self.port.clear_rx_buffer()
+        self._write("STSBR %d\r" % old_baud)
+        self._set_timeout(ELM32X.AT_TIMEOUT)
+        try:
+            self._read_until_string("OK\r")
+        except obd.exception.Timeout:
+            pass  # the acknowledgement may be garbled at the failed rate
+        self.port.set_baudrate(old_baud)
+        return ELM32X.detect_baudrate(self.port, first=old_baud)
+
+for chip in STN11XX.CHIPS:
+    _classes[chip] = STN11XX
+
 # vim: softtabstop=4 shiftwidth=4 expandtab                                     
 
@@ -0,0 +1,116 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Strategies for ordering the protocols tried by
+Interface.search_for_protocol().
+
+FixedOrderSearch -- tries the protocols in the order given by
+    Interface._protocol_search_order() (legacy protocols first)
+ProbableFirstSearch -- tries the protocols most likely to succeed
+    first: those which have succeeded before, then CAN (the default)
+
+Set an interface's strategy via Interface.set_search_strategy().  An
+interface given none gets its own ProbableFirstSearch(), so the
+protocols it has connected don't reorder the searches of others,
+unless default_strategy is set to a strategy for them all to share.
+"""
+
+import obd.protocol
+
+
+class SearchStrategy(object):
+    """Base class for protocol search strategies.
+
+    precheck -- True if the interface should run any cheap checks it
+        supports (see Interface._precheck_protocols()) to rule out
+        protocols before searching
+    """
+    precheck = False
+
+    def order(self, search_order):
+        """Return the list of [protocol, delay] pairs to try, in order,
+        given the interface's default search order.
+        """
+        raise NotImplementedError()
+        return
+
+    def connected(self, protocol):
+        """Note that a search connected using the given protocol"""
+        return
+
+
+class FixedOrderSearch(SearchStrategy):
+    """Tries the protocols in the interface's default order"""
+    def order(self, search_order):
+        return list(search_order)
+
+
+class ProbableFirstSearch(SearchStrategy):
+    """Tries the protocols most likely to succeed first.
+
+    Protocols are ordered by the number of searches they've connected
+    (most first), then by RANK, which puts CAN (used by nearly every
+    vehicle sold since 2008) ahead of the legacy protocols, whose
+    failed initializations also cost the most time.
+
+    precheck -- see SearchStrategy (default False)
+    successes -- the number of searches connected, by protocol name
+    """
+    RANK = [
+        obd.protocol.ISO15765_4(id_length=11, baud=500000),
+        obd.protocol.ISO15765_4(id_length=29, baud=500000),
+        obd.protocol.ISO15765_4(id_length=11, baud=250000),
+        obd.protocol.ISO15765_4(id_length=29, baud=250000),
+        obd.protocol.ISO14230_4("FAST"),
+        obd.protocol.ISO9141_2(),
+        obd.protocol.ISO14230_4("5BAUD"),
+        obd.protocol.VPW(),
+        obd.protocol.PWM(),
+        ]
+
+    def __init__(self, precheck=False):
+        self.precheck = precheck
+        self.successes = {}
+        return
+
+    def order(self, search_order):
+        ranks = [str(p) for p in self.RANK]
+        def key(pair):
+            name = str(pair[0])
+            rank = len(ranks)
+            if name in ranks: rank = ranks.index(name)
+            return (-self.successes.get(name, 0), rank)
+        return sorted(search_order, key=key)
+
+    def connected(self, protocol):
+        name = str(protocol)
+        self.successes[name] = self.successes.get(name, 0) + 1
+        return
+
+# The strategy shared by interfaces that haven't been given their own,
+# or None for each to use its own ProbableFirstSearch()
+default_strategy = None
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
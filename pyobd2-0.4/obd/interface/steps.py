@@ -0,0 +1,120 @@
+#!usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""
+Interface operations written once for synchronous and asyncio-driven
+interfaces
+
+An operation which communicates with the interface (e.g.
+connect_to_vehicle()) is written as a generator of "steps".  It yields
+each call that performs I/O as built by call(), is sent the call's
+result (or has the call's exception raised at the yield), and finishes
+by raising Result(value), just as a trollius coroutine raises
+Return(value).  The generator makes every decision without knowing how
+its calls are made:
+
+    def get_protocol(self):
+        return self._run(self._get_protocol_steps())
+
+    def _get_protocol_steps(self):
+        if self._current_protocol is None:
+            response = yield call(self.at_cmd, "ATDPN")
+            self._current_protocol = self._protocol_from_response(response)
+        raise Result(self._current_protocol)
+
+Interface._run is run(), which makes each call directly and returns
+the result.  An asynchronous interface (see obd.interface.asyncelm)
+replaces _run with a coroutine which yields From each call, and its
+I/O methods (at_cmd(), etc.) with coroutines, so the very same
+get_protocol() returns a coroutine.
+"""
+
+import sys
+
+
+class Result(Exception):
+    """Raised by a generator of steps to finish with the given value"""
+    def __init__(self, value=None):
+        Exception.__init__(self)
+        self.value = value
+        return
+
+
+def call(function, *args, **kwargs):
+    """Return the step calling the given function with the given
+    arguments, for a generator of steps to yield"""
+    return function, args, kwargs
+
+
+class Stepper(object):
+    """Advances a generator of steps from one call to the next, for
+    run() and its asynchronous counterpart"""
+    def __init__(self, steps):
+        self._steps = steps
+        self._result = None
+        self._error = None
+        return
+
+    def advance(self, value=None, error=None):
+        """Resume the steps with the result of the last call (or the
+        sys.exc_info() of the exception it raised), and return the
+        next call, or None once the steps are finished (see result())
+        """
+        try:
+            if error is None:
+                return self._steps.send(value)
+            return self._steps.throw(*error)
+        except Result as e:
+            self._result = e.value
+        except StopIteration:
+            pass
+        except Exception:
+            self._error = sys.exc_info()
+        return None
+
+    def result(self):
+        """Return the result of the finished steps, or raise the
+        exception they raised"""
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+        return self._result
+
+
+def run(steps):
+    """Run the given generator of steps, making each call directly,
+    and return its result"""
+    stepper = Stepper(steps)
+    step = stepper.advance()
+    while step is not None:
+        function, args, kwargs = step
+        try:
+            value = function(*args, **kwargs)
+        except Exception:
+            step = stepper.advance(error=sys.exc_info())
+        else:
+            step = stepper.advance(value)
+    return stepper.result()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
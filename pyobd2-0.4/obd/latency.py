@@ -0,0 +1,94 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Response latency statistics, used to size timeouts to the
+latencies actually observed rather than to the worst case.
+"""
+
+import collections
+
+class LatencyStats(object):
+    """Tracks the latencies observed for each of a set of keys (e.g.
+    (ECU, SID) pairs) as an exponentially weighted moving average and
+    a percentile over the most recent samples.
+
+    alpha -- the weight given to each new sample by the moving average
+    window -- the number of recent samples kept for percentiles
+    """
+    def __init__(self, alpha=0.2, window=64):
+        self.alpha = alpha
+        self.window = window
+        self._ewma = {}
+        self._samples = {}
+        return
+
+    def record(self, key, seconds):
+        """Record a latency (in seconds) observed for the given key"""
+        if key in self._ewma:
+            self._ewma[key] += self.alpha * (seconds - self._ewma[key])
+            self._samples[key].append(seconds)
+        else:
+            self._ewma[key] = seconds
+            self._samples[key] = collections.deque([seconds], self.window)
+        return
+
+    def count(self, key):
+        """Return the number of recent samples recorded for the key"""
+        return len(self._samples.get(key, ()))
+
+    def ewma(self, key):
+        """Return the moving average latency for the key, or None"""
+        return self._ewma.get(key)
+
+    def percentile(self, key, fraction=0.95):
+        """Return the given percentile of the recent latencies for the
+        key, or None if there are none.
+        """
+        samples = self._samples.get(key)
+        if not samples:
+            return None
+        samples = sorted(samples)
+        index = min(len(samples) - 1, int(fraction * len(samples)))
+        return samples[index]
+
+    def forget(self, key):
+        """Discard the statistics for the key"""
+        self._ewma.pop(key, None)
+        self._samples.pop(key, None)
+        return
+
+    def keys(self):
+        """Return the list of keys with recorded latencies"""
+        return self._ewma.keys()
+
+    def __str__(self):
+        lines = []
+        for key in sorted(self.keys()):
+            lines.append("%s: avg %.1f ms, p95 %.1f ms (%d samples)" %
+                         (key, self.ewma(key) * 1000.0,
+                          self.percentile(key) * 1000.0, self.count(key)))
+        return "\n".join(lines)
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -37,11 +37,15 @@ register_message_class() -- registers a Message subclass for the given
     SID and PID (or equivalent), either a request or a response
 register_response_class() -- a convenience function for registering a
     response (see Response class)
+register_pid_lengths() -- registers the data lengths of the responses
+    to a SID's PIDs, for splitting responses to multi-PID requests
 
 To create these objects by hand given a reassembled bus message:
 
 create() -- creates an instance of the appropriate registered Message
     class
+create_all() -- creates an instance for each PID in a response to
+    a request for multiple PIDs
 
 To send requests to the OBD bus, create one of the following to pass
 to interface.send_request():
@@ -111,7 +115,35 @@ def register_response_class(sid, pid, cls):
     return register_message_class(sid, pid, True, cls)
 
 
+_pid_lengths = {}
+
+def register_pid_lengths(sid, lengths):
+    """Register the data lengths of the responses to the given SID's
+    PIDs, which are needed to split a response to a request for
+    multiple PIDs into the response to each PID.
+
+    sid -- the Service or Mode ID
+    lengths -- a dict mapping each PID to the number of data bytes
+        following it in a response, or to a tuple of the possible
+        lengths if it varies (e.g. with the number of sensor banks)
+    """
+    global _pid_lengths
+    _pid_lengths.setdefault(sid, {}).update(lengths)
+    return
+
+
+def pid_length(sid, pid):
+    """Return the registered data length of the response to the given
+    SID and PID (see register_pid_lengths()), or None if unknown.
+    """
+    try:
+        return _pid_lengths[sid][pid]
+    except KeyError:
+        return None
+
+
 from obd.message.base import BusMessage
+from obd.exception import DataError
 
 
 def create(bus_message, offset=BusMessage.PID):
@@ -133,24 +165,97 @@ def create(bus_message, offset=BusMessage.PID):
     """
     sid = bus_message.sid()
     pid = None
-    index = bus_message.is_response()
+    if isinstance(_message_classes.get(sid), dict):
+        # if this SID uses PIDs, the first byte is the PID
+        pid = bus_message.data_bytes[offset]
+        offset += 1
+    message_class = _message_class(sid, pid, bus_message.is_response())
+    return message_class(bus_message, offset, pid)
+
+
+def _message_class(sid, pid, response):
+    """Return the Message subclass registered for the given SID and
+    PID, or Message itself if none is registered.
+    """
     try:
         sid_classes = _message_classes[sid]
         if isinstance(sid_classes, dict):
-            # if this SID uses PIDs, the first byte is the PID
-            pid = bus_message.data_bytes[offset]
-            offset += 1
             sid_classes = sid_classes[pid]
-        else:
-            # creating message for SID w/o PID
-            pass
-        message_class = sid_classes[index]
+        return sid_classes[response == True] or Message
     except KeyError:
-        message_class = Message
-    return message_class(bus_message, offset, pid)
+        return Message
+
+
+def create_all(bus_message, pids, offset=BusMessage.PID):
+    """Create an OBD message object for each PID in a bus message
+    responding to a request for multiple PIDs, in the order received.
+
+    The bus message contains each PID followed by its data (omitting
+    unsupported PIDs), so it is split using the lengths registered via
+    register_pid_lengths().  Where a PID's length varies, the requested
+    PIDs determine where the next response begins.  A PID of unknown
+    length can only be the last in the bus message.
+
+    Raises a DataError if the bus message can't be split into
+    responses to the requested PIDs.
+
+    bus_message -- the complete OBD message received from the bus
+    pids -- the list of PIDs requested
+    offset -- the position within the bus message at which the first
+        PID begins
+    """
+    sid = bus_message.sid()
+    data_bytes = bus_message.data_bytes
+    segments = _split_pids(sid, data_bytes, offset, list(pids))
+    if segments is None:
+        raise DataError("Unable to split response to multiple PIDs",
+                        raw=str(bus_message))
+
+    messages = []
+    for pid, start, end in segments:
+        message_data = bus_message
+        message_class = _message_class(sid, pid, bus_message.is_response())
+        if message_class.length is None and end < len(data_bytes):
+            # variable-length messages take the rest of the bus message,
+            # so hand them just the portion through their own data
+            message_data = BusMessage(bus_message.header, data_bytes[:end],
+                                      bus_message.frames)
+        messages.append(message_class(message_data, start + 1, pid))
+    return messages
+
+
+def _split_pids(sid, data_bytes, start, pids):
+    """Return a list of (pid, start, end) tuples locating the response
+    to each PID within the given data bytes, or None if they can't be
+    split into responses to the given PIDs (each used at most once).
+    """
+    if start == len(data_bytes):
+        return []
+    pid = data_bytes[start]
+    if pid not in pids:
+        return None
+    remaining = list(pids)
+    remaining.remove(pid)
+
+    length = pid_length(sid, pid)
+    if length is None:
+        lengths = [len(data_bytes) - start - 1]
+    elif isinstance(length, tuple):
+        lengths = length
+    else:
+        lengths = [length]
+    for length in lengths:
+        end = start + 1 + length
+        if end > len(data_bytes):
+            continue
+        rest = _split_pids(sid, data_bytes, end, remaining)
+        if rest is not None:
+            return [(pid, start, end)] + rest
+    return None
 
 
-__all__ = ["create", "register_message_class", "register_response_class"]
+__all__ = ["create", "create_all", "register_message_class",
+           "register_response_class", "register_pid_lengths", "pid_length"]
 
 from obd.message.base import Message
 from obd.message.request import RawRequest, OBDRequest
@@ -27,6 +27,14 @@
 
 from obd.util import *
 
+def missing_bytes(data_bytes):
+    """Return whether any of the given data bytes are missing (None).
+
+    Received data is carried in bytearrays, which can't hold None;
+    only data reassembled around a lost frame is a list with gaps.
+    """
+    return not isinstance(data_bytes, bytearray) and None in data_bytes
+
 class BusMessage(object):
     """Represents a complete, reassembled message transmitted on the
     OBD bus.
@@ -68,7 +76,7 @@ class BusMessage(object):
         self.data_bytes = data_bytes
         self.frames = frames
         self.protocol = self.header.protocol
-        self.incomplete = (None in self.data_bytes)
+        self.incomplete = missing_bytes(self.data_bytes)
         return
     def sid(self):
         """Return the SID for the given bus message (request or response)
@@ -124,7 +132,7 @@ class Message(object):
             self.data_bytes = self.bus_message.data_bytes[offset:offset+self.length]
         self.sid = self.bus_message.sid()
         self.pid = pid
-        self.incomplete = (None in self.data_bytes)
+        self.incomplete = missing_bytes(self.data_bytes)
         return
 
     def byte(self, label):
@@ -0,0 +1,392 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""
+Decoding of broadcast CAN signals described by a DBC file
+
+Where obd.message.value.Factory decodes J1979 values from the bytes
+labeled in the standard ("A", "B", etc.), a DBC file describes the
+signals an OEM broadcasts: each one a field of a frame given by its
+start bit, length, byte order, signedness, scale and offset.
+
+    database = obd.message.dbc.load("vehicle.dbc")
+    decoder = obd.message.dbc.Decoder(database)
+    values = decoder.decode(0x0C9, frame_data)  # {"EngineSpeed": 812.5, ...}
+    columns = decoder.decode_batch(interface.monitor(duration=10))
+
+Each message's signals are compiled once into an extraction plan of
+shifts and masks over the frame read as a 64-bit integer.
+decode_batch() applies each plan to all the frames of a message at
+once, producing NumPy columns if NumPy is installed (and lists of
+values otherwise).
+
+Only the message (BO_) and signal (SG_) definitions are used;
+multiplexed signals are decoded only from the frames whose multiplexer
+selects them.
+"""
+
+import re
+import binascii
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # decode_batch() returns lists instead
+
+
+# the flag set on the IDs of DBC messages with 29-bit (extended) IDs
+EXTENDED_ID_FLAG = 0x80000000
+# the largest 11-bit (standard) CAN ID
+MAX_STANDARD_ID = 0x7FF
+
+_MESSAGE_LINE = re.compile(r"^BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)\s+(\w+)")
+_SIGNAL_LINE = re.compile(r"""^SG_\s+(\w+)\s*(M|m\d+)?\s*:\s*
+    (\d+)\|(\d+)@([01])([+-])\s*
+    \(\s*([^,\s]+)\s*,\s*([^)\s]+)\s*\)\s*
+    \[\s*([^|\s]*)\s*\|\s*([^\]\s]*)\s*\]\s*
+    "([^"]*)"\s*(.*)$""", re.VERBOSE)
+
+
+class Signal(object):
+    """A signal within a DBC message
+
+    name -- the signal's name
+    start_bit -- the bit at which the signal starts: its least
+        significant bit if little_endian, otherwise its most significant
+        bit, numbered as in DBC files (bit 0 being the least significant
+        bit of the first byte)
+    length -- the number of bits in the signal
+    little_endian -- True for Intel byte order, False for Motorola
+    signed -- True if the raw value is two's complement
+    scale, offset -- convert the raw value to the physical value
+        (scale * raw + offset)
+    minimum, maximum -- the physical value's range
+    unit -- the physical value's units
+    receivers -- the list of nodes receiving the signal
+    multiplexer -- True if the signal selects the multiplexed signals
+    multiplex_value -- the multiplexer value selecting the signal, or
+        None if it's not multiplexed
+    """
+    def __init__(self, name, start_bit, length, little_endian=True, signed=False,
+                 scale=1, offset=0, minimum=None, maximum=None, unit="",
+                 receivers=None, multiplexer=False, multiplex_value=None):
+        self.name = name
+        self.start_bit = start_bit
+        self.length = length
+        self.little_endian = little_endian
+        self.signed = signed
+        self.scale = scale
+        self.offset = offset
+        self.minimum = minimum
+        self.maximum = maximum
+        self.unit = unit
+        self.receivers = receivers or []
+        self.multiplexer = multiplexer
+        self.multiplex_value = multiplex_value
+        return
+
+    def shift(self):
+        """Return the position of the signal's least significant bit
+        in the frame read as a 64-bit integer: little-endian for Intel
+        signals, big-endian for Motorola ones.
+        """
+        if self.little_endian:
+            return self.start_bit
+        byte, bit = divmod(self.start_bit, 8)
+        return (7 - byte) * 8 + bit - self.length + 1
+
+    def __str__(self):
+        return "%s (%s)" % (self.name, self.unit)
+
+
+class MessageDefinition(object):
+    """A message defined in a DBC file
+
+    frame_id -- the CAN ID (without EXTENDED_ID_FLAG)
+    extended -- True if the ID is a 29-bit one
+    name -- the message's name
+    length -- the number of data bytes (DLC)
+    sender -- the transmitting node
+    signals -- the list of Signals
+    """
+    def __init__(self, frame_id, name, length, sender="", signals=None, extended=False):
+        self.frame_id = frame_id
+        self.extended = extended
+        self.name = name
+        self.length = length
+        self.sender = sender
+        self.signals = signals or []
+        return
+
+    def multiplexer(self):
+        """Return the multiplexer Signal, or None"""
+        for signal in self.signals:
+            if signal.multiplexer:
+                return signal
+        return None
+
+    def __str__(self):
+        return "%s (0x%X)" % (self.name, self.frame_id)
+
+
+class Database(object):
+    """The messages defined by a DBC file
+
+    messages -- a dict mapping each (CAN ID, extended) pair to its
+        MessageDefinition, so an 11-bit and a 29-bit ID of the same
+        value are distinct messages
+    """
+    def __init__(self, messages=None):
+        self.messages = {}
+        for message in messages or []:
+            self.messages[(message.frame_id, message.extended)] = message
+        return
+
+    def message(self, frame_id, extended=None):
+        """Return the MessageDefinition for the given CAN ID, or None
+
+        extended -- True for a 29-bit ID, False for an 11-bit one, or
+            None (the default) to take only IDs above MAX_STANDARD_ID
+            as 29-bit ones
+        """
+        if extended is None:
+            extended = frame_id > MAX_STANDARD_ID
+        return self.messages.get((frame_id, extended))
+
+    def message_by_name(self, name):
+        """Return the MessageDefinition with the given name, or None"""
+        for message in self.messages.values():
+            if message.name == name:
+                return message
+        return None
+
+
+def parse(text):
+    """Return the Database defined by the given DBC text, raising a
+    ValueError for any malformed message or signal definition.
+    """
+    messages = []
+    message = None
+    for number, line in enumerate(text.splitlines()):
+        number, line = number + 1, line.strip()
+        if line.startswith("BO_ "):
+            matched = _MESSAGE_LINE.match(line)
+            if not matched:
+                raise ValueError("Malformed DBC message on line %d: %r" % (number, line))
+            frame_id, name, length, sender = matched.groups()
+            frame_id = int(frame_id)
+            message = MessageDefinition(frame_id & ~EXTENDED_ID_FLAG, name, int(length),
+                                        sender, extended=bool(frame_id & EXTENDED_ID_FLAG))
+            messages.append(message)
+        elif line.startswith("SG_ "):
+            matched = _SIGNAL_LINE.match(line)
+            if not matched or message is None:
+                raise ValueError("Malformed DBC signal on line %d: %r" % (number, line))
+            message.signals.append(_signal(matched.groups()))
+        elif line:
+            message = None  # the end of the message's signals
+    return Database(messages)
+
+def _signal(fields):
+    """Return the Signal given the fields matched by _SIGNAL_LINE"""
+    (name, multiplexing, start_bit, length, byte_order, sign, scale, offset,
+     minimum, maximum, unit, receivers) = fields
+    multiplex_value = None
+    if multiplexing and multiplexing != "M":
+        multiplex_value = int(multiplexing[1:])
+    return Signal(name, int(start_bit), int(length),
+                  little_endian=(byte_order == "1"), signed=(sign == "-"),
+                  scale=_number(scale), offset=_number(offset),
+                  minimum=_number(minimum), maximum=_number(maximum), unit=unit,
+                  receivers=[r for r in re.split(r"[\s,]+", receivers) if r],
+                  multiplexer=(multiplexing == "M"), multiplex_value=multiplex_value)
+
+def _number(text):
+    """Return the int or float given by the text, or None if empty"""
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def load(filename):
+    """Return the Database defined by the named DBC file"""
+    f = open(filename, "r")
+    try:
+        return parse(f.read())
+    finally:
+        f.close()
+
+
+class Decoder(object):
+    """Decodes the signals of the messages in a Database from frames.
+
+    Each message's plan is a list of (signal, little_endian, shift,
+    mask, sign_bit, scale, offset) tuples, one per signal, computed
+    once when the message is first decoded.
+    """
+    def __init__(self, database):
+        self.database = database
+        self._plans = {}
+        return
+
+    def plan(self, message):
+        """Return the extraction plan for the given MessageDefinition"""
+        key = (message.frame_id, message.extended)
+        try:
+            return self._plans[key]
+        except KeyError:
+            pass
+        plan = []
+        for signal in message.signals:
+            sign_bit = None
+            if signal.signed:
+                sign_bit = 1 << (signal.length - 1)
+            plan.append((signal, signal.little_endian, signal.shift(),
+                         (1 << signal.length) - 1, sign_bit, signal.scale, signal.offset))
+        self._plans[key] = plan
+        return plan
+
+    def decode(self, frame_id, data, extended=None):
+        """Return a dict mapping the name of each signal in the given
+        frame to its physical value, or None if the frame's ID isn't
+        in the database.  Multiplexed signals not selected by the
+        frame's multiplexer are omitted.
+
+        frame_id -- the frame's CAN ID
+        data -- the frame's data bytes (a bytearray or string)
+        extended -- whether the ID is a 29-bit one (see
+            Database.message())
+        """
+        message = self.database.message(frame_id, extended)
+        if message is None:
+            return None
+        padded = bytes(data)[:8].ljust(8, "\x00")
+        little = int(binascii.hexlify(padded[::-1]), 16)
+        big = int(binascii.hexlify(padded), 16)
+        raw_values = {}
+        for signal, little_endian, shift, mask, sign_bit, scale, offset in self.plan(message):
+            if little_endian:
+                raw = (little >> shift) & mask
+            else:
+                raw = (big >> shift) & mask
+            if sign_bit is not None and raw & sign_bit:
+                raw -= sign_bit << 1
+            raw_values[signal] = raw
+        selector = _selector(message, raw_values)
+        values = {}
+        for signal, raw in raw_values.items():
+            if signal.multiplex_value is None or signal.multiplex_value == selector:
+                values[signal.name] = raw * signal.scale + signal.offset
+        return values
+
+    def decode_batch(self, frames):
+        """Decode a batch of frames, such as those yielded by
+        ELM327.monitor(), into columns.
+
+        frames -- an iterable of (timestamp, frame) pairs, each frame
+            being an obd.protocol.Frame (whose header holds the CAN ID)
+
+        Return a dict mapping the name of each message received to a
+        dict of columns: "timestamp", and one for each signal, with a
+        value for each of the message's frames.  The columns are NumPy
+        arrays (of floats, with NaN where a multiplexed signal wasn't
+        selected) if NumPy is installed, and otherwise lists (with
+        None).  Frames whose IDs aren't in the database are ignored.
+        """
+        batches = {}
+        for timestamp, frame in frames:
+            key = (_frame_id(frame.header.raw_bytes), _extended(frame.header))
+            message = self.database.messages.get(key)
+            if message is None:
+                continue
+            batch = batches.setdefault(key, ([], []))
+            batch[0].append(timestamp)
+            batch[1].append(bytes(frame.data_bytes)[:8].ljust(8, "\x00"))
+        columns = {}
+        for key, (timestamps, data) in batches.items():
+            message = self.database.messages[key]
+            if numpy is None:
+                columns[message.name] = self._decode_lists(message, timestamps, data)
+            else:
+                columns[message.name] = self._decode_arrays(message, timestamps, data)
+        return columns
+
+    def _decode_arrays(self, message, timestamps, data):
+        """Return the columns of the given message's frames as NumPy
+        arrays, extracting each signal from all the frames at once.
+        """
+        packed = "".join(data)
+        words = {True: numpy.frombuffer(packed, dtype="<u8"),
+                 False: numpy.frombuffer(packed, dtype=">u8")}
+        result = {"timestamp": numpy.array(timestamps, dtype=numpy.float64)}
+        raw_columns = {}
+        for signal, little_endian, shift, mask, sign_bit, scale, offset in self.plan(message):
+            raw = (words[little_endian] >> numpy.uint64(shift)) & numpy.uint64(mask)
+            if sign_bit is not None:
+                # sign-extend as integers (a float64 can't hold every int64)
+                spare = 64 - signal.length
+                raw = (raw << numpy.uint64(spare)).view(numpy.int64) >> numpy.int64(spare)
+            raw_columns[signal] = raw
+            result[signal.name] = raw.astype(numpy.float64) * scale + offset
+        multiplexer = message.multiplexer()
+        if multiplexer is not None:
+            for signal in message.signals:
+                if signal.multiplex_value is not None:
+                    selected = raw_columns[multiplexer] == signal.multiplex_value
+                    result[signal.name] = numpy.where(selected, result[signal.name], numpy.nan)
+        return result
+
+    def _decode_lists(self, message, timestamps, data):
+        """Return the columns of the given message's frames as lists"""
+        result = {"timestamp": list(timestamps)}
+        for signal in message.signals:
+            result[signal.name] = []
+        for frame_data in data:
+            values = self.decode(message.frame_id, frame_data, message.extended)
+            for signal in message.signals:
+                result[signal.name].append(values.get(signal.name))
+        return result
+
+def _selector(message, raw_values):
+    """Return the raw value of the message's multiplexer signal, or
+    None if it has none"""
+    multiplexer = message.multiplexer()
+    if multiplexer is None:
+        return None
+    return raw_values[multiplexer]
+
+def _frame_id(header_bytes):
+    """Return the CAN ID in the given header bytes (padded to 32 bits)"""
+    return int(binascii.hexlify(bytes(header_bytes)), 16)
+
+def _extended(header):
+    """Return True if the given CAN header carries a 29-bit ID.  The
+    header bytes of 11-bit IDs are padded to 32 bits as well, so this
+    goes by the ID length of the header's protocol."""
+    return getattr(header.protocol, "id_length", 29) == 29
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
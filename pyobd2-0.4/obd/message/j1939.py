@@ -0,0 +1,315 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""
+Decoding of SAE J1939 parameter groups
+
+J1939 messages carry no SID or PID; the Parameter Group Number (PGN)
+in each header identifies the message, and J1939-71 defines the
+Suspect Parameter Numbers (SPNs) it carries by their position, length,
+resolution and offset.  Parameter groups are registered much as
+Message classes are registered with obd.message:
+
+register_parameter_group() -- registers the SPNs of a PGN
+parameter_group() -- returns the ParameterGroup registered for a PGN
+
+and bus messages (single frames, or messages reassembled from the
+transport protocol by obd.reassembly.StreamReassembler) are decoded
+with create(), or from a stream of monitored frames with messages():
+
+    frames = interface.monitor(duration=10)
+    for timestamp, message in obd.message.j1939.messages(frames):
+        print message.value(190)  # engine speed (rpm)
+
+The SPNs of some common broadcast PGNs are registered below.
+"""
+
+import binascii
+
+import obd.protocol
+import obd.reassembly
+from obd.message.base import missing_bytes
+
+
+class SPN(object):
+    """A Suspect Parameter Number: a parameter within a parameter group
+
+    number -- the SPN
+    name -- the parameter's name
+    start_bit -- the position of the parameter's least significant bit
+        in the group's data read as a little-endian integer
+    length -- the number of bits in the parameter
+    scale, offset -- convert the raw value to the physical value
+        (scale * raw + offset)
+    unit -- the physical value's units
+    """
+    def __init__(self, number, name, byte, length, scale=1, offset=0, unit="", bit=1):
+        """number, name -- the SPN and its name
+        byte, bit -- the parameter's start position as given by
+            J1939-71, both 1-based (e.g. "byte 4, bit 1")
+        length -- the number of bits in the parameter
+        scale, offset -- the parameter's resolution and offset
+        unit -- the physical value's units
+        """
+        self.number = number
+        self.name = name
+        self.start_bit = (byte - 1) * 8 + (bit - 1)
+        self.length = length
+        self.scale = scale
+        self.offset = offset
+        self.unit = unit
+        return
+
+    def maximum_raw(self):
+        """Return the largest valid raw value.
+
+        The top of each parameter's range is reserved: a last byte of
+        0xFE indicates an error and 0xFF that the parameter isn't
+        available (for 8 bits or more).  Discrete parameters under 8
+        bits likewise reserve their top two values (e.g. 0b10 and 0b11
+        for 2 bits): all ones but the last for an error, and all ones
+        for not available.
+        """
+        if self.length < 8:
+            return (1 << self.length) - 3
+        low_bits = self.length - 8
+        return (0xFA << low_bits) | ((1 << low_bits) - 1)
+
+    def __str__(self):
+        return "SPN %d %s (%s)" % (self.number, self.name, self.unit)
+
+
+class ParameterGroup(object):
+    """The SPNs carried by the messages of a PGN
+
+    pgn -- the Parameter Group Number
+    name -- the group's name (e.g. its J1939-71 acronym)
+    spns -- the list of SPNs
+
+    The SPNs are compiled once into a list of (number, shift, mask,
+    maximum raw value, scale, offset) tuples, so decoding a message
+    costs a shift and a mask per parameter.
+    """
+    def __init__(self, pgn, name, spns):
+        self.pgn = pgn
+        self.name = name
+        self.spns = spns
+        self._plan = [(spn.number, spn.start_bit, (1 << spn.length) - 1,
+                       spn.maximum_raw(), spn.scale, spn.offset, spn.start_bit + spn.length)
+                      for spn in spns]
+        return
+
+    def spn(self, number):
+        """Return the SPN with the given number, or None"""
+        for spn in self.spns:
+            if spn.number == number:
+                return spn
+        return None
+
+    def decode(self, data_bytes):
+        """Return a dict mapping each SPN to its physical value in the
+        given data, or to None if it's unavailable (or in error, or
+        beyond the end of the data, or in a missing frame).
+        """
+        if missing_bytes(data_bytes):
+            # missing bytes read as "not available"
+            data_bytes = bytearray([b is None and 0xFF or b for b in data_bytes])
+        bits = len(data_bytes) * 8
+        raw_data = int(binascii.hexlify(bytes(data_bytes)[::-1]) or "0", 16)
+        values = {}
+        for number, shift, mask, maximum, scale, offset, end in self._plan:
+            raw = (raw_data >> shift) & mask
+            if raw > maximum or end > bits:
+                values[number] = None
+            else:
+                values[number] = raw * scale + offset
+        return values
+
+    def __str__(self):
+        return "%s (PGN %d)" % (self.name, self.pgn)
+
+
+_parameter_groups = {}
+
+def register_parameter_group(group, override=False):
+    """Register a ParameterGroup for decoding the messages of its PGN.
+
+    group -- the ParameterGroup to register
+    override -- clients should generally set this to True if they wish to
+        override built-in groups; it defaults to False to prevent any
+        inadvertent overriding.
+    """
+    global _parameter_groups
+    # Allow intentional overriding, but yell in case of accidental override
+    if override == False:
+        assert group.pgn not in _parameter_groups, "attempting to override a registered PGN"
+    _parameter_groups[group.pgn] = group
+    return
+
+
+def parameter_group(pgn):
+    """Return the ParameterGroup registered for the given PGN, or None"""
+    return _parameter_groups.get(pgn)
+
+
+class J1939Message(object):
+    """Represents a single J1939 message and its decoded parameters.
+
+    bus_message -- the bus message (see BusMessage class) carrying this
+        message, whose header is a J1939Header
+    pgn -- the Parameter Group Number of the message
+    source -- the address of the transmitting ECU
+    destination -- the address to which the message was sent
+        (J1939Header.GLOBAL_ADDRESS if broadcast)
+    priority -- the priority of the message
+    data_bytes -- the raw bytes of the message, exclusive of the header
+    group -- the ParameterGroup registered for the PGN, or None
+    values -- a dict mapping each SPN of the group to its physical
+        value (None if unavailable); empty if the PGN isn't registered
+    incomplete -- a boolean indicating whether any of the bytes
+        are missing due to lost frames
+    """
+    def __init__(self, bus_message):
+        header = bus_message.header
+        self.bus_message = bus_message
+        self.pgn = header.pgn
+        self.source = header.tx_id
+        self.destination = header.rx_id
+        self.priority = header.priority
+        self.data_bytes = bus_message.data_bytes
+        self.incomplete = bus_message.incomplete
+        self.group = parameter_group(self.pgn)
+        self.values = {}
+        if self.group is not None:
+            self.values = self.group.decode(self.data_bytes)
+        return
+
+    def value(self, spn):
+        """Return the physical value of the given SPN, or None if it's
+        unavailable or not in this message"""
+        return self.values.get(spn)
+
+    def __str__(self):
+        if self.group is None:
+            bytestr = " ".join(["%02X" % x for x in self.data_bytes])
+            return "PGN %d from %02X [%s]" % (self.pgn, self.source, bytestr)
+        values = ["%s=%s" % (self.group.spn(number).name, value)
+                  for number, value in sorted(self.values.items())]
+        return "%s from %02X [%s]" % (self.group.name, self.source, ", ".join(values))
+
+
+def create(bus_message):
+    """Return the J1939Message decoding the given bus message"""
+    return J1939Message(bus_message)
+
+
+def messages(frames, protocol=None):
+    """Reassemble and decode a stream of J1939 frames, such as those
+    yielded by ELM327.monitor(), generating a (timestamp, J1939Message)
+    pair for each message as soon as it's complete.  Transport protocol
+    messages still partial at the end of the stream are generated last
+    (incomplete).
+
+    frames -- an iterable of (timestamp, J1939Frame) pairs
+    protocol -- the SAE_J1939 protocol of the frames, which selects
+        the reassembly timeout (the default is 250 Kbaud)
+    """
+    if protocol is None:
+        protocol = obd.protocol.SAE_J1939()
+    # the frames are already parsed
+    reassembler = obd.reassembly.StreamReassembler(protocol, parse_frame=_parsed)
+    timestamp = None
+    for timestamp, frame in frames:
+        for bus_message in reassembler.add(frame, timestamp):
+            yield timestamp, J1939Message(bus_message)
+    for bus_message in reassembler.flush():
+        yield timestamp, J1939Message(bus_message)
+    return
+
+def _parsed(frame):
+    """Return the given (already parsed) frame"""
+    return frame
+
+
+# The parameters of common broadcast PGNs (SAE J1939-71)
+register_parameter_group(ParameterGroup(61443, "EEC2", [
+    SPN(91, "Accelerator Pedal Position 1", 2, 8, 0.4, 0, "%"),
+    SPN(92, "Engine Percent Load At Current Speed", 3, 8, 1, 0, "%"),
+    ]))
+register_parameter_group(ParameterGroup(61444, "EEC1", [
+    SPN(512, "Driver's Demand Engine - Percent Torque", 2, 8, 1, -125, "%"),
+    SPN(513, "Actual Engine - Percent Torque", 3, 8, 1, -125, "%"),
+    SPN(190, "Engine Speed", 4, 16, 0.125, 0, "rpm"),
+    SPN(1483, "Source Address of Controlling Device", 6, 8, 1, 0, ""),
+    ]))
+register_parameter_group(ParameterGroup(65248, "VD", [
+    SPN(244, "Trip Distance", 1, 32, 0.125, 0, "km"),
+    SPN(245, "Total Vehicle Distance", 5, 32, 0.125, 0, "km"),
+    ]))
+register_parameter_group(ParameterGroup(65253, "HOURS", [
+    SPN(247, "Engine Total Hours of Operation", 1, 32, 0.05, 0, "h"),
+    SPN(249, "Engine Total Revolutions", 5, 32, 1000, 0, "r"),
+    ]))
+register_parameter_group(ParameterGroup(65257, "LFC", [
+    SPN(182, "Engine Trip Fuel", 1, 32, 0.5, 0, "L"),
+    SPN(250, "Engine Total Fuel Used", 5, 32, 0.5, 0, "L"),
+    ]))
+register_parameter_group(ParameterGroup(65262, "ET1", [
+    SPN(110, "Engine Coolant Temperature", 1, 8, 1, -40, "degC"),
+    SPN(174, "Engine Fuel Temperature 1", 2, 8, 1, -40, "degC"),
+    SPN(175, "Engine Oil Temperature 1", 3, 16, 0.03125, -273, "degC"),
+    SPN(176, "Engine Turbocharger Oil Temperature", 5, 16, 0.03125, -273, "degC"),
+    SPN(52, "Engine Intercooler Temperature", 7, 8, 1, -40, "degC"),
+    ]))
+register_parameter_group(ParameterGroup(65263, "EFL/P1", [
+    SPN(94, "Engine Fuel Delivery Pressure", 1, 8, 4, 0, "kPa"),
+    SPN(98, "Engine Oil Level", 3, 8, 0.4, 0, "%"),
+    SPN(100, "Engine Oil Pressure", 4, 8, 4, 0, "kPa"),
+    SPN(109, "Engine Coolant Pressure", 7, 8, 2, 0, "kPa"),
+    SPN(111, "Engine Coolant Level", 8, 8, 0.4, 0, "%"),
+    ]))
+register_parameter_group(ParameterGroup(65265, "CCVS", [
+    SPN(84, "Wheel-Based Vehicle Speed", 2, 16, 1 / 256.0, 0, "km/h"),
+    SPN(595, "Cruise Control Active", 4, 2, 1, 0, "", bit=1),
+    SPN(597, "Brake Switch", 4, 2, 1, 0, "", bit=5),
+    ]))
+register_parameter_group(ParameterGroup(65266, "LFE", [
+    SPN(183, "Engine Fuel Rate", 1, 16, 0.05, 0, "L/h"),
+    SPN(51, "Engine Throttle Position", 7, 8, 0.4, 0, "%"),
+    ]))
+register_parameter_group(ParameterGroup(65269, "AMB", [
+    SPN(108, "Barometric Pressure", 1, 8, 0.5, 0, "kPa"),
+    SPN(171, "Ambient Air Temperature", 4, 16, 0.03125, -273, "degC"),
+    SPN(172, "Engine Air Inlet Temperature", 6, 8, 1, -40, "degC"),
+    ]))
+register_parameter_group(ParameterGroup(65270, "IC1", [
+    SPN(102, "Engine Intake Manifold #1 Pressure", 2, 8, 2, 0, "kPa"),
+    SPN(105, "Engine Intake Manifold 1 Temperature", 3, 8, 1, -40, "degC"),
+    ]))
+register_parameter_group(ParameterGroup(65271, "VEP1", [
+    SPN(168, "Battery Potential / Power Input 1", 5, 16, 0.05, 0, "V"),
+    ]))
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
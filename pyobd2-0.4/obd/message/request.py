@@ -26,14 +26,17 @@
 """Implementation of OBDRequest and RawRequest"""
 
 from obd.util import *
+import obd.protocol
 
 class Request(object):
     """A class for encapsulating requests to send to the OBD bus via
     interface.send_request()
     
+    pids -- the list of PIDs requested (empty if not applicable)
     message() -- returns the actual bytes to send to the bus
     """
     def __init__(self):
+        self.pids = []
         return
     def message(self, protocol):
         """Return the actual bytes to send to the bus"""
@@ -64,28 +67,39 @@ class OBDRequest(Request):
     
     This allows clients to send most (all?) OBD requests given the
     SID and optional PID(s).
+
+    On ISO 15765-4 (CAN) vehicles, a single request may ask for up to
+    MAX_PIDS PIDs at once; each ECU then returns the data for all the
+    PIDs it supports in a single bus message, which the interface
+    splits into a separate Response for each PID.
     """
+    MAX_PIDS = 6  # per SAE J1979
+    
     def __init__(self, sid, pid=None):
         """Create a Request object representing an OBD request with
         the given SID and optional PID(s).
         
         sid -- the Service or Mode ID to request
         pid -- the Parameter ID (or equivalent to request); None if the
-            given SID does not use PIDs; when supported, this may
-            also be a list of PIDs.
+            given SID does not use PIDs; on ISO 15765-4 (CAN) vehicles,
+            this may also be a list of up to MAX_PIDS PIDs.
         """
         Request.__init__(self)
         self.sid = sid
         if pid is None:
             self.data = []
         elif isinstance(pid, list):
-            unimplemented("support for multiple PIDs per request")
-            self.data = pid
+            if len(pid) < 1 or len(pid) > self.MAX_PIDS:
+                raise ValueError("OBD requests take 1 to %d PIDs" % self.MAX_PIDS)
+            self.data = list(pid)
         else:
             self.data = [pid]
+        self.pids = list(self.data)
         return
     def message(self, protocol):
         """Return the actual bytes to send to the bus"""
+        if len(self.pids) > 1 and not isinstance(protocol, obd.protocol.ISO15765_4):
+            raise ValueError("Multiple PIDs per request require ISO 15765-4 (CAN)")
         return [self.sid] + self.data
 
 
@@ -28,7 +28,7 @@ requests and responses"""
 
 import copy
 
-from obd.message import register_response_class
+from obd.message import register_response_class, register_pid_lengths
 from obd.message.response import Response
 from obd.message.value import *
 from obd.util import *
@@ -772,139 +772,155 @@ _pid_classes = {
 for _pid, class_ in _pid_classes.items():
     register_response_class(sid=0x01, pid=_pid, cls=class_)
 
-"""
-lengths = {
-    0x01: { # SID $01
-        0x02: 2,
-        0x03: 2,
-        0x04: 1,
-        0x05: 1,
-        # 6-9 are 1-or-2
-        0x0A: 1,
-        0x0B: 1,
-        0x0C: 2,
-        0x0D: 1,
-        0x0E: 1,
-        0x0F: 1,
-        0x10: 2,
-        0x11: 1,
-        0x12: 1,
-        0x13: 1,
-        0x14: 2,
-        0x15: 2,
-        0x16: 2,
-        0x17: 2,
-        0x18: 2,
-        0x19: 2,
-        0x1A: 2,
-        0x1B: 2,
-        0x1C: 1,
-        0x1D: 1,        
-        0x1E: 1,
-        0x1F: 2,
-        0x21: 2,
-        0x22: 2,
-        0x23: 2,
-        0x24: 4,
-        0x25: 4,
-        0x26: 4,
-        0x27: 4,
-        0x28: 4,
-        0x29: 4,
-        0x2A: 4,
-        0x2B: 4,
-        0x2C: 1,
-        0x2D: 1,
-        0x2E: 1,
-        0x2F: 1,
-        0x30: 1,
-        0x31: 2,
-        0x32: 2,
-        0x33: 1,
-        0x34: 4,
-        0x35: 4,
-        0x36: 4,
-        0x37: 4,
-        0x38: 4,
-        0x39: 4,
-        0x3A: 4,
-        0x3B: 4,
-        0x3C: 2,
-        0x3D: 2,
-        0x3E: 2,
-        0x3F: 2,
-        0x41: 4,
-        0x42: 2,
-        0x43: 2,
-        0x44: 2,
-        0x45: 1,
-        0x46: 1,
-        0x47: 1,
-        0x48: 1,
-        0x49: 1,
-        0x4A: 1,
-        0x4B: 1,
-        0x4C: 1,
-        0x4D: 2,
-        0x4E: 2,
-        0x4F: 4,
-        0x50: 4,
-        0x51: 1,
-        0x52: 1,
-        0x53: 2,
-        0x54: 2,
-        # 55-58 are 1-or-2
-        0x59: 2,
-        0x5A: 1,
-        0x5B: 1,
-        0x5C: 1,
-        0x5D: 2,
-        0x5E: 2,
-        0x5F: 1,
-        0x61: 1,
-        0x62: 1,
-        0x63: 2,
-        0x64: 5,
-        0x65: 2,
-        0x66: 5,
-        0x67: 3,
-        0x68: 7,
-        0x69: 7,
-        0x6A: 5,
-        0x6B: 5,
-        0x6C: 5,
-        0x6D: 11,
-        0x6E: 9,
-        0x6F: 3,
-        0x70: 10,
-        0x71: 6,
-        0x72: 5,
-        0x73: 5,
-        0x74: 5,
-        0x75: 7,
-        0x76: 7,        
-        0x77: 5,
-        0x78: 9,
-        0x79: 9,
-        0x7A: 7,
-        0x7B: 7,
-        0x7C: 9,
-        0x7D: 1,
-        0x7E: 1,
-        0x7F: 13,
-        0x81: 41,
-        0x82: 41,
-        0x83: 9,
-        0x84: 1,
-        0x85: 10,
-        0x86: 5,
-        0x87: 5,
-        0x88: 13,
-        0x89: 41,
-        0x8A: 41,
-        0x8B: 8,        
-        },
-"""
+# Data lengths of the response to each PID, used to split responses to
+# requests for multiple PIDs
+_pid_lengths = {
+    0x00: 4,
+    0x01: 4,
+    0x02: 2,  # DTC that caused the freeze frame
+    0x03: 2,
+    0x04: 1,
+    0x05: 1,
+    0x06: (1, 2),  # 1 or 2 banks of O2 sensors
+    0x07: (1, 2),
+    0x08: (1, 2),
+    0x09: (1, 2),
+    0x0A: 1,
+    0x0B: 1,
+    0x0C: 2,
+    0x0D: 1,
+    0x0E: 1,
+    0x0F: 1,
+    0x10: 2,
+    0x11: 1,
+    0x12: 1,
+    0x13: 1,
+    0x14: 2,
+    0x15: 2,
+    0x16: 2,
+    0x17: 2,
+    0x18: 2,
+    0x19: 2,
+    0x1A: 2,
+    0x1B: 2,
+    0x1C: 1,
+    0x1D: 1,
+    0x1E: 1,
+    0x1F: 2,
+    0x20: 4,
+    0x21: 2,
+    0x22: 2,
+    0x23: 2,
+    0x24: 4,
+    0x25: 4,
+    0x26: 4,
+    0x27: 4,
+    0x28: 4,
+    0x29: 4,
+    0x2A: 4,
+    0x2B: 4,
+    0x2C: 1,
+    0x2D: 1,
+    0x2E: 1,
+    0x2F: 1,
+    0x30: 1,
+    0x31: 2,
+    0x32: 2,
+    0x33: 1,
+    0x34: 4,
+    0x35: 4,
+    0x36: 4,
+    0x37: 4,
+    0x38: 4,
+    0x39: 4,
+    0x3A: 4,
+    0x3B: 4,
+    0x3C: 2,
+    0x3D: 2,
+    0x3E: 2,
+    0x3F: 2,
+    0x40: 4,
+    0x41: 4,
+    0x42: 2,
+    0x43: 2,
+    0x44: 2,
+    0x45: 1,
+    0x46: 1,
+    0x47: 1,
+    0x48: 1,
+    0x49: 1,
+    0x4A: 1,
+    0x4B: 1,
+    0x4C: 1,
+    0x4D: 2,
+    0x4E: 2,
+    0x4F: 4,
+    0x50: 4,
+    0x51: 1,
+    0x52: 1,
+    0x53: 2,
+    0x54: 2,
+    0x55: (1, 2),  # 1 or 2 banks of O2 sensors
+    0x56: (1, 2),
+    0x57: (1, 2),
+    0x58: (1, 2),
+    0x59: 2,
+    0x5A: 1,
+    0x5B: 1,
+    0x5C: 1,
+    0x5D: 2,
+    0x5E: 2,
+    0x5F: 1,
+    0x60: 4,
+    0x61: 1,
+    0x62: 1,
+    0x63: 2,
+    0x64: 5,
+    0x65: 2,
+    0x66: 5,
+    0x67: 3,
+    0x68: 7,
+    0x69: 7,
+    0x6A: 5,
+    0x6B: 5,
+    0x6C: 5,
+    0x6D: 11,
+    0x6E: 9,
+    0x6F: 3,
+    0x70: 10,
+    0x71: 6,
+    0x72: 5,
+    0x73: 5,
+    0x74: 5,
+    0x75: 7,
+    0x76: 7,
+    0x77: 5,
+    0x78: 9,
+    0x79: 9,
+    0x7A: 7,
+    0x7B: 7,
+    0x7C: 9,
+    0x7D: 1,
+    0x7E: 1,
+    0x7F: 13,
+    0x80: 4,
+    0x81: 41,
+    0x82: 41,
+    0x83: 9,
+    0x84: 1,
+    0x85: 10,
+    0x86: 5,
+    0x87: 5,
+    0x88: 13,
+    0x89: 41,
+    0x8A: 41,
+    0x8B: 8,
+    0xA0: 4,
+    0xC0: 4,
+    0xE0: 4,
+    }
+
+register_pid_lengths(0x01, _pid_lengths)
 
 
 # vim: softtabstop=4 shiftwidth=4 expandtab
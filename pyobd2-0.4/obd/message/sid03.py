@@ -72,15 +72,15 @@ class LegacyFrameSid03(LegacyFrame):
         """
         untested("non-CAN SID 03 reassembly")
         # include the SID only once, at the beginning of the reassembled message
-        result = [self.data_bytes[self.SID]]  # SID
+        result = bytearray(self.data_bytes[self.SID:self.SID+1])  # SID
         for frame in frames:
             if frame == None:
                 untested("handling missing frame")
                 # insert None for each missing byte in a missing frame
-                result += [None] * (len(self.data_bytes) - (self.SID+1))
+                result = list(result) + [None] * (len(self.data_bytes) - (self.SID+1))
             else:
                 untested("assembling non-CAN frame")
-                result += frame.data_bytes[self.SID+1:]  # DTCs in each message
+                result.extend(frame.data_bytes[self.SID+1:])  # DTCs in each message
         return result
 LegacyFrame._classes[0x03] = LegacyFrameSid03
 LegacyFrame._classes[0x07] = LegacyFrameSid03  # SID $07 has identical format to SID $03
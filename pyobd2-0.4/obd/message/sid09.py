@@ -192,14 +192,14 @@ class LegacyFrameSid09(LegacyFrame):
         if self.pid() in self._sequence_lengths:
             # include the SID and PID only once, at the beginning of the
             # reassembled message
-            result = self.data_bytes[self.SID:self.PID+1]  # SID+PID
+            result = bytearray(self.data_bytes[self.SID:self.PID+1])  # SID+PID
             for frame in frames:
                 if frame == None:
                     untested("missing frames in non-CAN SID 09 message")
                     # insert None for each missing byte in a missing frame
-                    result += [None] * (len(self.data_bytes) - (self.MC+1))
+                    result = list(result) + [None] * (len(self.data_bytes) - (self.MC+1))
                 else:
-                    result += frame.data_bytes[self.MC+1:]  # skip SID/PID/MessageCount
+                    result.extend(frame.data_bytes[self.MC+1:])  # skip SID/PID/MessageCount
         else:
             assert len(frames) == 1
             assert self.pid() in [MC_VIN, MC_CALID, MC_CVN, MC_IPT, MC_ECUNAME]
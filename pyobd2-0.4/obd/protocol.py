@@ -39,7 +39,7 @@ indicate which protocol is currently in use:
   ISO9141_2
   ISO14230_4 (or KWP)
   ISO15765_4 (often imprecisely called "CAN")
-  SAE_J1939 (largely unimplemented)
+  SAE_J1939 (received frames only; see obd.message.j1939)
 
 For example:
 
@@ -236,6 +236,15 @@ class Frame(object):
         frames -- the list of frames in the sequence
         """
         return self.data_bytes  # default to a single-frame message
+    def message_header(self):
+        """Return the header of the message reassembled from the
+        sequence this frame begins.
+
+        This is usually the frame's own header; subclasses whose
+        messages are addressed differently than their frames (e.g.
+        J1939Frame) should override this as appropriate.
+        """
+        return self.header
 
 
 # MARK: -
@@ -315,7 +324,7 @@ class LegacyFrame(Frame):
         The header (which includes the address of the transmitter) + SID
         identify which message a legacy frame belongs to.
         """
-        return self.header.raw_bytes + [self.data_bytes[self.SID]]
+        return self.header.raw_bytes + self.data_bytes[self.SID:self.SID+1]
 
     _classes = {}  # subclasses are defined and registered in SID-specific files
     def create(raw_bytes, header):
@@ -800,17 +809,23 @@ class ISO15765Frame(Frame):
         
         frames -- the list of frames in the sequence
         """
-        result = []
+        result = bytearray()
         for i, frame in enumerate(frames):
             offset = 1  # skip PCI byte in SF or CF frame
             if i == 0 and len(frames) > 1:
                 offset = 2  # skip both PCI bytes in a FF frame
             if frame == None:
-                untested("missing frame in CAN message")
                 # insert None for each missing byte in a missing frame
-                result += [None] * (len(self.data_bytes) - offset)
+                # (which a bytearray can't hold)
+                result = list(result) + [None] * (len(self.data_bytes) - offset)
             else:
-                result += frame.data_bytes[offset:]
+                result.extend(frame.data_bytes[offset:])
+        # drop any padding following the data (as in the last frame of
+        # a multi-frame message), since responses to requests for
+        # multiple PIDs are split by position
+        length = self.data_length()
+        if length is not None:
+            del result[length:]
         return result
 
 
@@ -822,15 +837,18 @@ class SAE_J1939(CAN):
     name -- the human-readable name of the protocol
     baud -- the baud rate used to communicate with the vehicle
 
-    This is currently only used to specify the protocol to be used
-    (or supported) by an interface, and is not otherwise implemented.
+    Received frames are decoded (see J1939Header) and multi-packet
+    messages reassembled from the J1939-21 transport protocol (see
+    J1939Frame), e.g. when monitoring the bus; the parameters of the
+    reassembled messages are decoded by obd.message.j1939.  Sending
+    J1939 requests is not implemented.
     """
     def __init__(self, id_length=29, receive_id_length=None, data_length=8, baud=250000):
         """id_length -- 11 or 29 to represent 11-bit or 29-bit headers
             (default 29)
         data_length -- payload size of each frame (default 8 bytes)
         baud -- the baud rate used to communicate with the vehicle
-            (default 500K)
+            (default 250K)
         """
         CAN.__init__(self, "SAE_J1939",
                      id_length=id_length,
@@ -841,20 +859,197 @@ class SAE_J1939(CAN):
     def create_header(self, raw_bytes):
         """Return the appropriate protocol-specific header encapsulating
         the header bytes in the given data
-        
-        Not implemented.
         """
-        raise NotImplementedError()
-        return
+        if self.id_length != 29:
+            unimplemented("SAE J1939 with 11-bit headers")
+        return J1939Header(self, raw_bytes)
     def create_frame(self, raw_bytes):
         """Return the appropriate protocol-specific Frame object
         encapsulating the given data and reassembling it into a
         complete message.
         
-        Not implemented.
+        raw_bytes -- the raw bytes to encapsulate
         """
-        raise NotImplementedError()
+        header = self.create_header(raw_bytes)
+        return J1939Frame(raw_bytes, header)
+
+
+class J1939Header(Header):
+    """Protocol-specific class for encapsulating SAE J1939 message headers
+    
+    protocol -- an instance of the SAE_J1939 class
+    raw_bytes -- the raw header bytes (the 29-bit CAN ID, padded out
+        to 4 bytes)
+    length -- the number of bytes in the header (4)
+    tx_id -- the source address of the transmitting ECU
+    rx_id -- the destination address of the ECU to which the message is
+        addressed, or GLOBAL_ADDRESS for broadcast PGNs
+    priority -- the priority of the message (0-7, 0 being the highest)
+    pgn -- the Parameter Group Number identifying the message contents
+
+    PGNs with a PDU format (the second byte) below 240 are PDU1 PGNs,
+    whose last byte is taken by the destination address; the others
+    (PDU2) are broadcast, and their last byte is the group extension.
+    """
+    GLOBAL_ADDRESS = 0xFF
+    PDU2_FORMAT = 0xF0  # the lowest PDU format of broadcast PGNs
+
+    def __init__(self, protocol, raw_bytes):
+        """protocol -- an instance of the Protocol subclass asssociated with
+            this header
+        raw_bytes -- the raw bytes of the entire message, from which the
+            header bytes will be read"""
+        Header.__init__(self, protocol, raw_bytes[0:4])
+        self.priority = (raw_bytes[0] >> 2) & 0x07
+        pdu_format = raw_bytes[1]
+        # the extended data page and data page bits precede the PDU format
+        self.pgn = ((raw_bytes[0] & 0x03) << 16) | (pdu_format << 8)
+        if pdu_format < self.PDU2_FORMAT:
+            self.rx_id = raw_bytes[2]
+        else:
+            self.pgn |= raw_bytes[2]
+            self.rx_id = self.GLOBAL_ADDRESS
+        self.tx_id = raw_bytes[3]
         return
+
+    def raw_header(priority, pgn, source, destination=GLOBAL_ADDRESS):
+        """(Static) Return the raw header bytes of a message with the
+        given priority and PGN from the given source address to the
+        given destination address (ignored for broadcast PGNs).
+        """
+        if (pgn >> 8) & 0xFF < J1939Header.PDU2_FORMAT:
+            pgn = (pgn & ~0xFF) | destination
+        can_id = (priority << 26) | (pgn << 8) | source
+        return bytearray([(can_id >> 24) & 0xFF, (can_id >> 16) & 0xFF,
+                          (can_id >> 8) & 0xFF, can_id & 0xFF])
+    raw_header = staticmethod(raw_header)
+
+
+class J1939Frame(Frame):
+    """Represents a frame of the SAE J1939 protocol.
+
+    Most J1939 messages are single frames.  Longer ones are sent with
+    the J1939-21 transport protocol: a connection management (TP.CM)
+    frame announcing the message's PGN, size and number of packets,
+    either broadcast (BAM) or as a request to send (RTS) to one ECU,
+    followed by that many data transfer (TP.DT) frames, each carrying
+    a sequence number and 7 bytes of the message.  The announcement
+    and the data packets form one sequence, keyed by their source and
+    destination addresses; the flow control frames of a connection
+    (CTS, end of message acknowledgment, abort) are passed through as
+    single-frame messages.
+
+    raw_bytes -- the complete set of raw bytes making up the frame,
+        including header
+    header -- an instance of J1939Header
+    data_bytes -- the set of data bytes in the frame, excluding header
+    
+    message_header() -- Return the header of the reassembled message,
+        which carries the PGN announced by its TP.CM frame
+    assemble_message() -- Return the reassembled bytes given the full
+        set of received frames.
+    """
+    TP_CM = 0xEC00  # transport protocol connection management
+    TP_DT = 0xEB00  # transport protocol data transfer
+
+    RTS = 0x10  # request to send (connection mode data transfer)
+    BAM = 0x20  # broadcast announce message
+    TP_DATA = 7  # message bytes in each TP.DT frame
+
+    def _announces(self):
+        """Return whether this is a TP.CM frame announcing a message
+        (BAM or RTS)"""
+        return (self.header.pgn == self.TP_CM and
+                (self.data_bytes[0] == self.BAM or self.data_bytes[0] == self.RTS))
+    def _transfers(self):
+        """Return whether this frame is part of a transport protocol
+        message (its announcement or one of its data packets)"""
+        return self.header.pgn == self.TP_DT or self._announces()
+    def _sequence_key(self):
+        """Return the bytes comprising the sequence key for this frame.
+        
+        See Frame._sequence_key() for background.
+
+        The frames of a transport protocol message are identified by
+        their source and destination addresses; other frames by their
+        whole header.
+        """
+        if self._transfers():
+            return bytearray([0xEB, self.header.tx_id, self.header.rx_id])
+        return self.header.raw_bytes
+    def sequence_number(self, last_sn):
+        """Return the position of this frame in the sequence, or
+        None if there is no specified ordering.
+        
+        The TP.CM frame comes first, followed by the TP.DT frames in
+        the order of their (1-based) sequence numbers.
+        """
+        if self.header.pgn == self.TP_DT:
+            return self.data_bytes[0]
+        if self._announces():
+            return 0
+        return None
+    def sequence_length(self):
+        """Return the number of frames in the sequence, or None
+        if the length is not known.
+        
+        The length is known from a TP.CM frame (which announces the
+        number of packets), but not from a TP.DT frame.
+        """
+        if self.header.pgn == self.TP_DT:
+            return None
+        if self._announces():
+            return self.data_bytes[3] + 1
+        return 1
+    def data_length(self):
+        """Return the number of data bytes contained in the complete,
+        reassembled sequence, or None if this frame has no such
+        information.
+        """
+        if self.header.pgn == self.TP_DT:
+            return None
+        if self._announces():
+            return self.data_bytes[1] | (self.data_bytes[2] << 8)
+        return len(self.data_bytes)
+    def message_header(self):
+        """Return the header of the message reassembled from the
+        sequence this frame begins: for a TP.CM frame, a J1939Header
+        carrying the announced PGN (which the TP.DT frames lack).
+        """
+        if not self._announces():
+            return self.header
+        pgn = self.data_bytes[5] | (self.data_bytes[6] << 8) | (self.data_bytes[7] << 16)
+        raw_bytes = J1939Header.raw_header(self.header.priority, pgn,
+                                           self.header.tx_id, self.header.rx_id)
+        header = J1939Header(self.header.protocol, raw_bytes)
+        # a connection carries even a broadcast PGN to one destination
+        header.rx_id = self.header.rx_id
+        return header
+    def assemble_message(self, frames):
+        """Return the bytes contained in the complete, reassembled
+        sequence.
+
+        Reassemble the data contained in the individual frames into
+        the list of bytes comprising the complete message, excluding
+        any frame headers or footers.
+        
+        frames -- the list of frames in the sequence
+        """
+        if not self._transfers():
+            return self.data_bytes
+        result = bytearray()
+        for frame in frames[1:]:
+            if frame == None:
+                # insert None for each missing byte in a missing frame
+                # (which a bytearray can't hold)
+                result = list(result) + [None] * self.TP_DATA
+            else:
+                result.extend(frame.data_bytes[1:1+self.TP_DATA])
+        # drop the padding following the data in the last packet
+        length = self.data_length()
+        if length is not None:
+            del result[length:]
+        return result
         
 
 # vim: softtabstop=4 shiftwidth=4 expandtab                                     
@@ -0,0 +1,220 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Reassembly of bus messages from a stream of received frames.
+
+A StreamReassembler accepts frames one at a time, with the time each
+was received, and returns each bus message as soon as its last frame
+arrives.  Partial sequences which stop receiving frames are expired
+after a per-protocol timeout, and the number of partial sequences held
+at once is bounded, so an endless stream (e.g. from monitoring the bus)
+can be reassembled without accumulating state.  Interface uses one
+(without timestamps) to reassemble the frames of each response.
+"""
+
+import collections
+
+import obd.message
+import obd.protocol
+
+
+class StreamReassembler(object):
+    """Reassembles BusMessages from a stream of raw frames.
+
+    protocol -- the Protocol of the frames (None to rely on
+        parse_frame), which selects the default timeout
+    timeout -- the time (in seconds) a partial sequence may wait for
+        its next frame before it's expired, or None for the protocol's
+        default (see TIMEOUTS)
+    max_pending -- the number of partial sequences to hold at once;
+        beyond it, the least recently active one is expired
+    parse_frame -- a function returning the Frame for a raw frame, or
+        None (the default) to use protocol.create_frame()
+
+    completed -- the number of messages completed by their last frame
+    expired -- the number of partial sequences expired by timeout,
+        eviction, or flush(), which may be incomplete
+    """
+    # the time allowed between frames of a message: J1939-21's T2 (the
+    # longest a receiver waits for the data packets of a connection),
+    # ISO 15765-4's N_Cr (consecutive frame) timeout on other CAN, and
+    # the longest time between the responses of one ECU on the legacy
+    # protocols
+    TIMEOUTS = [(obd.protocol.SAE_J1939, 1.25), (obd.protocol.CAN, 0.15),
+                (obd.protocol.LegacyProtocol, 0.1)]
+    DEFAULT_TIMEOUT = 0.15
+    DEFAULT_MAX_PENDING = 256
+    # the most frames a sequence may hold (an ISO 15765-2 message of
+    # 4095 bytes), bounding the memory used by a runaway sequence
+    MAX_FRAMES = 586
+
+    def __init__(self, protocol=None, timeout=None,
+                 max_pending=DEFAULT_MAX_PENDING, parse_frame=None):
+        self.protocol = protocol
+        if timeout is None:
+            timeout = StreamReassembler.default_timeout(protocol)
+        self.timeout = timeout
+        self.max_pending = max_pending
+        if parse_frame is None:
+            parse_frame = protocol.create_frame
+        self._parse_frame = parse_frame
+        # key -> [frames, last sequence number, sequence length, deadline],
+        # least recently active first
+        self._pending = collections.OrderedDict()
+        self.completed = 0
+        self.expired = 0
+        return
+
+    def default_timeout(protocol):
+        """(Static) Return the default timeout for the given protocol"""
+        for protocol_class, timeout in StreamReassembler.TIMEOUTS:
+            if isinstance(protocol, protocol_class):
+                return timeout
+        return StreamReassembler.DEFAULT_TIMEOUT
+    default_timeout = staticmethod(default_timeout)
+
+    def __len__(self):
+        """Return the number of partial sequences pending"""
+        return len(self._pending)
+
+    def add(self, raw_frame, timestamp=None):
+        """Add a frame received at the given time (in seconds, or None
+        if frames aren't timed) and return the list of BusMessages
+        completed: any expired by then (see expire()), followed by the
+        one the frame completes (if any).
+
+        Note that a message whose length can't be determined is only
+        returned once it expires or is flushed.
+        """
+        return self.add_frame(self._parse_frame(raw_frame), timestamp)
+
+    def add_frame(self, frame, timestamp=None):
+        """Add an already parsed Frame received at the given time, as
+        add() does for a raw frame."""
+        messages = []
+        if timestamp is not None:
+            messages = self.expire(timestamp)
+        key = frame.sequence_key()
+
+        # Get the partial sequence for the given transmitter and receiver
+        state = self._pending.pop(key, None)
+        if state is None:
+            state = [[], 0, None, None]
+        frames, last_sequence_number, sequence_length, deadline = state
+
+        # Compute the current frame's sequence number
+        sequence_number = frame.sequence_number(last_sequence_number)
+
+        # A frame whose place is already taken starts a new sequence,
+        # abandoning the partial one (e.g. after a lost frame)
+        if (sequence_number is not None and sequence_number < len(frames) and
+            frames[sequence_number] is not None):
+            messages.append(self._expire(frames))
+            frames, last_sequence_number, sequence_length = [], 0, None
+            sequence_number = frame.sequence_number(last_sequence_number)
+
+        # Determine the number of frames needed to complete this message
+        if sequence_length is None:
+            sequence_length = frame.sequence_length()
+        frames_needed = sequence_length
+        if not frames_needed:
+            # If we can't tell how many frames are needed for this message, we know
+            # the message needs at least enough frames for this one
+            if sequence_number is None:
+                frames_needed = 0
+            else:
+                frames_needed = sequence_number + 1
+        frames_needed = min(frames_needed, StreamReassembler.MAX_FRAMES)
+
+        # Make sure there's room in the list of frames
+        if len(frames) < frames_needed:
+            frames.extend([None] * (frames_needed - len(frames)))
+
+        # Save the current frame, unless the sequence is already full
+        if sequence_number is not None:
+            if sequence_number < len(frames):
+                frames[sequence_number] = frame
+        else:
+            # Store unordered frames in the first available slot
+            try:
+                frames[frames.index(None)] = frame
+            except ValueError:
+                if len(frames) < StreamReassembler.MAX_FRAMES:
+                    frames.append(frame)
+
+        # When all the needed frames are received, post the completed message
+        if sequence_length is not None and None not in frames:
+            data = frames[0].assemble_message(frames)
+            header = frames[0].message_header()
+            messages.append(obd.message.BusMessage(header, data, frames))
+            self.completed += 1
+            return messages
+
+        # Otherwise (re)queue the sequence as the most recently active
+        if timestamp is not None:
+            deadline = timestamp + self.timeout
+        self._pending[key] = [frames, sequence_number, sequence_length, deadline]
+        while len(self._pending) > self.max_pending:
+            messages.append(self._expire(self._pending.popitem(last=False)[1][0]))
+        return messages
+
+    def expire(self, now):
+        """Expire the partial sequences whose timeouts have passed by
+        the given time (in seconds) and return their BusMessages.
+        Untimed sequences are left for flush().
+        """
+        expired = []
+        for key, state in self._pending.iteritems():
+            deadline = state[3]
+            if deadline is None:
+                continue
+            # the timed sequences' deadlines rise with their activity
+            if deadline > now:
+                break
+            expired.append(key)
+        return [self._expire(self._pending.pop(key)[0]) for key in expired]
+
+    def flush(self):
+        """Expire all the partial sequences (e.g. at the end of a
+        response) and return their BusMessages"""
+        messages = [self._expire(state[0]) for state in self._pending.values()]
+        self._pending.clear()
+        return messages
+
+    def _expire(self, frames):
+        """Return the BusMessage assembled from the frames of an
+        expired sequence, which may be incomplete.
+        """
+        self.expired += 1
+        # Find the first received (non-None) frame, in case we missed the
+        # first frame(s)
+        for first_received in frames:
+            if first_received is not None: break
+        else:
+            assert False, "message with no frames received"
+        data = first_received.assemble_message(frames)
+        return obd.message.BusMessage(first_received.message_header(), data, frames)
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
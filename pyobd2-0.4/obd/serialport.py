@@ -25,11 +25,21 @@
 
 """High-level serial port support for Interfaces.  Provides enumeration
 of serial ports and port recording/playback for regression testing.
+
+Network (e.g. WiFi) interfaces are reached by giving a port name of
+the form "tcp://host[:port][?keepalive=seconds]" in place of a serial
+port name; see SocketSerial.
 """
 
+import os
+import re
 import sys
 import glob
 import time
+import errno
+import select
+import socket
+import threading
 try:
     import serial as pyserial
 except ModuleError:
@@ -37,8 +47,202 @@ except ModuleError:
     sys.exit()
 
 import obd.exception as exception
+import obd.sessionlog as sessionlog
 from obd.util import warn, error
 
+class RingBuffer(object):
+    """A bounded FIFO of received bytes.  When full, the oldest bytes
+    are discarded to make room for new ones.
+
+    capacity -- the maximum number of bytes held
+    overruns -- the number of bytes discarded so far
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.overruns = 0
+        self._buffer = bytearray(capacity)
+        self._start = 0
+        self._length = 0
+        return
+
+    def __len__(self):
+        return self._length
+
+    def extend(self, data):
+        """Append the given bytes, discarding the oldest bytes if needed"""
+        if len(data) > self.capacity:
+            self.overruns += len(data) - self.capacity
+            data = data[-self.capacity:]
+        excess = self._length + len(data) - self.capacity
+        if excess > 0:
+            self.overruns += excess
+            self._start = (self._start + excess) % self.capacity
+            self._length -= excess
+        end = (self._start + self._length) % self.capacity
+        first = min(len(data), self.capacity - end)
+        self._buffer[end:end+first] = data[:first]
+        self._buffer[0:len(data)-first] = data[first:]
+        self._length += len(data)
+        return
+
+    def find(self, str, start=0):
+        """Return the position of the given string, like bytearray.find()"""
+        return self._contents().find(str, start)
+
+    def rfind(self, str, start=0):
+        """Return the position of the last occurrence of the given
+        string, like bytearray.rfind()"""
+        return self._contents().rfind(str, start)
+
+    def take(self, length=None):
+        """Remove and return the given number of bytes from the front
+        of the buffer, or all of them if None."""
+        if length is None:
+            length = self._length
+        result = bytes(self._contents()[:length])
+        self._start = (self._start + length) % self.capacity
+        self._length -= length
+        return result
+
+    def clear(self):
+        """Discard the contents of the buffer"""
+        self._start = 0
+        self._length = 0
+        return
+
+    def _contents(self):
+        """Return the contents as a contiguous bytearray, first
+        rotating the storage in place if the contents wrap around."""
+        if self._start + self._length > self.capacity:
+            self._buffer[:] = self._buffer[self._start:] + self._buffer[:self._start]
+            self._start = 0
+        return self._buffer[self._start:self._start+self._length]
+
+
+class SocketSerial(object):
+    """A TCP connection to a network (e.g. WiFi) interface, presenting
+    the subset of the pyserial Serial interface used by SerialPort.
+
+    Nagle's algorithm is disabled (TCP_NODELAY) so that each short
+    request is sent at once, and TCP keepalives (if enabled) detect a
+    dropped connection during long idle periods.  The socket itself is
+    non-blocking: read() waits for data with select() (up to the
+    timeout), then takes in bulk everything that has arrived, holding
+    any bytes not asked for until the next read.
+
+    The address has the form "tcp://host[:port][?keepalive=seconds]";
+    the port defaults to DEFAULT_PORT (that of most WiFi ELM327s), and
+    the keepalive idle time to DEFAULT_KEEPALIVE (0 disables it).
+    """
+    PREFIX = "tcp://"
+    DEFAULT_PORT = 35000
+    DEFAULT_KEEPALIVE = 10
+    RECV_SIZE = 4096
+
+    def __init__(self, address, timeout=2):
+        """address -- the interface's address (see above)
+        timeout -- the maximum time read() waits for data
+        """
+        host, port, keepalive = SocketSerial.parse_address(address)
+        self.name = address
+        self.timeout = timeout
+        self.baudrate = 38400  # meaningless, but kept for detection
+        self._buffer = bytearray()
+        try:
+            self.socket = socket.create_connection((host, port), timeout)
+        except socket.error as e:
+            raise pyserial.SerialException("could not connect to %s: %s" % (address, e))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if keepalive:
+            self._enable_keepalive(keepalive)
+        self.socket.setblocking(False)
+        return
+
+    def parse_address(address):
+        """(Static) Return the (host, port, keepalive) given by the
+        address, raising a ValueError if it's malformed.
+        """
+        match = re.match(r"tcp://([^:?/]+)(?::(\d+))?/?(?:\?keepalive=(\d+))?$", address)
+        if not match:
+            raise ValueError("Invalid network interface address %r" % address)
+        host, port, keepalive = match.groups()
+        if port is None: port = SocketSerial.DEFAULT_PORT
+        if keepalive is None: keepalive = SocketSerial.DEFAULT_KEEPALIVE
+        return host, int(port), int(keepalive)
+    parse_address = staticmethod(parse_address)
+
+    def _enable_keepalive(self, idle):
+        """Send keepalive probes after the given idle time (seconds),
+        where the platform allows configuring them"""
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in [("TCP_KEEPIDLE", idle), ("TCP_KEEPINTVL", idle),
+                              ("TCP_KEEPCNT", 3)]:
+            if hasattr(socket, option):
+                self.socket.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+        return
+
+    def _receive(self, wait):
+        """Add everything that has arrived to the buffer, first waiting
+        up to the given time (seconds) for anything to arrive."""
+        if not select.select([self.socket], [], [], wait)[0]:
+            return
+        while True:
+            try:
+                data = self.socket.recv(self.RECV_SIZE)
+            except socket.error as e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise pyserial.SerialException("%s: %s" % (self.name, e))
+            if not data:
+                raise pyserial.SerialException("%s: connection closed" % self.name)
+            self._buffer.extend(data)
+            if len(data) < self.RECV_SIZE:
+                return
+
+    def inWaiting(self):
+        """Return the number of bytes received but not yet read"""
+        self._receive(0)
+        return len(self._buffer)
+
+    def read(self, size=1):
+        """Return up to the given number of bytes, waiting up to the
+        timeout for the first to arrive"""
+        if not self._buffer:
+            self._receive(self.timeout)
+        result = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return result
+
+    def write(self, data):
+        """Send the given bytes"""
+        while data:
+            if not select.select([], [self.socket], [], self.timeout)[1]:
+                raise pyserial.SerialTimeoutException("%s: write timeout" % self.name)
+            try:
+                sent = self.socket.send(data)
+            except socket.error as e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    continue
+                raise pyserial.SerialException("%s: %s" % (self.name, e))
+            data = data[sent:]
+        return
+
+    def flushInput(self):
+        """Discard everything received but not yet read"""
+        self._receive(0)
+        del self._buffer[:]
+        return
+
+    def flushOutput(self):
+        """Nothing to do; writes are sent at once"""
+        return
+
+    def close(self):
+        """Close the connection"""
+        self.socket.close()
+        return
+
+
 class SerialPort(object):
     """Class used by Interfaces for managing common serial-port related tasks
     """
@@ -55,6 +259,8 @@ class SerialPort(object):
 
         if (sys.platform.startswith("darwin")):
             ports = SerialPort._find_mac_serial_ports()
+        elif (sys.platform.startswith("linux")):
+            ports = SerialPort._find_linux_serial_ports()
         else:
             raise exception.OBDException("Automatic interface detection not implemented for " + sys.platform)
         SerialPort.ports = ports
@@ -75,75 +281,272 @@ class SerialPort(object):
         return ports
     _find_mac_serial_ports = staticmethod(_find_mac_serial_ports)
 
-    def __init__(self, port):
+    def _find_linux_serial_ports():
+        """Return the list of accessible Linux USB serial ports: those
+        with persistent /dev/serial/by-id names (listed by those names,
+        in order), then any other /dev/ttyUSB* and /dev/ttyACM* ports.
+        """
+        ports = []
+        devices = set()
+        candidates = sorted(glob.glob("/dev/serial/by-id/*"))
+        candidates += sorted(glob.glob("/dev/ttyUSB*") + glob.glob("/dev/ttyACM*"),
+                             key=SerialPort._port_sort_key)
+        for name in candidates:
+            device = os.path.realpath(name)
+            if device in devices:
+                continue  # already listed by its by-id name
+            if os.access(device, os.R_OK | os.W_OK):
+                ports.append(name)
+                devices.add(device)
+        return ports
+    _find_linux_serial_ports = staticmethod(_find_linux_serial_ports)
+
+    def _port_sort_key(name):
+        """(Static) Return a key sorting port names with their numbers
+        in numerical order (e.g. ttyUSB2 before ttyUSB10).
+        """
+        return [int(part) if part.isdigit() else part
+                for part in re.split(r"(\d+)", name)]
+    _port_sort_key = staticmethod(_port_sort_key)
+
+    RX_BUFFER_SIZE = 65536
+
+    def __init__(self, port, reader_thread=False):
         """
         port -- the serial port name or ID needed for pyserial
-            to open the port; e.g., /dev/cu.1234, COM1, etc.
+            to open the port; e.g., /dev/cu.1234, COM1, etc.; or the
+            "tcp://" address of a network interface (see SocketSerial)
+        reader_thread -- True to receive data on a background thread
+            (see start_reader())
         """
-        self.port = pyserial.Serial(port,
-                                    baudrate = 38400,
-                                    parity = pyserial.PARITY_NONE,
-                                    stopbits = pyserial.STOPBITS_ONE,
-                                    bytesize = pyserial.EIGHTBITS,
-                                    timeout = 2)
+        # bytes received from the port but not yet returned to a caller
+        self._rx_buffer = bytearray()
+        self._reader = None
+        if port is not None and port.startswith(SocketSerial.PREFIX):
+            self.port = SocketSerial(port, timeout = 2)
+        else:
+            self.port = pyserial.Serial(port,
+                                        baudrate = 38400,
+                                        parity = pyserial.PARITY_NONE,
+                                        stopbits = pyserial.STOPBITS_ONE,
+                                        bytesize = pyserial.EIGHTBITS,
+                                        timeout = 2)
         self.name = port
         self.interval = 2
+        if reader_thread:
+            self.start_reader()
+
+    READER_POLL_INTERVAL = 0.05
+    def start_reader(self, capacity=RX_BUFFER_SIZE):
+        """Start receiving data on a background thread.
+
+        The thread posts incoming bytes to a RingBuffer of the given
+        capacity, and read_until_string() waits on a condition variable
+        until the awaited string arrives, returning as soon as it does.
+        This also spares set_timeout() from reconfiguring the port on
+        every call.
+
+        capacity -- the maximum number of unread bytes to hold; older
+            bytes are discarded if the buffer overflows
+        """
+        if self._reader: return
+        self._ring = RingBuffer(capacity)
+        self._ring.extend(self._take_rx_buffer())
+        self._rx_condition = threading.Condition()
+        self._last_rx_time = time.time()
+        self._reader_error = None
+        # bumped by each clear, so bytes received before it are dropped
+        self._clear_generation = 0
+        self._reader_running = True
+        self.port.timeout = self.READER_POLL_INTERVAL
+        self._reader = threading.Thread(target=self._reader_loop,
+                                        name="SerialPort reader (%s)" % self.name)
+        self._reader.setDaemon(True)
+        self._reader.start()
+        return
+
+    def stop_reader(self):
+        """Stop the background thread started by start_reader().  Any
+        unread data is kept for subsequent reads."""
+        if not self._reader: return
+        self._reader_running = False
+        self._reader.join()
+        self._reader = None
+        self._rx_buffer.extend(self._ring.take())
+        self.port.timeout = self.interval
+        return
+
+    def _reader_loop(self):
+        """Post data received from the port to the ring buffer until
+        stop_reader() is called."""
+        while self._reader_running:
+            generation = self._clear_generation
+            try:
+                waiting = self.port.inWaiting()
+                data = self.port.read(max(1, waiting))
+            except Exception as e:
+                # pass the error along to the next reader
+                self._rx_condition.acquire()
+                try:
+                    self._reader_error = e
+                    self._rx_condition.notifyAll()
+                finally:
+                    self._rx_condition.release()
+                return
+            if not data: continue
+            received = self._clear_generation
+            # FIXME: move 0x00 test to ELM327
+            if '\x00' in data:
+                data = data.replace('\x00', '')  # per note on p.6 of ELM327 data sheet
+            self._rx_condition.acquire()
+            try:
+                if received != self._clear_generation:
+                    continue  # read before the buffer was cleared
+                if waiting and generation != received:
+                    continue  # waiting in the port before the buffer was cleared
+                overruns = self._ring.overruns
+                self._ring.extend(data)
+                if self._ring.overruns != overruns:
+                    warn("%s: receive buffer overflowed" % self.name)
+                self._last_rx_time = time.time()
+                self._rx_condition.notifyAll()
+            finally:
+                self._rx_condition.release()
+        return
+
+    def close(self):
+        """Stop any reader thread and close the port"""
+        self.stop_reader()
+        self.port.close()
+        return
 
     def write(self, str):
         """Write the given string to the port"""
         self.port.flushOutput()
-        self.port.flushInput()
+        self._clear_rx_buffer()
         self.port.write(str)
         return
 
     MAX_READ_OVERRUN = 0.01
-    def read_until_string(self, str):
+    def read_until_string(self, str, last=False):
         """Read from the port until the given string is detected
         or the read times out, whichever comes first.
         
-        str -- the string to await
+        str -- the string to await; an empty string returns each
+            byte as soon as it is received
+        last -- True to read through the last occurrence of the string
+            received so far (e.g. every complete line) rather than the
+            first
         
         Raises an IntervalTimeout exception if the polling interval
         expires without receiving any data.  Raises a ReadTimeout
         exception if the read timout expires before the given string
         is encountered.  See set_timeout for more details.
+
+        Everything the port has received is drained into a buffer
+        with each read, so any bytes following the given string are
+        kept for the next call rather than read again one at a time.
         """
-        buffer = ""
+        if self._reader:
+            return self._wait_until_string(str, last)
+        buffer = self._rx_buffer
         interval = self.interval
+        searched = 0  # no need to search the same bytes twice
         try:
             while True:
+                end = self._find_string(buffer, str, searched, last)
+                if end:
+                    break
+                searched = max(0, len(buffer) - len(str) + 1)
                 remaining = self.timeout - time.time()
                 if (remaining <= 0):
-                    raise exception.ReadTimeout(response=buffer)
+                    raise exception.ReadTimeout(response=self._take_rx_buffer())
                 # make sure the read() doesn't go beyond the timeout
                 if remaining < interval and interval >= self.MAX_READ_OVERRUN:
                     interval = remaining / 2.0
-                    self.port.setTimeout(interval)
-                # read() times out after the polling interval set by set_timeout()
-                c = self.port.read(1)
-                if len(c) == 0 and interval == self.interval:
+                    self.port.timeout = interval
+                # read() times out after the polling interval set by set_timeout(),
+                # but returns immediately with whatever has already arrived
+                data = self.port.read(max(1, self.port.inWaiting()))
+                if len(data) == 0 and interval == self.interval:
                     # stop if the read timed out without data
-                    raise exception.IntervalTimeout(response=buffer)
+                    raise exception.IntervalTimeout(response=self._take_rx_buffer())
                 # FIXME: move 0x00 test to ELM327
-                if c == '\x00': continue  # per note on p.6 of ELM327 data sheet
-                buffer += c
-                if (buffer.endswith(str)):
-                    break
+                if '\x00' in data:
+                    data = data.replace('\x00', '')  # per note on p.6 of ELM327 data sheet
+                buffer.extend(data)
         finally:
             # if we temporarily dialed down the port's timeout to avoid
             # galloping past the timeout, restore it to its previous value
             if interval != self.interval:
-                self.port.setTimeout(self.interval)
+                self.port.timeout = self.interval
+
+        return self._take_rx_buffer(end)
+
+    def _wait_until_string(self, str, last=False):
+        """Wait for the reader thread to receive the given string (or
+        for the read to time out) and return the data received.  See
+        read_until_string() for details.
+        """
+        ring = self._ring
+        condition = self._rx_condition
+        condition.acquire()
+        try:
+            wait_start = time.time()
+            searched = 0
+            while True:
+                end = self._find_string(ring, str, searched, last)
+                if end:
+                    return ring.take(end)
+                searched = max(0, len(ring) - len(str) + 1)
+                if self._reader_error:
+                    raise self._reader_error
+                now = time.time()
+                remaining = self.timeout - now
+                if (remaining <= 0):
+                    raise exception.ReadTimeout(response=ring.take())
+                idle = now - max(wait_start, self._last_rx_time)
+                if idle >= self.interval:
+                    raise exception.IntervalTimeout(response=ring.take())
+                condition.wait(min(remaining, self.interval - idle))
+        finally:
+            condition.release()
+
+    def _find_string(buffer, str, start, last=False):
+        """(Static) Return the position just past the first occurrence
+        of the given string in the buffer, or 0 if it's not there yet.
 
-        return buffer
+        start -- the position in the buffer at which to begin searching
+        last -- True to find the last occurrence instead of the first
+        """
+        if not str:
+            return min(1, len(buffer))
+        if last:
+            pos = buffer.rfind(str, start)
+        else:
+            pos = buffer.find(str, start)
+        if pos < 0:
+            return 0
+        return pos + len(str)
+    _find_string = staticmethod(_find_string)
+
+    def _take_rx_buffer(self, end=None):
+        """Remove and return the receive buffer's contents up to (but
+        not including) the given position, or all of it if None.
+        """
+        if end is None:
+            end = len(self._rx_buffer)
+        result = bytes(self._rx_buffer[:end])
+        del self._rx_buffer[:end]
+        return result
 
     def get_baudrate(self):
         """Return the currently configured baud rate."""
-        return self.port.getBaudrate()
+        return self.port.baudrate
 
     def set_baudrate(self, baud):
         """Set the serial port baud rate."""
-        self.port.setBaudrate(baud)
+        self.port.baudrate = baud
         return
     
     def set_timeout(self, timeout, interval=None):
@@ -160,12 +563,28 @@ class SerialPort(object):
         if interval != self.interval:
             self.interval = interval
             # requires reconfiguring the port on some platforms, so avoid unnecessary calls
-            self.port.setTimeout(interval)
+            # (and the reader thread, if any, polls at its own fixed interval)
+            if not self._reader:
+                self.port.timeout = interval
         return
     
     def clear_rx_buffer(self):
         """Clear the receive buffer"""
-        self.port.flushInput()
+        return self._clear_rx_buffer()
+
+    def _clear_rx_buffer(self):
+        """Clear the receive buffer (without any logging by subclasses)"""
+        if self._reader:
+            self._rx_condition.acquire()
+            try:
+                self.port.flushInput()
+                self._ring.clear()
+                self._clear_generation += 1
+            finally:
+                self._rx_condition.release()
+        else:
+            self.port.flushInput()
+        del self._rx_buffer[:]
         return
     
     def clear_tx_buffer(self):
@@ -178,48 +597,59 @@ class SerialPortRecorder(SerialPort):
     """A SerialPort variant which records all activity to a file for
     subsequent review or playback.  See SerialPortPlayback as well.
     """
-    def __init__(self, port, filename):
+    def __init__(self, port, filename, indexed=False):
         """port -- the serial port name or ID needed for pyserial
             to open the port; e.g., /dev/cu.1234, COM1, etc.
-        filename -- the file to which to record serial port activity
+        filename -- the file to which to record serial port activity;
+            see obd.sessionlog for the formats, chosen by extension
+        indexed -- True to also write a sidecar sessionlog.SessionIndex
+            for the recording when the port is closed
         """
         SerialPort.__init__(self, port)
-        self.logfile = file(filename, "w")
-        self.logfile.write("%s\n" % port)
-        self.start_time = time.time()
+        index = None
+        if indexed:
+            index = sessionlog.SessionIndex()
+        self.logfile = sessionlog.create_log(filename, port, index)
         return
 
-    def log(self, str):
-        """Write the given string to the log file along with a timestamp"""
-        self.logfile.write("%0.4f %s\n" % (time.time() - self.start_time, str))
+    def log(self, action, *parameters):
+        """Log the given call, along with a timestamp.  See
+        obd.sessionlog for the actions and their parameters."""
+        self.logfile.log(action, *parameters)
+        return
+
+    def close(self):
+        """Close the port and the log file"""
+        SerialPort.close(self)
+        self.logfile.close()
         return
         
     def write(self, str):
         """Write (and log) the given string to the port"""
-        self.log("write %r" % str)
+        self.log("write", str)
         SerialPort.write(self, str)
         return
     
-    def read_until_string(self, string):
+    def read_until_string(self, string, last=False):
         """Read from the port until the given string is detected
         or the read times out, whichever comes first, and log the
         result.  See SerialPort.read_until_string() for details.
         """
         try:
-            result = SerialPort.read_until_string(self, string)
-            self.log("read-until %r = %r" % (string, result))
+            result = SerialPort.read_until_string(self, string, last)
+            self.log("read-until", string, result, None)
         except exception.Timeout as e:
             if isinstance(e, exception.IntervalTimeout): status = "interval-expired"
             else: status = "timeout-expired"
             result = e.response
-            self.log("read-until %r = %r [%s]" % (string, result, status))
+            self.log("read-until", string, result, status)
             raise e
         return result
     
     def set_baudrate(self, baud):
         """Set (and log) the serial port baud rate"""
         SerialPort.set_baudrate(self, baud)
-        self.log("set-baud %d" % baud)
+        self.log("set-baud", baud)
         return
     
     def set_timeout(self, timeout, interval=None):
@@ -227,19 +657,19 @@ class SerialPortRecorder(SerialPort):
         operations.  See SerialPort.set_timeout() for details.
         """
         SerialPort.set_timeout(self, timeout, interval)
-        self.log("set-timeout %f %f" % (timeout, self.interval))
+        self.log("set-timeout", timeout, self.interval)
         return
 
     def clear_rx_buffer(self):
         """Clear the receive buffer"""
         SerialPort.clear_rx_buffer(self)
-        self.log("clear rx")
+        self.log("clear", "rx")
         return
     
     def clear_tx_buffer(self):
         """Clear the transmission buffer"""
         SerialPort.clear_tx_buffer(self)
-        self.log("clear tx")
+        self.log("clear", "tx")
         return
 
 
@@ -256,35 +686,54 @@ class SerialPortPlayback(SerialPort):
     As a result, this is useful mostly for automated regression testing
     and debugging specific test cases.
     """
-    def __init__(self, filename, mimic_timing=False):
-        """filename -- the file containing serial port activity to replay
+    def __init__(self, filename, mimic_timing=False, start_time=None):
+        """filename -- the file containing serial port activity to replay,
+            in either of the formats described in obd.sessionlog
         mimic_timing -- True to cause calls to methods to take as
             long to return as they did during the recording session;
             otherwise they return immediately.
+        start_time -- the time (in seconds since the recording started)
+            of the first record to replay, found using the recording's
+            sessionlog.SessionIndex; None to replay from the beginning
         """
         try:
             SerialPort.__init__(self, None)
         except:
             pass
-        self.logfile = file(filename, "r")
-        port = self.logfile.readline().rstrip('\r\n')
-        self.name = "[Playback of %s from %s]" % (port, filename)
+        self.logfile = sessionlog.open_log(filename)
+        if start_time is None:
+            self._records = iter(self.logfile)
+        else:
+            self._records = self._records_from(filename, start_time)
+        self.name = "[Playback of %s from %s]" % (self.logfile.port_name, filename)
         self.mimic_timing = mimic_timing
         self.baudrate = 38400
         self.timestamp = None
         self.line_number = 1
         return
 
+    def close(self):
+        """Close the log file being replayed"""
+        self.logfile.close()
+        return
+
+    def _records_from(self, filename, start_time):
+        """Yield the records of the log from the given time onward"""
+        offset = sessionlog.load_index(filename).offset_at(start_time)
+        for offset, record in self.logfile.records(offset):
+            if record[0] >= start_time:
+                yield record
+        return
+
     def next_log(self, expected_action):
         """Return the next line from the log file and raise an exception
         if there's a major discrepancy.
         """
-        line = self.logfile.readline()
-        if not line: raise EOFError()
+        try:
+            timestamp, log_action, parameters = self._records.next()
+        except StopIteration:
+            raise EOFError()
         self.line_number += 1
-        line = line.rstrip('\r\n')
-        timestamp, log_action, parameters = line.split(" ", 2)
-        timestamp = float(timestamp)
         if not self.timestamp: self.timestamp = timestamp
         if expected_action != log_action:
             error("%d: %s != %s" % (self.line_number, expected_action, log_action))
@@ -295,27 +744,19 @@ class SerialPortPlayback(SerialPort):
         """Pretend to write the given string to the port, raising an
         exception if that's not what was written in the recorded session.
         """
-        timestamp, log_str = self.next_log("write")
-        log_str = eval(log_str)
+        timestamp, (log_str,) = self.next_log("write")
         if str != log_str:
             error("%d: write(%r) != log(%r)" % (self.line_number, str, log_str))
             raise ValueError
         self.timestamp = timestamp
         return
     
-    def read_until_string(self, str):
+    def read_until_string(self, str, last=False):
         """Pretend to read from the port until the given string is
         detected or the read times out.  Return the previously recorded
         result.
         """
-        timestamp, parameters = self.next_log("read-until")
-        # extract the argument, result, and status
-        status = None
-        if parameters.endswith("]"):
-            pos = parameters.rindex(" [")
-            status = parameters[pos+2:-1]
-            parameters = parameters[:pos]
-        log_str, log_result = [eval(p) for p in parameters.split(" = ", 1)]
+        timestamp, (log_str, log_result, status) = self.next_log("read-until")
 
         if log_str != str:
             warn("%d: read-until(%r) != log(%r)" % (self.line_number, str, log_str))
@@ -330,14 +771,17 @@ class SerialPortPlayback(SerialPort):
             raise exception.ReadTimeout(response=log_result)
         return log_result
     
+    def start_reader(self, capacity=SerialPort.RX_BUFFER_SIZE):
+        """Pretend to start a reader thread; playback has nothing to read"""
+        return
+
     def get_baudrate(self):
         """Return the currently configured baud rate"""
         return self.baudrate
     
     def set_baudrate(self, baud):
         """Pretend to set the serial port baud rate"""
-        timestamp, baudrate = self.next_log("set-baud")
-        baudrate = int(baudrate)
+        timestamp, (baudrate,) = self.next_log("set-baud")
         if baudrate != baud:
             warn("%d: set-baud(%d) != %d" % (self.line_number, baud, baudrate))
         self.baudrate = baudrate
@@ -347,8 +791,7 @@ class SerialPortPlayback(SerialPort):
     def set_timeout(self, timeout, interval=None):
         """Pretend to set the timeout and polling interval"""
         if interval == None: interval = timeout
-        timestamp, parameters = self.next_log("set-timeout")
-        log_timeout, log_interval = [float(p) for p in parameters.split(" ")]
+        timestamp, (log_timeout, log_interval) = self.next_log("set-timeout")
         if timeout != log_timeout or interval != log_interval:
             warn("%d: set-timeout(%f,%f) != log(%f,%f)" %
                   (self.line_number, timeout, interval, log_timeout, log_interval))
@@ -357,16 +800,173 @@ class SerialPortPlayback(SerialPort):
 
     def clear_rx_buffer(self):
         """Pretend to clear the receive buffer"""
-        timestamp, buffer = self.next_log("clear")
+        timestamp, (buffer,) = self.next_log("clear")
         if buffer != "rx":
             warn("%d: clear %s != rx" % (self.line_number, buffer))
         return
     
     def clear_tx_buffer(self):
         """Pretend to clear the transmission buffer"""
-        timestamp, buffer = self.next_log("clear")
+        timestamp, (buffer,) = self.next_log("clear")
         if buffer != "tx":
             warn("%d: clear %s != tx" % (self.line_number, buffer))
         return
 
+
+class SerialPortSimulator(SerialPort):
+    """A SerialPort variant which answers each write from the responses
+    to the same string found in one or more recorded sessions (see
+    SerialPortRecorder), in whatever order the writes arrive.
+
+    Where a string was written more than once during the recordings,
+    its recorded responses are given in turn, cycling back to the first
+    after the last.  Strings never recorded are answered as an ELM327
+    would answer a command it accepts: "OK" for AT commands and
+    "NO DATA" for anything else.  The lookup ignores spaces and ELM327
+    response count hints, so requests recorded with or without them
+    can be answered either way.
+
+    Unlike SerialPortPlayback, this is meant to drive new request
+    schedules (e.g. load tests) from captured vehicle sessions.
+    """
+    def __init__(self, filenames, time_scale=None):
+        """filenames -- the file (or list of files) of recorded
+            serial port activity
+        time_scale -- None to answer at once, otherwise the factor
+            by which to scale the recorded response times (e.g. 1.0
+            to take as long as the vehicle did)
+        """
+        try:
+            SerialPort.__init__(self, None)
+        except:
+            pass
+        if isinstance(filenames, basestring):
+            filenames = [filenames]
+        self.name = "[Simulation from %s]" % ", ".join(filenames)
+        self.time_scale = time_scale
+        self.baudrate = 38400
+        self.responses = {}
+        self._cycle = {}
+        for filename in filenames:
+            self._load(filename)
+        self._pending = ""
+        self._chunks = []
+        self._status = None
+        self._consumed = 0
+        self._write_time = time.time()
+        return
+
+    def _load(self, filename):
+        """Add the responses recorded in the given file to the table"""
+        logfile = sessionlog.open_log(filename)
+        try:
+            response = None
+            for timestamp, action, parameters in logfile:
+                if action == "write":
+                    response = []
+                    key = SerialPortSimulator._key(parameters[0])
+                    self.responses.setdefault(key, []).append(response)
+                    write_time = timestamp
+                elif action == "read-until" and response is not None:
+                    string, result, status = parameters
+                    response.append((result, timestamp - write_time, status))
+        finally:
+            logfile.close()
+        return
+
+    def _key(str):
+        """(Static) Return the table key for the given written string:
+        without spaces, the trailing CR, or any response count hint
+        """
+        key = str.rstrip("\r").replace(" ", "").upper()
+        if len(key) % 2 and not key.startswith("AT"):
+            try:
+                int(key, 16)
+                key = key[:-1]  # drop the hint
+            except ValueError:
+                pass
+        return key
+    _key = staticmethod(_key)
+
+    def write(self, str):
+        """Pretend to write the given string to the port, queueing
+        the recorded response to it"""
+        key = SerialPortSimulator._key(str)
+        responses = self.responses.get(key)
+        if responses:
+            index = self._cycle.get(key, 0)
+            self._cycle[key] = (index + 1) % len(responses)
+            response = responses[index]
+        elif key.startswith("AT"):
+            response = [("OK\r\r>", 0.0, None)]
+        else:
+            response = [("NO DATA\r\r>", 0.0, None)]
+        self._pending = "".join([result for result, elapsed, status in response])
+        self._chunks = []
+        end = 0
+        for result, elapsed, status in response:
+            end += len(result)
+            self._chunks.append((end, elapsed))
+        self._status = response and response[-1][2]
+        self._consumed = 0
+        self._write_time = time.time()
+        return
+
+    def read_until_string(self, str, last=False):
+        """Return the queued response up to and including the given
+        string, or raise the recorded timeout (a ReadTimeout if none
+        was recorded) if it's not there."""
+        end = self._find_string(self._pending, str, 0, last)
+        if not end:
+            result = self._pending
+            self._pending = ""
+            self._wait(self._consumed + len(result))
+            self._consumed += len(result)
+            if self._status == "interval-expired":
+                raise exception.IntervalTimeout(response=result)
+            raise exception.ReadTimeout(response=result)
+        result, self._pending = self._pending[:end], self._pending[end:]
+        self._consumed += end
+        self._wait(self._consumed)
+        return result
+
+    def _wait(self, position):
+        """If scaling time, wait until the recorded response had
+        been received through the given position"""
+        if self.time_scale is None or not self._chunks:
+            return
+        for end, elapsed in self._chunks:
+            if end >= position:
+                break
+        delay = self._write_time + elapsed * self.time_scale - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return
+
+    def start_reader(self, capacity=SerialPort.RX_BUFFER_SIZE):
+        """Pretend to start a reader thread; simulation has nothing to read"""
+        return
+
+    def get_baudrate(self):
+        """Return the currently configured baud rate"""
+        return self.baudrate
+
+    def set_baudrate(self, baud):
+        """Pretend to set the serial port baud rate"""
+        self.baudrate = baud
+        return
+
+    def set_timeout(self, timeout, interval=None):
+        """Pretend to set the timeout and polling interval"""
+        return
+
+    def clear_rx_buffer(self):
+        """Discard any queued response"""
+        self._pending = ""
+        return
+
+    def clear_tx_buffer(self):
+        """Pretend to clear the transmission buffer"""
+        return
+
 # vim: softtabstop=4 shiftwidth=4 expandtab                                     
@@ -0,0 +1,529 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Reading and writing the session logs made by SerialPortRecorder
+and replayed by SerialPortPlayback.
+
+Two formats are supported, chosen by file name:
+
+text (".txt") -- the original format: a line with the port name, then
+    one line per call, e.g. "1.5153 read-until '>' = '41 00 ...'"
+binary (BINARY_EXTENSION) -- a compact format for long captures:
+    a header (MAGIC, then the length-prefixed port name), then one
+    record per call, each a RECORD_HEADER (monotonic timestamp in
+    nanoseconds since the recording started, record type, payload
+    length) followed by the payload
+
+Each call is read back as a (timestamp, action, parameters) record:
+
+    "write"         (string,)
+    "read-until"    (string, result, status), the status being None,
+                    "interval-expired" or "timeout-expired"
+    "set-baud"      (baud,)
+    "set-timeout"   (timeout, interval)
+    "clear"         ("rx",) or ("tx",)
+
+Text logs are parsed with ast.literal_eval() rather than eval(), and
+binary logs not at all.  Run "python -m obd.sessionlog FILE.txt ..."
+to convert text logs to binary ones.
+
+Either kind of log may have a sidecar SessionIndex (named like the log
+plus INDEX_EXTENSION), written while recording or built afterwards,
+which lets records_between() and exchanges() go straight to the part
+of a long log they need.
+"""
+
+import os
+import ast
+import json
+import mmap
+import time
+import bisect
+import struct
+
+BINARY_EXTENSION = ".obdlog"
+INDEX_EXTENSION = ".idx"
+MAGIC = "PYOBDLOG\x01"
+RECORD_HEADER = struct.Struct("<QBI")
+
+_WRITE, _READ_UNTIL, _SET_BAUD, _SET_TIMEOUT, _CLEAR = range(1, 6)
+_ACTIONS = {_WRITE: "write", _READ_UNTIL: "read-until", _SET_BAUD: "set-baud",
+            _SET_TIMEOUT: "set-timeout", _CLEAR: "clear"}
+_STATUSES = [None, "interval-expired", "timeout-expired"]
+_READ_UNTIL_HEADER = struct.Struct("<BH")
+_BAUD = struct.Struct("<I")
+_TIMEOUT = struct.Struct("<dd")
+
+# a monotonic clock where available (Python 3.3 and later)
+_clock = getattr(time, "monotonic", time.time)
+
+def is_binary(filename):
+    """Return True if the named log is in the binary format"""
+    return filename.endswith(BINARY_EXTENSION)
+
+def open_log(filename):
+    """Return a reader for the named log, in either format"""
+    if is_binary(filename):
+        return BinaryLogReader(filename)
+    return TextLogReader(filename)
+
+def create_log(filename, port_name, index=None):
+    """Return a writer creating the named log, in the format given by
+    its extension, for the given port.
+
+    index -- a SessionIndex to fill in and save alongside the log
+        when it's closed, or None
+    """
+    if is_binary(filename):
+        return BinaryLogWriter(filename, port_name, index=index)
+    return TextLogWriter(filename, port_name, index=index)
+
+
+class TextLogWriter(object):
+    """Writes a text session log (and optionally its index)"""
+    def __init__(self, filename, port_name, index=None):
+        self.filename = filename
+        self.index = index
+        self.logfile = open(filename, "w")
+        self.logfile.write("%s\n" % port_name)
+        self.start_time = time.time()
+        return
+
+    def log(self, action, *parameters):
+        """Log a call; see the module documentation for the parameters"""
+        timestamp = time.time() - self.start_time
+        if self.index is not None:
+            self.index.add(self.logfile.tell(), round(timestamp, 4), action, parameters)
+        if action == "read-until":
+            string, result, status = parameters
+            text = "%r = %r" % (string, result)
+            if status:
+                text += " [%s]" % status
+        elif action == "write":
+            text = "%r" % parameters
+        elif action == "set-baud":
+            text = "%d" % parameters
+        elif action == "set-timeout":
+            text = "%f %f" % parameters
+        else:
+            text = "%s" % parameters
+        self.logfile.write("%0.4f %s %s\n" % (timestamp, action, text))
+        return
+
+    def flush(self):
+        self.logfile.flush()
+        return
+
+    def close(self):
+        self.logfile.close()
+        if self.index is not None:
+            self.index.save(self.filename + INDEX_EXTENSION)
+        return
+
+
+class TextLogReader(object):
+    """Reads a text session log, one record at a time
+
+    port_name -- the name of the recorded port
+    """
+    def __init__(self, filename):
+        self.logfile = open(filename, "r")
+        self.port_name = self.logfile.readline().rstrip("\r\n")
+        self.first_record = self.logfile.tell()
+        return
+
+    def __iter__(self):
+        self.logfile.seek(self.first_record)
+        for line in self.logfile:
+            yield TextLogReader.parse_line(line)
+        return
+
+    def records(self, offset=None):
+        """Yield (offset, record) pairs for each record from the given
+        offset (by default, the first record) to the end of the log"""
+        if offset is None: offset = self.first_record
+        self.logfile.seek(offset)
+        while True:
+            line = self.logfile.readline()
+            if not line:
+                break
+            yield offset, TextLogReader.parse_line(line)
+            offset = self.logfile.tell()
+        return
+
+    def parse_line(line):
+        """(Static) Return the (timestamp, action, parameters) record
+        given by a line of a text log"""
+        timestamp, action, text = line.rstrip("\r\n").split(" ", 2)
+        if action == "read-until":
+            status = None
+            if text.endswith("]"):
+                pos = text.rindex(" [")
+                status = text[pos+2:-1]
+                text = text[:pos]
+            string, result = [ast.literal_eval(p) for p in text.split(" = ", 1)]
+            parameters = (string, result, status)
+        elif action == "write":
+            parameters = (ast.literal_eval(text),)
+        elif action == "set-baud":
+            parameters = (int(text),)
+        elif action == "set-timeout":
+            parameters = tuple([float(p) for p in text.split(" ")])
+        else:
+            parameters = (text,)
+        return float(timestamp), action, parameters
+    parse_line = staticmethod(parse_line)
+
+    def close(self):
+        self.logfile.close()
+        return
+
+
+class BinaryLogWriter(object):
+    """Writes a binary session log, buffering the records in memory
+    and writing them out once buffer_size bytes accumulate or
+    flush_interval seconds have passed since they were last written.
+    """
+    def __init__(self, filename, port_name, buffer_size=65536, flush_interval=1.0,
+                 index=None):
+        self.filename = filename
+        self.index = index
+        self._written = 0
+        self.logfile = open(filename, "wb")
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = bytearray(MAGIC)
+        self._buffer += struct.pack("<H", len(port_name)) + port_name
+        self.start_time = _clock()
+        self._flush_timestamp = 0.0
+        self.flush()
+        return
+
+    def log(self, action, *parameters):
+        """Log a call; see the module documentation for the parameters"""
+        return self.log_at(_clock() - self.start_time, action, *parameters)
+
+    def log_at(self, timestamp, action, *parameters):
+        """Log a call made the given time (in seconds) after the
+        recording started"""
+        if action == "read-until":
+            string, result, status = parameters
+            record_type = _READ_UNTIL
+            payload = (_READ_UNTIL_HEADER.pack(_STATUSES.index(status), len(string)) +
+                       string + result)
+        elif action == "write":
+            record_type = _WRITE
+            payload = parameters[0]
+        elif action == "set-baud":
+            record_type = _SET_BAUD
+            payload = _BAUD.pack(*parameters)
+        elif action == "set-timeout":
+            record_type = _SET_TIMEOUT
+            payload = _TIMEOUT.pack(*parameters)
+        elif action == "clear":
+            record_type = _CLEAR
+            payload = parameters[0]
+        else:
+            raise ValueError("Unknown session log action %r" % action)
+        if self.index is not None:
+            self.index.add(self._written + len(self._buffer), timestamp, action, parameters)
+        self._buffer += RECORD_HEADER.pack(int(timestamp * 1e9), record_type, len(payload))
+        self._buffer += payload
+        if (len(self._buffer) >= self.buffer_size or
+            timestamp - self._flush_timestamp >= self.flush_interval):
+            self.flush()
+            self._flush_timestamp = timestamp
+        return
+
+    def flush(self):
+        """Write out the buffered records"""
+        self.logfile.write(self._buffer)
+        self.logfile.flush()
+        self._written += len(self._buffer)
+        del self._buffer[:]
+        return
+
+    def close(self):
+        self.flush()
+        self.logfile.close()
+        if self.index is not None:
+            self.index.save(self.filename + INDEX_EXTENSION)
+        return
+
+
+class BinaryLogReader(object):
+    """Reads a binary session log, one record at a time, from a
+    memory map of the file (or, if it can't be mapped, its contents)
+
+    port_name -- the name of the recorded port
+    """
+    def __init__(self, filename):
+        self.logfile = open(filename, "rb")
+        try:
+            self.data = mmap.mmap(self.logfile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError):
+            self.data = self.logfile.read()  # e.g. an empty file
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not a binary session log" % filename)
+        length, = struct.unpack_from("<H", self.data, len(MAGIC))
+        start = len(MAGIC) + 2
+        self.port_name = self.data[start:start+length]
+        self.first_record = start + length
+        return
+
+    def __iter__(self):
+        offset = self.first_record
+        while offset < len(self.data):
+            record, offset = self.read_record(offset)
+            yield record
+        return
+
+    def records(self, offset=None):
+        """Yield (offset, record) pairs for each record from the given
+        offset (by default, the first record) to the end of the log"""
+        if offset is None: offset = self.first_record
+        while offset < len(self.data):
+            record, next_offset = self.read_record(offset)
+            yield offset, record
+            offset = next_offset
+        return
+
+    def read_record(self, offset):
+        """Return the (timestamp, action, parameters) record at the
+        given offset, along with the offset of the next record"""
+        timestamp, record_type, length = RECORD_HEADER.unpack_from(self.data, offset)
+        start = offset + RECORD_HEADER.size
+        end = start + length
+        if end > len(self.data):
+            raise EOFError("truncated session log record at offset %d" % offset)
+        if record_type == _READ_UNTIL:
+            status, string_length = _READ_UNTIL_HEADER.unpack_from(self.data, start)
+            start += _READ_UNTIL_HEADER.size
+            parameters = (self.data[start:start+string_length],
+                          self.data[start+string_length:end], _STATUSES[status])
+        elif record_type == _SET_BAUD:
+            parameters = _BAUD.unpack_from(self.data, start)
+        elif record_type == _SET_TIMEOUT:
+            parameters = _TIMEOUT.unpack_from(self.data, start)
+        else:
+            parameters = (self.data[start:end],)
+        return (timestamp / 1e9, _ACTIONS[record_type], parameters), end
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.logfile.close()
+        return
+
+
+class SessionIndex(object):
+    """A sidecar index of a session log, mapping times and requests to
+    the byte offsets of the log's records.
+
+    every -- the number of records between checkpoints
+    checkpoints -- a list of (timestamp, offset) pairs, one for every
+        Nth record
+    postings -- a dict mapping the SID/PID of each OBD request (e.g.
+        "010C", or just "03" for SIDs without PIDs) to the offsets of
+        the records writing that request
+    """
+    DEFAULT_EVERY = 256
+
+    def __init__(self, every=DEFAULT_EVERY):
+        self.every = every
+        self.checkpoints = []
+        self.postings = {}
+        self._count = 0
+        return
+
+    def add(self, offset, timestamp, action, parameters):
+        """Index the record at the given offset"""
+        if self._count % self.every == 0:
+            self.checkpoints.append((timestamp, offset))
+        self._count += 1
+        if action == "write":
+            for key in SessionIndex.request_keys(parameters[0]):
+                self.postings.setdefault(key, []).append(offset)
+        return
+
+    def request_keys(string):
+        """(Static) Return the list of SID/PID keys for the OBD request
+        written as the given string (empty for anything else, such as
+        AT commands).  A Service $01 request for several PIDs has a key
+        for each.
+        """
+        request = string.rstrip("\r").replace(" ", "").upper()
+        if len(request) % 2:
+            request = request[:-1]  # drop any response count hint
+        try:
+            data = [int(request[pos:pos+2], 16) for pos in range(0, len(request), 2)]
+        except ValueError:
+            return []
+        if not data:
+            return []
+        if data[0] == 0x01:
+            return ["01%02X" % pid for pid in data[1:]]
+        return ["".join(["%02X" % b for b in data[:2]])]
+    request_keys = staticmethod(request_keys)
+
+    def key(sid, pid=None):
+        """(Static) Return the postings key for the given SID and PID"""
+        if pid is None:
+            return "%02X" % sid
+        return "%02X%02X" % (sid, pid)
+    key = staticmethod(key)
+
+    def offset_at(self, timestamp):
+        """Return the offset of the last checkpoint at or before the
+        given time, or None if there's none (i.e. start at the first
+        record)"""
+        pos = bisect.bisect_right([t for t, offset in self.checkpoints], timestamp)
+        if pos == 0:
+            return None
+        return self.checkpoints[pos-1][1]
+
+    def save(self, filename):
+        """Write the index to the named file"""
+        f = open(filename, "w")
+        try:
+            json.dump({"every": self.every, "count": self._count,
+                       "checkpoints": self.checkpoints,
+                       "postings": self.postings}, f)
+        finally:
+            f.close()
+        return
+
+    def load(filename):
+        """(Static) Return the index read from the named file"""
+        f = open(filename, "r")
+        try:
+            entries = json.load(f)
+        finally:
+            f.close()
+        index = SessionIndex(entries["every"])
+        index._count = entries["count"]
+        index.checkpoints = [tuple(c) for c in entries["checkpoints"]]
+        index.postings = dict([(str(k), v) for k, v in entries["postings"].items()])
+        return index
+    load = staticmethod(load)
+
+    def build(log_filename, every=DEFAULT_EVERY):
+        """(Static) Return an index of the named log, reading it all"""
+        index = SessionIndex(every)
+        log = open_log(log_filename)
+        try:
+            for offset, (timestamp, action, parameters) in log.records():
+                index.add(offset, timestamp, action, parameters)
+        finally:
+            log.close()
+        return index
+    build = staticmethod(build)
+
+def load_index(log_filename):
+    """Return the index of the named log: its sidecar index if there's
+    an up-to-date one, otherwise a new index (saved as its sidecar)"""
+    index_filename = log_filename + INDEX_EXTENSION
+    try:
+        if os.path.getmtime(index_filename) >= os.path.getmtime(log_filename):
+            return SessionIndex.load(index_filename)
+    except (OSError, IOError, ValueError, KeyError):
+        pass
+    index = SessionIndex.build(log_filename)
+    try:
+        index.save(index_filename)
+    except IOError:
+        pass  # e.g. a read-only directory
+    return index
+
+def records_between(log_filename, start, end):
+    """Return the list of (timestamp, action, parameters) records of
+    the named log made from the start time up to (but not including)
+    the end time (in seconds since the recording started)"""
+    index = load_index(log_filename)
+    log = open_log(log_filename)
+    records = []
+    try:
+        for offset, record in log.records(index.offset_at(start)):
+            if record[0] >= end:
+                break
+            if record[0] >= start:
+                records.append(record)
+    finally:
+        log.close()
+    return records
+
+def exchanges(log_filename, sid, pid=None):
+    """Return a list of the exchanges in the named log for the given
+    SID (and PID, if it has one): one (request, responses) pair for
+    each time the request was written, the request being the write
+    record and the responses the list of records up to the next write.
+    """
+    index = load_index(log_filename)
+    log = open_log(log_filename)
+    results = []
+    try:
+        for offset in index.postings.get(SessionIndex.key(sid, pid), []):
+            records = log.records(offset)
+            request = records.next()[1]
+            responses = []
+            for offset, record in records:
+                if record[1] == "write":
+                    break
+                responses.append(record)
+            results.append((request, responses))
+    finally:
+        log.close()
+    return results
+
+def convert(text_filename, binary_filename=None):
+    """Convert a text session log to a binary one (by default, named
+    like the text log but with the BINARY_EXTENSION), returning the
+    name of the binary log.  The recorded timestamps are kept.
+    """
+    if binary_filename is None:
+        binary_filename = os.path.splitext(text_filename)[0] + BINARY_EXTENSION
+    reader = TextLogReader(text_filename)
+    writer = BinaryLogWriter(binary_filename, reader.port_name)
+    try:
+        for timestamp, action, parameters in reader:
+            writer.log_at(timestamp, action, *parameters)
+    finally:
+        writer.close()
+        reader.close()
+    return binary_filename
+
+def main():
+    import sys
+    if len(sys.argv) < 2:
+        sys.stderr.write("Usage: python -m obd.sessionlog FILE.txt ...\n")
+        sys.exit(1)
+    for filename in sys.argv[1:]:
+        print "%s -> %s" % (filename, convert(filename))
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
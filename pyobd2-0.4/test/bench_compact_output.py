@@ -0,0 +1,133 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Compare the characters received and the CPU cost of parsing the
+OBD responses in the recorded CAN sessions as recorded (spaces and
+headers on) against compact output (spaces off) and, for responses
+from a single ECU, compact output with headers off.
+
+Usage: python bench_compact_output.py
+"""
+
+from benchharness import recorded_sessions, recorded_reads, cpu_time, report
+from testharness import ScriptedPort
+from obd.interface.elm import ELM327
+
+
+def spaced_message_bytes(ascii_messages):
+    """The original implementation of _message_bytes_from_ascii()"""
+    raw_messages = []
+    for message in ascii_messages:
+        message = message.replace(" ", "")
+        if len(message) & 1: message = "00000" + message
+        raw_message = []
+        for i in range(0, len(message), 2):
+            raw_message.append(int(message[i:i+2], 16))
+        raw_messages.append(raw_message)
+    return raw_messages
+
+
+def headerless_lines(lines):
+    """Return the given (spaced, single-ECU) CAN frames as the ELM
+    prints them with spaces and headers off"""
+    result = []
+    for line in lines:
+        data = line.split()[1:]
+        if data[0][0] == "0":
+            result.append("".join(data[1:1+int(data[0], 16)]))
+        elif data[0][0] == "1":
+            result.append("%s%s" % (data[0][1], data[1]))
+            result.append("0:" + "".join(data[2:]))
+        else:
+            result.append("%s:%s" % (data[0][1], "".join(data[1:])))
+    return result
+
+
+def obd_responses(session):
+    """Return the line lists of the OBD responses in the session"""
+    responses = []
+    for string, result, status in recorded_reads(session):
+        lines = result.rstrip(">").strip("\r").split("\r")
+        if string == ">" and not status and lines[0][:1] in "17":
+            if len(lines[0].split()) > 4:
+                responses.append([line.rstrip() for line in lines])
+    return responses
+
+
+def create_elm(compact, header=None):
+    elm = ELM327(ScriptedPort({}), "ELM327")
+    elm.compact_output = compact
+    elm._synthetic_header = header
+    return elm
+
+
+def repeat(fn, responses, times=100):
+    for i in range(times):
+        for lines in responses:
+            fn(lines)
+    return
+
+
+def wire_size(responses):
+    return sum([len("\r".join(lines)) for lines in responses])
+
+
+def frame_count(responses):
+    return 100 * sum([len(lines) for lines in responses])
+
+
+def main():
+    for protocol, header, ecu in [
+            ("iso15765_11bit", bytearray([0x00, 0x00, 0x07, 0xE8]), "7E8 "),
+            ("iso15765_29bit", bytearray([0x18, 0xDA, 0xF1, 0x10]), "18 DA F1 10 ")]:
+        spaced = []
+        for session in recorded_sessions([protocol]):
+            spaced.extend(obd_responses(session))
+        compact = [[l.replace(" ", "") for l in lines] for lines in spaced]
+        # responses from the first ECU alone, as if it were the only one
+        single = [[l for l in lines if l.startswith(ecu)] for lines in spaced]
+        single = [lines for lines in single if lines]
+        headerless = [headerless_lines(lines) for lines in single]
+
+        print "%s: %d chars spaced -> %d compact (%.0f%%); single ECU %d -> %d headerless (%.0f%%)" % \
+            (protocol, wire_size(spaced), wire_size(compact),
+             100.0 * wire_size(compact) / wire_size(spaced),
+             wire_size(single), wire_size(headerless),
+             100.0 * wire_size(headerless) / wire_size(single))
+
+        elm = create_elm(True)
+        before = cpu_time(lambda: repeat(spaced_message_bytes, spaced))
+        after = cpu_time(lambda: repeat(elm._message_bytes_from_ascii, compact))
+        report(protocol + " compact", frame_count(spaced), before, after)
+        elm = create_elm(True, header)
+        before = cpu_time(lambda: repeat(spaced_message_bytes, single))
+        after = cpu_time(lambda: repeat(elm._message_bytes_from_ascii, headerless))
+        report(protocol + " headerless", frame_count(single), before, after)
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,113 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Measure how fast a saturated SAE J1939 bus can be decoded: each
+frame parsed, reassembled (including transport protocol messages) and
+its parameters decoded, as obd.message.j1939.messages() does for a
+monitored bus.
+
+Usage: python bench_j1939.py [seconds]
+
+The simulated traffic (default 10 seconds of it) fills a 250 Kbaud bus
+with 8-byte frames: the usual engine broadcasts at their J1939-71
+rates, a BAM transfer of the VIN every second, and proprietary frames
+(with no registered parameters) in between.
+"""
+
+import sys
+
+from benchharness import cpu_time
+import obd.message.j1939
+import obd.protocol
+from obd.protocol import J1939Header, J1939Frame
+
+# the longest 29-bit CAN frame with 8 data bytes, including worst-case
+# bit stuffing and the interframe space
+FRAME_BITS = 160
+BAUD = 250000
+
+# (PGN, source address, period in seconds) of the broadcasts
+BROADCASTS = [(61444, 0x00, 0.01), (61443, 0x00, 0.05), (65265, 0x00, 0.1),
+              (65266, 0x00, 0.1), (65262, 0x00, 1.0), (65263, 0x00, 0.5),
+              (65269, 0x00, 1.0), (65270, 0x00, 0.5), (65271, 0x00, 1.0),
+              (65248, 0x00, 1.0), (65253, 0x00, 1.0), (65257, 0x00, 1.0)]
+VIN = bytearray("1FUJA6CK77LY12345*")
+
+def _frame(priority, pgn, source, data):
+    return J1939Header.raw_header(priority, pgn, source) + bytearray(data)
+
+def traffic(seconds):
+    """Return a list of (timestamp, frame) pairs filling the bus for
+    the given number of seconds"""
+    protocol = obd.protocol.SAE_J1939()
+    slot = float(FRAME_BITS) / BAUD
+    due = dict([(b, 0.0) for b in BROADCASTS])
+    pending = []  # frames of a transport protocol message in progress
+    frames = []
+    for i in range(int(seconds / slot)):
+        now = i * slot
+        raw_frame = None
+        for broadcast in BROADCASTS:
+            if due[broadcast] <= now:
+                due[broadcast] += broadcast[2]
+                raw_frame = _frame(3, broadcast[0], broadcast[1], range(0x20, 0x28))
+                break
+        if raw_frame is None and i % int(1 / slot) == 0:
+            pending = [_frame(7, J1939Frame.TP_CM, 0x00,
+                              [J1939Frame.BAM, len(VIN), 0, 3, 0xFF, 0xEC, 0xFE, 0x00])]
+            for sn in range(1, 4):
+                pending.append(_frame(7, J1939Frame.TP_DT, 0x00,
+                                      [sn] + list(VIN[(sn-1)*7:sn*7].ljust(7, "\xFF"))))
+        if raw_frame is None and pending and i % 20 == 0:
+            raw_frame = pending.pop(0)  # BAM packets are 50-200 ms apart
+        if raw_frame is None:
+            raw_frame = _frame(6, 0xFF00 | (i & 0xFF), 0x03, [i & 0xFF] * 8)
+        frames.append((now, protocol.create_frame(raw_frame)))
+    return frames
+
+def decode(frames):
+    count = 0
+    for timestamp, message in obd.message.j1939.messages(frames):
+        count += 1
+    return count
+
+def main():
+    seconds = 10
+    if len(sys.argv) > 1:
+        seconds = float(sys.argv[1])
+    frames = traffic(seconds)
+    count = decode(frames)
+    elapsed = cpu_time(lambda: decode(frames))
+    capacity = float(BAUD) / FRAME_BITS
+    rate = len(frames) / elapsed
+    print "%d frames (%d messages) in %.3f s of CPU time" % (len(frames), count, elapsed)
+    print "%.0f frames/s decoded; a saturated %d Kbaud bus carries %.0f (%.1fx real time)" % \
+        (rate, BAUD // 1000, capacity, rate / capacity)
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,110 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Compare the CPU cost of ELM32X._parse_response(), which scans each
+response for errors with a single compiled pattern, against the
+previous line-by-line checks, over the responses in the recorded
+sessions.
+
+Usage: python bench_parse_response.py
+"""
+
+import re
+
+from benchharness import recorded_sessions, recorded_reads, cpu_time, report
+from testharness import ScriptedPort
+import obd.exception
+from obd.interface.elm import ELM32X, ELM327, ELM32XError
+
+
+def squeeze(line):
+    return line.replace(" ", "")
+
+def linewise_parse_response(self, response):
+    """The previous implementation of ELM32X._parse_response()"""
+    response = response.strip("\r")
+    lines = response.split("\r")
+    for line in lines:
+        squeezed = squeeze(line)
+        if line == "?":
+            raise obd.exception.CommandNotSupported()
+        if squeezed == "NODATA":
+            raise obd.exception.DataError(raw=line)
+        if squeezed.endswith("BUSBUSY") or squeezed.endswith("DATAERROR"):
+            raise obd.exception.DataError(raw=line)
+        if squeezed.endswith("BUSERROR") or squeezed.endswith("FBERROR") or squeezed.endswith("LVRESET"):
+            raise obd.exception.BusError(line)
+        if squeezed.endswith("CANERROR") or squeezed.endswith("RXERROR"):
+            raise obd.exception.ProtocolError(raw=line)
+        if squeezed.endswith("BUFFERFULL"):
+            raise obd.exception.BufferOverflowError(raw=line)
+        if squeezed.find("<DATAERROR") != -1:
+            raise obd.exception.DataError(raw=line)
+        matched = re.search(r"ERR\d\d", line)
+        if (matched):
+            raise ELM32XError(matched.group(0))
+    return lines
+
+
+def outcome(parse, elm, response):
+    """Return the result of parsing the response, or the class of the
+    exception raised"""
+    try:
+        return parse(elm, response)
+    except obd.exception.OBDException as e:
+        return type(e)
+
+
+def parse_all(parse, elm, responses, times=100):
+    for i in range(times):
+        for response in responses:
+            try:
+                parse(elm, response)
+            except obd.exception.OBDException:
+                pass
+    return
+
+
+def main():
+    elm = ELM327(ScriptedPort({}), "ELM327")
+    responses = []
+    for session in recorded_sessions():
+        for string, result, status in recorded_reads(session):
+            if string == ELM32X.PROMPT and not status:
+                responses.append(ELM32X._strip_prompt(result))
+    for response in responses:
+        assert outcome(linewise_parse_response, elm, response) == \
+            outcome(ELM32X._parse_response, elm, response)
+    errors = len([r for r in responses if isinstance(outcome(ELM32X._parse_response, elm, r), type)])
+
+    before = cpu_time(lambda: parse_all(linewise_parse_response, elm, responses))
+    after = cpu_time(lambda: parse_all(ELM32X._parse_response, elm, responses))
+    report("responses (%d errors)" % errors, 100 * len(responses), before, after)
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,82 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Measure polling throughput against the ELM327 emulator, with the
+interface's default timing and with response count hints and adaptive
+timing enabled.
+
+Usage: python bench_polling.py [requests] [baud]
+
+The emulated vehicle has two ECUs on an 11-bit CAN bus, responding
+after 20 and 40 ms; the requests (default 50) cycle through RPM, speed
+and coolant temperature.
+"""
+
+import sys
+import time
+
+from benchharness import report
+import obd.interface.elm
+import obd.protocol
+from obd.emulator import ELM327Emulator, sample_vehicle
+from obd.message import OBDRequest
+from obd.serialport import SerialPort
+
+def poll(count, baud, tuned):
+    """Return the wall-clock time taken to send the given number of
+    requests to a freshly connected interface"""
+    emulator = ELM327Emulator(sample_vehicle(obd.protocol.ISO15765_4(id_length=11)), baud)
+    emulator.start()
+    interface = obd.interface.elm.create(SerialPort(emulator.port_name))
+    try:
+        if tuned:
+            interface.enable_response_counts()
+            interface.enable_adaptive_timing()
+        interface.connect_to_vehicle()
+        requests = [OBDRequest(sid=0x01, pid=pid) for pid in (0x0C, 0x0D, 0x05)]
+        start = time.time()
+        for i in range(count):
+            interface.send_request(requests[i % len(requests)])
+        return time.time() - start
+    finally:
+        interface.port.close()
+        emulator.stop()
+
+def main():
+    count = 50
+    baud = 38400
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        baud = int(sys.argv[2])
+    before = poll(count, baud, tuned=False)
+    after = poll(count, baud, tuned=True)
+    report("polling at %d baud" % baud, count, before, after)
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,143 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Compare the CPU cost of SerialPort.read_until_string() against the
+original byte-at-a-time implementation, feeding both the bytes received
+in the recorded sessions.
+
+Usage: python bench_read_until_string.py [chunk size]
+
+The chunk size (default 62, the payload of a full-speed FTDI USB
+packet) is the number of bytes that arrive from the port at once.
+"""
+
+import sys
+import time
+
+from benchharness import recorded_sessions, recorded_reads, cpu_time, report
+import obd.exception
+from obd.serialport import SerialPort
+
+
+class ReplayedSerial(object):
+    """Stands in for a pyserial port that receives the given data
+    a chunk at a time."""
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.rewind()
+        return
+    def rewind(self):
+        self.pos = 0
+        self.arrived = 0
+        return
+    def _arrive(self):
+        if self.pos == self.arrived:
+            self.arrived = min(len(self.data), self.pos + self.chunk_size)
+        return
+    def inWaiting(self):
+        self._arrive()
+        return self.arrived - self.pos
+    def read(self, size=1):
+        self._arrive()
+        size = min(size, self.arrived - self.pos)
+        result = self.data[self.pos:self.pos+size]
+        self.pos += size
+        return result
+
+
+class ReplayedPort(SerialPort):
+    """A SerialPort reading from a ReplayedSerial instead of pyserial"""
+    def __init__(self, data, chunk_size):
+        self._rx_buffer = bytearray()
+        self._reader = None
+        self.port = ReplayedSerial(data, chunk_size)
+        self.name = "[replay]"
+        self.interval = 2
+        self.timeout = time.time() + 3600
+        return
+    def rewind(self):
+        self.port.rewind()
+        del self._rx_buffer[:]
+        return
+
+
+def bytewise_read_until_string(self, str):
+    """The original implementation of SerialPort.read_until_string()"""
+    buffer = ""
+    interval = self.interval
+    try:
+        while True:
+            remaining = self.timeout - time.time()
+            if (remaining <= 0):
+                raise obd.exception.ReadTimeout(response=buffer)
+            if remaining < interval and interval >= self.MAX_READ_OVERRUN:
+                interval = remaining / 2.0
+                self.port.timeout = interval
+            c = self.port.read(1)
+            if len(c) == 0 and interval == self.interval:
+                raise obd.exception.IntervalTimeout(response=buffer)
+            if c == '\x00': continue
+            buffer += c
+            if (buffer.endswith(str)):
+                break
+    finally:
+        if interval != self.interval:
+            self.port.timeout = self.interval
+    return buffer
+
+
+def replay(port, reads, read_fn):
+    port.rewind()
+    for string, result in reads:
+        assert read_fn(port, string) == result
+    return
+
+
+def main():
+    chunk_size = 62
+    if len(sys.argv) > 1:
+        chunk_size = int(sys.argv[1])
+
+    total_count = 0
+    total_before = total_after = 0.0
+    for session in recorded_sessions():
+        # timed-out reads (including empty ones that ran out the clock
+        # without being flagged) don't end with the awaited string
+        reads = [(s, r) for s, r, status in recorded_reads(session) if r and not status]
+        port = ReplayedPort("".join([r for s, r in reads]), chunk_size)
+        before = cpu_time(lambda: replay(port, reads, bytewise_read_until_string))
+        after = cpu_time(lambda: replay(port, reads, SerialPort.read_until_string))
+        report(session.split("/")[-1][:32], len(reads), before, after)
+        total_count += len(reads)
+        total_before += before
+        total_after += after
+    report("all sessions (chunk=%d)" % chunk_size, total_count, total_before, total_after)
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,70 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Compare the CPU cost of reading the recorded sessions as text logs
+against reading them converted to binary logs (see obd.sessionlog).
+
+Usage: python bench_session_log.py
+"""
+
+import os
+import shutil
+import tempfile
+
+from benchharness import recorded_sessions, cpu_time, report
+import obd.sessionlog
+
+def read_all(filename):
+    log = obd.sessionlog.open_log(filename)
+    try:
+        for record in log:
+            pass
+    finally:
+        log.close()
+    return
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        total_count = 0
+        total_before = total_after = 0.0
+        for session in recorded_sessions():
+            binary = obd.sessionlog.convert(session, os.path.join(directory, "session.obdlog"))
+            count = len(list(obd.sessionlog.open_log(session)))
+            before = cpu_time(lambda: read_all(session))
+            after = cpu_time(lambda: read_all(binary))
+            report(session.split("/")[-1][:32], count, before, after)
+            total_count += count
+            total_before += before
+            total_after += after
+        report("all sessions", total_count, total_before, total_after)
+    finally:
+        shutil.rmtree(directory)
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,99 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Compare the per-response CPU cost of Interface._process_obd_response(),
+which builds the BusMessages of single-frame responses directly, against
+the previous implementation, which passed every frame through the
+reassembler and the queue of complete messages, over the OBD responses
+in the recorded 11-bit CAN sessions.
+
+Usage: python bench_single_frame.py
+"""
+
+import Queue
+
+from benchharness import recorded_sessions, recorded_reads, cpu_time, report
+from testharness import ScriptedPort
+import obd.protocol
+from obd.interface.elm import ELM327
+from obd.util import debug
+
+
+def queued_process_obd_response(self, raw_frames):
+    """The previous implementation of _process_obd_response()"""
+    for frame in raw_frames:
+        self._received_obd_frame(frame)
+    self._flush_frames()
+    result = []
+    try:
+        while True:
+            bus_message = self._complete_messages.get(False)
+            result.append(bus_message)
+    except Queue.Empty as e:
+        pass
+    debug([str(r) for r in result])
+    return result
+
+
+def obd_responses(session):
+    """Return the line lists of the OBD responses in the session"""
+    responses = []
+    for string, result, status in recorded_reads(session):
+        lines = result.rstrip(">").strip("\r").split("\r")
+        if string == ">" and not status and lines[0][:3] in ("7E8", "7E9"):
+            responses.append([line.rstrip() for line in lines])
+    return responses
+
+
+def process_all(process, elm, responses, times=100):
+    for i in range(times):
+        for raw_frames in responses:
+            process(elm, raw_frames)
+    return
+
+
+def main():
+    elm = ELM327(ScriptedPort({}), "ELM327")
+    elm.vehicle_protocol = obd.protocol.ISO15765_4(id_length=11)
+    responses = []
+    for session in recorded_sessions(["iso15765_11bit"]):
+        for lines in obd_responses(session):
+            responses.append(elm._message_bytes_from_ascii(lines))
+    for raw_frames in responses:
+        assert [str(m) for m in queued_process_obd_response(elm, raw_frames)] == \
+            [str(m) for m in ELM327._process_obd_response(elm, raw_frames)]
+    single = len([r for r in responses if ELM327._single_frames(
+        [elm._parse_frame(f) for f in r])])
+
+    before = cpu_time(lambda: process_all(queued_process_obd_response, elm, responses))
+    after = cpu_time(lambda: process_all(ELM327._process_obd_response, elm, responses))
+    report("CAN11 responses (%d%% single)" % (100 * single // len(responses)),
+           100 * len(responses), before, after)
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,93 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Measure polling throughput against an emulated STN11xx, driven as a
+plain ELM327 and as an STN11XX (sending requests with STPX, after
+switching baud rate with STSBR).
+
+Usage: python bench_stn.py [requests] [baud]
+
+Both interfaces learn response counts and timing.  The emulated chip
+takes 2 ms to start on each command and begins at the given baud rate
+(default 38400), which the STN11XX raises to 500000.  The vehicle has
+two ECUs on an 11-bit CAN bus, responding after 20 and 40 ms; the
+requests (default 60) cycle through RPM, speed and the VIN, whose
+different latencies call for different timeouts.
+"""
+
+import sys
+import time
+
+from benchharness import report
+import obd.interface.elm
+import obd.protocol
+from obd.emulator import ELM327Emulator, sample_vehicle
+from obd.message import OBDRequest
+from obd.serialport import SerialPort
+
+STN_BAUD = 500000
+
+def poll(count, baud, stn):
+    """Return the wall-clock time taken to send the given number of
+    requests to a freshly connected interface"""
+    emulator = ELM327Emulator(sample_vehicle(obd.protocol.ISO15765_4(id_length=11)), baud,
+                              extended="STN1110 v4.2.0", command_time=0.002)
+    emulator.start()
+    port = SerialPort(emulator.port_name)
+    if stn:
+        interface = obd.interface.elm.create(port)
+        interface.set_baudrate(STN_BAUD)
+    else:
+        interface = obd.interface.elm.ELM327(port, "ELM327")
+    try:
+        interface.enable_response_counts()
+        interface.enable_adaptive_timing()
+        interface.connect_to_vehicle()
+        requests = [OBDRequest(sid=0x01, pid=0x0C), OBDRequest(sid=0x01, pid=0x0D),
+                    OBDRequest(sid=0x09, pid=0x02)]
+        start = time.time()
+        for i in range(count):
+            interface.send_request(requests[i % len(requests)])
+        return time.time() - start
+    finally:
+        interface.port.close()
+        emulator.stop()
+
+def main():
+    count = 60
+    baud = 38400
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        baud = int(sys.argv[2])
+    before = poll(count, baud, stn=False)
+    after = poll(count, baud, stn=True)
+    report("ELM327 -> STN11XX at %d baud" % baud, count, before, after)
+    return
+
+if __name__ == "__main__":
+    main()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
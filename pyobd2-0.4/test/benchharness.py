@@ -0,0 +1,90 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+"""Helpers for the bench_*.py microbenchmarks, which replay the
+recorded sessions used by the regression tests.  They're run by hand
+(e.g. "python bench_read_until_string.py") rather than by py.test.
+"""
+
+import sys
+import glob
+import os
+import time
+
+sys.path.append("..")
+import obd
+import obd.sessionlog
+
+protocols = ["iso9141", "iso15765_11bit", "iso15765_29bit"]
+
+def recorded_sessions(protocols=protocols):
+    """Return the list of recorded session files for the given protocols"""
+    sessions = []
+    for protocol in protocols:
+        sessions.extend(sorted(glob.glob(os.path.join(protocol, "*.txt"))))
+    return sessions
+
+def recorded_calls(filename, action):
+    """Return the parameters of each logged call of the given action
+    (e.g. "write" or "read-until") in the recorded session, in order.
+    See obd.sessionlog for the parameters of each action.
+    """
+    calls = []
+    logfile = obd.sessionlog.open_log(filename)
+    try:
+        for timestamp, log_action, parameters in logfile:
+            if log_action == action:
+                calls.append(parameters)
+    finally:
+        logfile.close()
+    return calls
+
+def recorded_reads(filename):
+    """Return a list of (string, result, status) tuples, one for each
+    read_until_string() call in the recorded session.  The status is
+    None unless the read timed out.
+    """
+    return recorded_calls(filename, "read-until")
+
+def cpu_time(fn, repeat=5):
+    """Return the smallest CPU time (in seconds) taken by fn() over
+    the given number of runs."""
+    best = None
+    for i in range(repeat):
+        start = time.clock()
+        fn()
+        elapsed = time.clock() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def report(label, count, before, after):
+    """Print a before/after comparison of the per-item cost"""
+    print "%-32s %6d items  %8.2f us -> %8.2f us per item  (%.1fx)" % \
+        (label, count, before * 1e6 / count, after * 1e6 / count,
+         before / max(after, 1e-9))
+    return
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,112 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+from testharness import ScriptedPort
+import obd.exception
+from obd.interface.elm import ELM327, AdaptiveTiming
+from obd.interface.base import Interface
+from obd.latency import LatencyStats
+from obd.message import OBDRequest
+
+_responses = {
+    "ATWS": "\r\rELM327 v1.3a\r\r>",
+    "ATE0": "OK\r\r>",
+    "ATL0": "OK\r\r>",
+    "ATH1": "OK\r\r>",
+    "ATAT0": "OK\r\r>",
+    "ATAT1": "OK\r\r>",
+    "ATST 05": "OK\r\r>",
+    "ATST 32": "OK\r\r>",
+    "ATDPN": "A6\r\r>",
+    "0100": "SEARCHING...\r7E8 06 41 00 BE 3E B8 11 \r7E9 06 41 00 80 08 00 00 \r\r>",
+    "01 0C": "7E8 04 41 0C 1A F8 \r7E9 04 41 0C 1A F8 \r\r>",
+    "01 0D": "NO DATA\r\r>",
+    }
+
+def test_latency_stats():
+    stats = LatencyStats(alpha=0.5, window=4)
+    for seconds in [0.010, 0.020, 0.030, 0.040, 0.050]:
+        stats.record("ecu", seconds)
+    assert stats.count("ecu") == 4
+    assert abs(stats.ewma("ecu") - 0.040625) < 1e-9
+    assert stats.percentile("ecu") == 0.050
+    assert stats.percentile("ecu", 0.5) == 0.040
+    stats.forget("ecu")
+    assert stats.ewma("ecu") is None and stats.percentile("ecu") is None
+    return
+
+def test_elm_timeout():
+    timing = AdaptiveTiming()
+    for i in range(AdaptiveTiming.MIN_SAMPLES - 1):
+        timing.received(0x01, set([0xE8, 0xE9]), 0.05, 0.010)
+    assert timing.elm_timeout(0x01) is None
+    timing.received(0x01, set([0xE8, 0xE9]), 0.06, 0.020)
+    # twice the slowest ECU's 95th percentile, in 4 ms units
+    assert timing.elm_timeout(0x01) == 0x0A
+    # small decreases keep the current value; increases don't
+    assert timing.elm_timeout(0x01, 0x0C) == 0x0C
+    assert timing.elm_timeout(0x01, 0x08) == 0x0A
+    assert timing.elm_timeout(0x01, 0x20) == 0x0A
+    timeout, interval = timing.host_timeout(0x01, 0x0A, 10.0, 3.0)
+    assert abs(interval - 0.18) < 1e-9
+    assert abs(timeout - (3 * 0.06 + 0.18)) < 1e-9
+    timing.forget(0x01)
+    assert timing.elm_timeout(0x01) is None
+    return
+
+def test_adaptive_timing():
+    port = ScriptedPort(dict(_responses))
+    elm = ELM327(port, "ELM327")
+    elm.enable_adaptive_timing()
+    elm.connect_to_vehicle()
+
+    # the defaults are used until the latencies are learned
+    del port.commands[:]
+    for i in range(AdaptiveTiming.MIN_SAMPLES + 2):
+        elm.send_request(OBDRequest(sid=0x01, pid=0x0C))
+    assert port.commands == ["01 0C"] * AdaptiveTiming.MIN_SAMPLES + \
+                            ["ATAT0", "ATST 05", "01 0C", "01 0C"]
+    timeout, interval = elm._request_timeout([0x01, 0x0C])
+    assert timeout < Interface.OBD_REQUEST_TIMEOUT
+    assert interval < 1.0
+
+    # an error under the learned timeout reverts to the defaults
+    try:
+        elm.send_request(OBDRequest(sid=0x01, pid=0x0D))
+    except obd.exception.DataError:
+        pass
+    del port.commands[:]
+    elm.send_request(OBDRequest(sid=0x01, pid=0x0C))
+    assert port.commands == ["ATAT1", "ATST 32", "01 0C"]
+    assert elm._request_timeout([0x01, 0x0C]) == \
+        (Interface.OBD_REQUEST_TIMEOUT, elm.OBD_REQUEST_INTERVAL)
+    return
+
+if __name__ == "__main__":
+    test_latency_stats()
+    test_elm_timeout()
+    test_adaptive_timing()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
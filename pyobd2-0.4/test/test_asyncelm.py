@@ -0,0 +1,160 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import os
+import sys
+
+import testharness
+from testharness import create_emulator, create_test_elm, protocols
+from test_serialport import write_later
+import obd.exception
+import obd.protocol
+from obd.message import OBDRequest
+
+try:
+    from obd.asyncserialport import asyncio, From, Return
+    from obd.asyncserialport import AsyncSerialPort, AsyncSerialPortPlayback
+    import obd.interface.asyncelm
+except ImportError:
+    asyncio = None
+
+def run(coroutine_fn, *args):
+    """Run the given coroutine on a new event loop and return its result"""
+    if asyncio is None:
+        import py.test
+        py.test.skip("asyncio support requires trollius")
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine_fn(loop, *args))
+    finally:
+        loop.close()
+
+def test_read_until_string():
+    def read_test(loop, port, master):
+        # leftover bytes are kept for the next read
+        os.write(master, "OK\r\r>41 00 BE 3E B8 11\r\r>")
+        port.set_timeout(1.0)
+        response = yield From(port.read_until_string(">"))
+        assert response == "OK\r\r>"
+        response = yield From(port.read_until_string(">"))
+        assert response == "41 00 BE 3E B8 11\r\r>"
+
+        # other tasks run while the read waits
+        write_later(master, "SEARCHING...\r41 00\r\r>", 0.1)
+        ticks = []
+        def tick():
+            ticks.append(loop.time())
+            loop.call_later(0.01, tick)
+        loop.call_soon(tick)
+        port.set_timeout(2.0, 1.0)
+        response = yield From(port.read_until_string(">"))
+        assert response == "SEARCHING...\r41 00\r\r>"
+        assert len(ticks) > 2
+
+        # the interval expires if nothing arrives
+        port.set_timeout(1.0, 0.1)
+        try:
+            yield From(port.read_until_string(">"))
+            assert False, "expected IntervalTimeout"
+        except obd.exception.IntervalTimeout as e:
+            assert e.response == ""
+
+    def pty_test(loop):
+        try:
+            master, slave = os.openpty()
+        except (AttributeError, OSError):
+            import py.test
+            py.test.skip("pseudo-terminals not supported on %s" % sys.platform)
+        port = AsyncSerialPort(os.ttyname(slave), loop=loop)
+        os.close(slave)
+        try:
+            yield From(read_test(loop, port, master))
+        finally:
+            port.close()
+            os.close(master)
+
+    run(pty_test)
+    return
+
+def query_readiness(loop, filename):
+    """Replay a recorded readiness session through an AsyncELM327"""
+    port = AsyncSerialPortPlayback(filename, loop=loop)
+    interface = yield From(obd.interface.asyncelm.create(port))
+    yield From(interface.open())
+    yield From(interface.set_protocol(None))
+    yield From(interface.connect_to_vehicle())
+    responses = yield From(interface.send_request(OBDRequest(sid=0x01, pid=0x01)))
+    yield From(interface.disconnect_from_vehicle())
+    yield From(interface.close())
+    raise Return(responses)
+
+def do_test(filename):
+    # the asynchronous interface should match the synchronous one
+    elm = create_test_elm(filename)
+    elm.open()
+    elm.set_protocol(None)
+    elm.connect_to_vehicle()
+    expected = elm.send_request(OBDRequest(sid=0x01, pid=0x01))
+
+    responses = run(query_readiness, filename)
+    assert [str(r) for r in responses] == [str(r) for r in expected]
+    return
+
+def test_readiness():
+    for protocol in protocols:
+        testharness._do_protocol_test(protocol, "test_readiness", do_test)
+    return
+
+def search_emulator(loop, protocol):
+    """Search for the protocol of an emulated vehicle through an
+    AsyncELM327 and request its supported PIDs"""
+    emulator = create_emulator(protocol)
+    port = AsyncSerialPort(emulator.port_name, loop=loop)
+    try:
+        interface = yield From(obd.interface.asyncelm.create(port))
+        yield From(interface.open())
+        found = yield From(interface.search_for_protocol())
+        results = yield From(interface.send_requests([OBDRequest(sid=0x01, pid=0x00),
+                                                      OBDRequest(sid=0x01, pid=0x0C)]))
+        yield From(interface.disconnect_from_vehicle())
+        yield From(interface.close())
+    finally:
+        port.close()
+        emulator.stop()
+    raise Return((found, results))
+
+def test_search_for_protocol():
+    protocol = obd.protocol.ISO15765_4(id_length=11)
+    found, results = run(search_emulator, protocol)
+    assert found == protocol
+    assert sorted(set(key[:2] for key in results)) == [(0x01, 0x00), (0x01, 0x0C)]
+    return
+
+if __name__ == "__main__":
+    test_read_until_string()
+    test_readiness()
+    test_search_for_protocol()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
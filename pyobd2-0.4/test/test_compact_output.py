@@ -0,0 +1,102 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+from testharness import ScriptedPort
+from obd.interface.elm import ELM327
+from obd.message import OBDRequest
+
+_responses = {
+    "ATWS": "\r\rELM327 v1.3a\r\r>",
+    "ATE0": "OK\r\r>",
+    "ATL0": "OK\r\r>",
+    "ATH1": "OK\r\r>",
+    "ATH0": "OK\r\r>",
+    "ATS0": "OK\r\r>",
+    "ATPC": "OK\r\r>",
+    "ATDPN": "A6\r\r>",
+    }
+
+_spaced = {
+    "0100": "SEARCHING...\r7E8 06 41 00 BE 3E B8 11 \r\r>",
+    "01 0C": "7E8 04 41 0C 1A F8 \r\r>",
+    "09 02": "7E8 10 14 49 02 01 31 44 34 \r7E8 21 47 50 30 30 52 35 35 \r"
+             "7E8 22 42 31 32 33 34 35 36 \r\r>",
+    }
+
+_compact = {
+    "0100": "SEARCHING...\r7E8064100BE3EB811\r\r>",
+    "010C": "7E804410C1AF8\r\r>",
+    }
+
+_headerless = {
+    "010C": "410C1AF8\r\r>",
+    "0902": "014\r0:490201314434\r1:47503030523535\r2:42313233343536\r\r>",
+    }
+
+def _connect(responses, compact=False, omit_headers=False):
+    port = ScriptedPort(dict(_responses, **responses))
+    elm = ELM327(port, "ELM327")
+    if compact:
+        elm.enable_compact_output(omit_headers=omit_headers)
+    elm.connect_to_vehicle()
+    return elm, port
+
+def _values(elm, requests):
+    return [str(elm.send_request(r)[0]) for r in requests]
+
+def test_compact_output():
+    requests = [OBDRequest(sid=0x01, pid=0x0C)]
+    expected = _values(_connect(_spaced)[0], requests)
+    elm, port = _connect(_compact, compact=True)
+    assert "ATS0" in port.commands and "ATH0" not in port.commands
+    assert _values(elm, requests) == expected
+    return
+
+def test_omitted_headers():
+    requests = [OBDRequest(sid=0x01, pid=0x0C), OBDRequest(sid=0x09, pid=0x02)]
+    expected = _values(_connect(_spaced)[0], requests)
+    elm, port = _connect(dict(_compact, **_headerless), compact=True, omit_headers=True)
+    assert port.commands[-1] == "ATH0"
+    responses = [elm.send_request(r)[0] for r in requests]
+    assert [str(r) for r in responses] == expected
+    assert responses[0].bus_message.header.tx_id == 0
+    # headers are turned back on for the next connection
+    elm.disconnect_from_vehicle()
+    assert port.commands[-2:] == ["ATPC", "ATH1"]
+    return
+
+def test_multiple_ecus():
+    responses = dict(_compact)
+    responses["0100"] = "7E8064100BE3EB811\r7E906410080080000\r\r>"
+    elm, port = _connect(responses, compact=True, omit_headers=True)
+    assert "ATH0" not in port.commands
+    return
+
+if __name__ == "__main__":
+    test_compact_output()
+    test_omitted_headers()
+    test_multiple_ecus()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
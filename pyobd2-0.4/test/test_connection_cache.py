@@ -0,0 +1,134 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import os
+import tempfile
+
+import testharness
+
+import obd.cache
+import obd.exception
+import obd.protocol
+from obd.cache import ConnectionCache
+from obd.interface.base import Interface
+from obd.interface.elm import ELM32X
+from obd.interface.search import FixedOrderSearch
+
+class SearchingInterface(Interface):
+    """An Interface which connects only using the given protocol,
+    logging the protocols tried"""
+    _supported_protocols = [
+        obd.protocol.VPW(),
+        obd.protocol.ISO9141_2(),
+        obd.protocol.ISO15765_4(id_length=11, baud=500000),
+        obd.protocol.ISO15765_4(id_length=29, baud=500000),
+        ]
+    def __init__(self, vehicle_protocol):
+        Interface.__init__(self, "[test]", "searching interface")
+        self.set_search_strategy(FixedOrderSearch())
+        self.target = vehicle_protocol
+        self.tried = []
+        return
+    def _protocol_search_order(self):
+        return [[p, 0.0] for p in self._supported_protocols]
+    def set_protocol(self, protocol):
+        self.vehicle_protocol = protocol
+        return
+    def get_protocol(self):
+        return self.vehicle_protocol
+    def connect_to_vehicle(self):
+        self.tried.append(self.vehicle_protocol)
+        if self.vehicle_protocol != self.target:
+            raise obd.exception.ConnectionError(raw="UNABLE TO CONNECT")
+        return self.vehicle_protocol
+
+def _temp_filename():
+    fd, filename = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    os.remove(filename)
+    return filename
+
+def test_cache_file():
+    filename = _temp_filename()
+    try:
+        cache = ConnectionCache(filename)
+        assert cache.baud("/dev/ttyUSB0") is None
+        cache.found_baud("/dev/ttyUSB0", 115200, 1.5, cached=False)
+        cache.connected("/dev/ttyUSB0", "SAE J1850 VPW (10.4 Kbaud)", 9.0, cached=False)
+        cache.connected("/dev/ttyUSB0", "ISO 9141-2", 6.0, cached=False, vin="1D4GP00R55B123456")
+
+        cache = ConnectionCache(filename)
+        assert cache.baud("/dev/ttyUSB0") == 115200
+        assert cache.protocol("/dev/ttyUSB0") == "ISO 9141-2"
+        assert cache.protocol("/dev/ttyUSB1", "1D4GP00R55B123456") == "ISO 9141-2"
+        cache.found_baud("/dev/ttyUSB0", 115200, 0.5, cached=True)
+        assert (cache.hits, cache.misses) == (1, 0)
+        assert abs(cache.time_saved - 1.0) < 1e-9
+    finally:
+        if os.path.exists(filename):
+            os.remove(filename)
+    return
+
+def test_baudrate_search_order():
+    assert ELM32X._baudrate_search_order() == ELM32X.DETECT_BAUDRATES
+    order = ELM32X._baudrate_search_order(115200)
+    assert order[0] == 115200
+    assert sorted(order) == sorted(ELM32X.DETECT_BAUDRATES)
+    return
+
+def test_cached_protocol():
+    filename = _temp_filename()
+    can = obd.protocol.ISO15765_4(id_length=29, baud=500000)
+    try:
+        obd.cache.set_connection_cache(ConnectionCache(filename))
+        interface = SearchingInterface(can)
+        assert interface.search_for_protocol() == can
+        assert len(interface.tried) == 4
+
+        # the next search tries the cached protocol first
+        interface = SearchingInterface(can)
+        assert interface.search_for_protocol() == can
+        assert interface.tried == [can]
+        cache = obd.cache.get_connection_cache()
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        # and falls back to the full search if it fails
+        vpw = obd.protocol.VPW()
+        interface = SearchingInterface(vpw)
+        assert interface.search_for_protocol() == vpw
+        assert interface.tried == [can, vpw]
+        assert ConnectionCache(filename).protocol("[test]") == str(vpw)
+    finally:
+        obd.cache.set_connection_cache(None)
+        if os.path.exists(filename):
+            os.remove(filename)
+    return
+
+if __name__ == "__main__":
+    test_cache_file()
+    test_baudrate_search_order()
+    test_cached_protocol()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,193 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import os
+import tempfile
+
+import testharness
+import obd.protocol
+import obd.message.dbc
+from obd.message.dbc import Decoder
+
+DBC = '''VERSION ""
+
+BU_: ECM TCM
+
+BO_ 201 EngineStatus: 8 ECM
+ SG_ EngineSpeed : 0|16@1+ (0.25,0) [0|16383.75] "rpm" TCM
+ SG_ CoolantTemp : 16|8@1+ (1,-40) [-40|215] "degC" TCM
+ SG_ Torque : 31|12@0- (0.5,0) [-1024|1023.5] "Nm" TCM
+ SG_ Running : 40|1@1+ (1,0) [0|1] "" TCM
+
+BO_ 2566844926 Diagnostics: 8 TCM
+ SG_ Page M : 0|8@1+ (1,0) [0|255] "" ECM
+ SG_ GearRatio m0 : 8|16@1+ (0.125,0) [0|8191.875] "" ECM
+ SG_ OilPressure m1 : 8|8@1+ (4,0) [0|1020] "kPa" ECM
+
+BO_ 264 Standard264: 8 ECM
+ SG_ Level : 0|8@1+ (1,0) [0|255] "" TCM
+
+BO_ 2147483912 Extended264: 8 TCM
+ SG_ Count : 0|8@1+ (2,0) [0|510] "" ECM
+
+CM_ SG_ 201 EngineSpeed "Crankshaft speed";
+'''
+
+def _frame(protocol, frame_id, data):
+    """Return the Frame for the given CAN ID and data"""
+    header = bytearray([(frame_id >> shift) & 0xFF for shift in (24, 16, 8, 0)])
+    return protocol.create_frame(header + bytearray(data))
+
+# EngineSpeed 0x0CB2 * 0.25, coolant 0x82 - 40, torque -0x064 * 0.5 (big
+# endian from bit 31, i.e. the top 12 bits of bytes 3-4), running
+ENGINE = [0xB2, 0x0C, 0x82, 0xF9, 0xC0, 0x01, 0x00, 0x00]
+
+def test_parse():
+    database = obd.message.dbc.parse(DBC)
+    engine = database.message(201)
+    assert engine.name == "EngineStatus" and engine.length == 8 and engine.sender == "ECM"
+    assert [s.name for s in engine.signals] == ["EngineSpeed", "CoolantTemp", "Torque", "Running"]
+    torque = engine.signals[2]
+    assert (torque.little_endian, torque.signed, torque.scale, torque.unit) == (False, True, 0.5, "Nm")
+    assert torque.shift() == 28
+    diagnostics = database.message_by_name("Diagnostics")
+    assert diagnostics.extended and diagnostics.frame_id == 0x18FEF1FE
+    assert diagnostics.multiplexer().name == "Page"
+    assert [s.multiplex_value for s in diagnostics.signals] == [None, 0, 1]
+    try:
+        obd.message.dbc.parse("BO_ 201 EngineStatus: 8 ECM\n SG_ Broken : 0|16@1+\n")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    return
+
+def test_load():
+    fd, filename = tempfile.mkstemp(suffix=".dbc")
+    try:
+        os.write(fd, DBC)
+        os.close(fd)
+        assert obd.message.dbc.load(filename).message(201).name == "EngineStatus"
+    finally:
+        os.remove(filename)
+    return
+
+def test_decode():
+    decoder = Decoder(obd.message.dbc.parse(DBC))
+    assert decoder.decode(201, bytearray(ENGINE)) == \
+        {"EngineSpeed": 812.5, "CoolantTemp": 90, "Torque": -50.0, "Running": 1}
+    assert decoder.decode(0x18FEF1FE, bytearray([0x00, 0xE8, 0x0C, 0, 0, 0, 0, 0])) == \
+        {"Page": 0, "GearRatio": 413.0}
+    assert decoder.decode(0x18FEF1FE, bytearray([0x01, 0x64, 0, 0, 0, 0, 0, 0])) == \
+        {"Page": 1, "OilPressure": 400}
+    assert decoder.decode(0x7E8, bytearray(8)) is None
+    # an 11-bit and a 29-bit ID of the same value are distinct
+    assert decoder.decode(264, bytearray([5])) == {"Level": 5}
+    assert decoder.decode(264, bytearray([5]), extended=True) == {"Count": 10}
+    return
+
+def test_decode_batch():
+    decoder = Decoder(obd.message.dbc.parse(DBC))
+    can11 = obd.protocol.ISO15765_4(id_length=11)
+    can29 = obd.protocol.ISO15765_4(id_length=29)
+    frames = [(0.0, _frame(can11, 201, ENGINE)),
+              (0.1, _frame(can11, 0x7E8, [0x03, 0x41, 0x0D, 0x32])),
+              (0.2, _frame(can29, 0x18FEF1FE, [0x00, 0xE8, 0x0C, 0, 0, 0, 0, 0])),
+              (0.3, _frame(can11, 201, [0x00, 0x00, 0x28, 0x00, 0x10, 0, 0, 0])),
+              (0.4, _frame(can29, 0x18FEF1FE, [0x01, 0x64, 0, 0, 0, 0, 0, 0])),
+              (0.5, _frame(can11, 264, [5, 0, 0, 0, 0, 0, 0, 0])),
+              (0.6, _frame(can29, 264, [5, 0, 0, 0, 0, 0, 0, 0]))]
+    columns = decoder.decode_batch(frames)
+    assert sorted(columns.keys()) == ["Diagnostics", "EngineStatus",
+                                      "Extended264", "Standard264"]
+    assert list(columns["Standard264"]["Level"]) == [5]
+    assert list(columns["Extended264"]["Count"]) == [10]
+    engine = columns["EngineStatus"]
+    assert list(engine["timestamp"]) == [0.0, 0.3]
+    assert list(engine["EngineSpeed"]) == [812.5, 0.0]
+    assert list(engine["CoolantTemp"]) == [90, 0]
+    assert list(engine["Torque"]) == [-50.0, 0.5]
+    assert list(engine["Running"]) == [1, 0]
+    diagnostics = columns["Diagnostics"]
+    assert list(diagnostics["Page"]) == [0, 1]
+    if obd.message.dbc.numpy is None:
+        assert diagnostics["GearRatio"] == [413.0, None]
+        assert diagnostics["OilPressure"] == [None, 400]
+    else:
+        numpy = obd.message.dbc.numpy
+        assert abs(diagnostics["GearRatio"][0] - 413.0) < 1e-9
+        assert numpy.isnan(diagnostics["GearRatio"][1])
+        assert numpy.isnan(diagnostics["OilPressure"][0])
+        assert diagnostics["OilPressure"][1] == 400
+    return
+
+# signals at the edges of the extraction: 64-bit, signed, big endian
+EDGES = '''VERSION ""
+
+BO_ 300 Edges: 8 ECM
+ SG_ Mux M : 0|4@1+ (1,0) [0|0] "" TCM
+ SG_ Whole : 0|64@1+ (1,0) [0|0] "" TCM
+ SG_ WholeSigned : 0|64@1- (1,0) [0|0] "" TCM
+ SG_ WholeBigSigned : 7|64@0- (0.5,3) [0|0] "" TCM
+ SG_ Small : 4|3@1- (1,0) [0|0] "" TCM
+ SG_ BigMid : 21|11@0- (0.1,-7) [0|0] "" TCM
+ SG_ LittleMid : 13|17@1- (2,1) [0|0] "" TCM
+ SG_ BigLow : 63|1@0+ (1,0) [0|0] "" TCM
+ SG_ Low m1 : 8|8@1- (1,0) [0|0] "" TCM
+ SG_ High m2 : 8|16@0+ (1,0) [0|0] "" TCM
+'''
+
+def test_decode_arrays():
+    if obd.message.dbc.numpy is None:
+        import py.test
+        py.test.skip("array decoding requires NumPy")
+    numpy = obd.message.dbc.numpy
+    decoder = Decoder(obd.message.dbc.parse(EDGES))
+    message = decoder.database.message(300)
+    samples = [0x00, 0x01, 0x7F, 0x80, 0xFE, 0xFF, 0x2F, 0xA2]
+    data = ["".join(chr(samples[(i * 5 + j * (i + 3)) % len(samples)]) for j in range(8))
+            for i in range(64)]
+    timestamps = [i * 0.01 for i in range(len(data))]
+    # the NumPy columns match the values decoded frame by frame
+    expected = decoder._decode_lists(message, timestamps, data)
+    columns = decoder._decode_arrays(message, timestamps, data)
+    assert sorted(columns.keys()) == sorted(expected.keys())
+    for name, values in expected.items():
+        for value, decoded in zip(values, columns[name]):
+            if value is None:
+                assert numpy.isnan(decoded), name
+            else:
+                assert abs(decoded - value) <= 1e-12 * max(1, abs(value)), name
+    assert not numpy.isnan(columns["Low"]).all()
+    assert not numpy.isnan(columns["High"]).all()
+    return
+
+if __name__ == "__main__":
+    test_parse()
+    test_load()
+    test_decode()
+    test_decode_batch()
+    test_decode_arrays()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,90 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import time
+
+import testharness
+from testharness import start_emulator, stop_emulator
+import obd.interface.elm
+import obd.protocol
+from obd.interface.search import ProbableFirstSearch
+from obd.message import OBDRequest
+
+def _values(interface, request):
+    return [str(r) for r in interface.send_request(request)]
+
+def test_protocols():
+    for protocol in [obd.protocol.ISO15765_4(id_length=11),
+                     obd.protocol.ISO15765_4(id_length=29),
+                     obd.protocol.ISO9141_2()]:
+        emulator, interface = start_emulator(protocol)
+        try:
+            assert interface.connect_to_vehicle() == protocol
+            assert _values(interface, OBDRequest(sid=0x01, pid=0x0C)) == ["RPM=1726 1/min"] * 2
+            assert _values(interface, OBDRequest(sid=0x09, pid=0x02)) == ["VIN=1D4GP00R55B123456"]
+        finally:
+            stop_emulator(emulator, interface)
+    return
+
+def test_search_for_protocol():
+    protocol = obd.protocol.ISO15765_4(id_length=29)
+    emulator, interface = start_emulator(protocol)
+    try:
+        interface.set_search_strategy(ProbableFirstSearch(precheck=True))
+        interface.open()
+        assert interface.search_for_protocol() == protocol
+        assert "ATMA" in emulator.commands
+        # the precheck ruled out the legacy protocols
+        assert [c for c in emulator.commands if c.startswith("ATTP")] == \
+            ["ATTP6", "ATTP6", "ATTP7"]
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+def test_response_counts():
+    emulator, interface = start_emulator(obd.protocol.ISO15765_4(id_length=11), ecu_count=1)
+    try:
+        interface.enable_response_counts()
+        interface.connect_to_vehicle()
+        request = OBDRequest(sid=0x01, pid=0x0D)
+        start = time.time()
+        interface.send_request(request)
+        unhinted = time.time() - start
+        start = time.time()
+        interface.send_request(request)
+        hinted = time.time() - start
+        # the hint spares waiting out the ELM's 200 ms timeout
+        assert emulator.commands[-1] == "010D1"
+        assert hinted < unhinted - 0.1
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+if __name__ == "__main__":
+    test_protocols()
+    test_search_for_protocol()
+    test_response_counts()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
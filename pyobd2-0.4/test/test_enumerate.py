@@ -24,9 +24,12 @@
 ########################################################################
 
 import sys
+import time
 from testharness import unexpected_error
 
 import obd
+import obd.interface.elm
+from obd.serialport import SerialPort
 
 def test_enumerate():
     try:
@@ -35,8 +38,29 @@ def test_enumerate():
         unexpected_error(e)
     return
 
+def test_parallel_probing():
+    ports = ["/dev/serial/by-id/usb-FTDI_ELM_%02d-if00-port0" % i for i in range(8)]
+    def probe_port(port, callback=None):
+        time.sleep(0.2)
+        if port.endswith("3-if00-port0"):
+            return None  # no interface on this port
+        return port
+    saved = SerialPort.ports, obd.interface.elm._probe_port
+    SerialPort.ports = ports
+    obd.interface.elm._probe_port = probe_port
+    try:
+        start = time.time()
+        interfaces = obd.interface.elm.enumerate()
+        elapsed = time.time() - start
+    finally:
+        SerialPort.ports, obd.interface.elm._probe_port = saved
+    assert interfaces == ports[:3] + ports[4:]
+    assert elapsed < 1.0
+    return
+
 if __name__ == "__main__":
     test_enumerate()
+    test_parallel_probing()
 
 # vim: softtabstop=4 shiftwidth=4 expandtab
 
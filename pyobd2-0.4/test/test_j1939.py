@@ -0,0 +1,156 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import testharness
+import obd.protocol
+import obd.message.j1939
+from obd.protocol import J1939Header, J1939Frame
+from obd.reassembly import StreamReassembler
+from obd.message.j1939 import SPN, ParameterGroup
+
+PROTOCOL = obd.protocol.SAE_J1939()
+
+def _frame(priority, pgn, source, data, destination=J1939Header.GLOBAL_ADDRESS):
+    """Return a raw J1939 frame"""
+    return J1939Header.raw_header(priority, pgn, source, destination) + bytearray(data)
+
+# EEC1 from the engine at 1000 rpm with 0% torque
+EEC1 = _frame(3, 61444, 0x00, [0xF0, 0x7D, 0x7D, 0x40, 0x1F, 0x00, 0xF0, 0x7D])
+
+# a 20-byte message of PGN 65260 (the VIN) in three packets
+VIN = bytearray("1FUJA6CK77LY12345*  ")
+def _transfer(control, source, destination):
+    """Return the raw frames sending VIN from the source to the
+    destination with the given TP.CM control byte"""
+    frames = [_frame(7, J1939Frame.TP_CM, source,
+                     [control, len(VIN), 0x00, 3, 0xFF, 0xEC, 0xFE, 0x00], destination)]
+    for sn in range(1, 4):
+        packet = VIN[(sn-1)*7:sn*7].ljust(7, "\xFF")
+        frames.append(_frame(7, J1939Frame.TP_DT, source, [sn] + list(packet), destination))
+    return frames
+
+def test_header():
+    header = PROTOCOL.create_header(EEC1)
+    assert (header.priority, header.pgn, header.tx_id, header.rx_id) == (3, 61444, 0x00, 0xFF)
+    assert str(header) == "0CF00400"
+    # PDU1 PGNs carry the destination address instead of a group extension
+    header = PROTOCOL.create_header(_frame(6, 0xEA00, 0xF9, [0xE5, 0xFE, 0x00], 0x17))
+    assert (header.priority, header.pgn, header.tx_id, header.rx_id) == (6, 0xEA00, 0xF9, 0x17)
+    assert str(header) == "18EA17F9"
+    assert StreamReassembler(PROTOCOL).timeout == 1.25
+    return
+
+def test_single_frame():
+    messages = list(obd.message.j1939.messages([(0.0, PROTOCOL.create_frame(EEC1))]))
+    assert len(messages) == 1
+    message = messages[0][1]
+    assert (message.pgn, message.source, message.group.name) == (61444, 0x00, "EEC1")
+    assert message.value(190) == 1000.0
+    assert message.value(513) == 0
+    # a parameter of 0xFF is not available
+    values = obd.message.j1939.parameter_group(65262).decode(bytearray([0x5A, 0xFF]))
+    assert values[110] == 50
+    assert values[174] is None
+    # ...as are those beyond the end of the data
+    assert values[175] is None
+    # a discrete parameter's error indicator (0b10) decodes as None
+    values = obd.message.j1939.parameter_group(65265).decode(
+        bytearray([0xFF, 0x00, 0x32, 0x12, 0xFF, 0xFF, 0xFF, 0xFF]))
+    assert values[595] is None
+    assert values[597] == 1
+    assert values[84] == 50.0
+    return
+
+def test_broadcast_transfer():
+    stream = StreamReassembler(PROTOCOL)
+    frames = _transfer(J1939Frame.BAM, 0x00, J1939Header.GLOBAL_ADDRESS)
+    assert stream.add(frames[0], 0.00) == []
+    # single frames interleaved with the packets pass straight through
+    assert len(stream.add(EEC1, 0.01)) == 1
+    assert stream.add(frames[1], 0.05) == []
+    assert stream.add(frames[2], 0.10) == []
+    messages = stream.add(frames[3], 0.15)
+    assert len(messages) == 1
+    message = messages[0]
+    assert message.data_bytes == VIN
+    # the message carries the PGN announced in its TP.CM frame
+    assert (message.header.pgn, message.header.tx_id, message.header.priority) == (65260, 0x00, 7)
+    assert not message.incomplete
+    assert (stream.completed, len(stream)) == (2, 0)
+    return
+
+def test_connection_transfer():
+    stream = StreamReassembler(PROTOCOL)
+    frames = _transfer(J1939Frame.RTS, 0x00, 0xF9)
+    # the receiver's clear to send is a message of its own
+    cts = _frame(7, J1939Frame.TP_CM, 0xF9, [0x11, 3, 1, 0xFF, 0xFF, 0xEC, 0xFE, 0x00], 0x00)
+    received = []
+    for raw_frame in [frames[0], cts] + frames[1:]:
+        received.extend(stream.add(raw_frame, 0.0))
+    assert [m.header.pgn for m in received] == [J1939Frame.TP_CM, 65260]
+    assert received[1].data_bytes == VIN
+    assert (received[1].header.tx_id, received[1].header.rx_id) == (0x00, 0xF9)
+    return
+
+def test_lost_packet():
+    frames = _transfer(J1939Frame.BAM, 0x00, J1939Header.GLOBAL_ADDRESS)
+    raw_frames = [frames[0], frames[1], frames[3]]
+    stream = [(0.1 * i, PROTOCOL.create_frame(f)) for i, f in enumerate(raw_frames)]
+    messages = list(obd.message.j1939.messages(stream))
+    assert len(messages) == 1
+    message = messages[0][1]
+    assert message.incomplete
+    assert message.pgn == 65260
+    assert message.data_bytes[:7] == list(VIN[:7])
+    assert message.data_bytes[7:14] == [None] * 7
+    # the bytes of the lost packet decode as not available
+    group = ParameterGroup(65260, "TEST", [SPN(1, "First", 1, 8), SPN(2, "Lost", 8, 8)])
+    assert group.decode(message.data_bytes) == {1: ord("1"), 2: None}
+    return
+
+def test_registry():
+    group = ParameterGroup(61444, "EEC1", [SPN(190, "Engine Speed", 4, 16, 0.125, 0, "rpm")])
+    try:
+        obd.message.j1939.register_parameter_group(group)
+        assert False, "expected an AssertionError"
+    except AssertionError as e:
+        assert "override" in str(e)
+    original = obd.message.j1939.parameter_group(61444)
+    obd.message.j1939.register_parameter_group(group, override=True)
+    try:
+        assert obd.message.j1939.parameter_group(61444) is group
+    finally:
+        obd.message.j1939.register_parameter_group(original, override=True)
+    return
+
+if __name__ == "__main__":
+    test_header()
+    test_single_frame()
+    test_broadcast_transfer()
+    test_connection_transfer()
+    test_lost_packet()
+    test_registry()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,152 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+
+import testharness
+from testharness import ScriptedPort, start_emulator, stop_emulator
+import obd.interface.elm
+import obd.protocol
+from obd.message import OBDRequest
+from obd.reassembly import StreamReassembler
+
+def _take(monitor, count):
+    """Return the next count (timestamp, frame) pairs from the monitor,
+    then stop it"""
+    frames = []
+    for timestamp, frame in monitor:
+        frames.append((timestamp, frame))
+        if len(frames) == count:
+            break
+    monitor.close()
+    return frames
+
+def test_monitor():
+    emulator, interface = start_emulator(connect=True)
+    try:
+        frames = _take(interface.monitor(duration=5), 6)
+        assert [f.header.tx_id for t, f in frames] == [0, 1] * 3
+        timestamps = [t for t, f in frames]
+        assert timestamps == sorted(timestamps)
+        stream = StreamReassembler(interface.vehicle_protocol)
+        messages = []
+        for timestamp, frame in frames:
+            messages.extend(stream.add(frame.raw_bytes, timestamp))
+        assert [str(m) for m in messages[:2]] == \
+            ["000007E8: 41 00 BE 3E B8 11", "000007E9: 41 00 BE 3E B8 11"]
+        # the interface is back to answering requests
+        assert len(interface.send_request(OBDRequest(sid=0x01, pid=0x0D))) == 2
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+def test_receive_address():
+    emulator, interface = start_emulator(connect=True)
+    try:
+        frames = _take(interface.monitor(receive_address=0x7E9, duration=5), 3)
+        assert [f.header.tx_id for t, f in frames] == [1] * 3
+        assert "ATCRA7E9" in emulator.commands
+        assert emulator.commands[-1] == "ATCRA"
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+def test_buffer_full():
+    emulator, interface = start_emulator(connect=True)
+    try:
+        emulator.monitor_limit = 3
+        frames = _take(interface.monitor(duration=5), 8)
+        assert len(frames) == 8
+        assert interface.monitor_overruns == 2
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+def test_duration():
+    emulator, interface = start_emulator(obd.protocol.ISO9141_2(), connect=True)
+    try:
+        # no traffic shown on legacy buses
+        assert list(interface.monitor(duration=0.3)) == []
+        assert len(interface.send_request(OBDRequest(sid=0x01, pid=0x0D))) == 2
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+class ChunkedPort(ScriptedPort):
+    """A ScriptedPort which receives the next of the given chunks
+    before each read, counting the reads and timeouts set"""
+    def __init__(self, responses):
+        ScriptedPort.__init__(self, responses)
+        self.chunks = []
+        self.reads = 0
+        self.timeouts = 0
+        return
+    def read_until_string(self, str, last=False):
+        self.reads += 1
+        if self.chunks:
+            self.pending += self.chunks.pop(0)
+        return ScriptedPort.read_until_string(self, str, last)
+    def set_timeout(self, timeout, interval=None):
+        self.timeouts += 1
+        return
+
+_responses = {
+    "ATWS": "\r\rELM327 v1.3a\r\r>",
+    "ATE0": "OK\r\r>",
+    "ATL0": "OK\r\r>",
+    "ATH0": "OK\r\r>",
+    "ATH1": "OK\r\r>",
+    "ATDPN": "A6\r\r>",
+    "ATMA": "",
+    "": "\r>",
+    "0100": "7E8 06 41 00 BE 3E B8 11 \r\r>",
+    }
+
+def test_bulk_read():
+    port = ChunkedPort(_responses)
+    interface = obd.interface.elm.ELM327(port, "ELM327")
+    interface.connect_to_vehicle()
+    port.chunks = ["7E8 06 41 00 BE 3E B8 11\r7E9 06 41 00 BE",
+                   " 3E B8 11\r7E8 03 41 0D 32\r"]
+    port.reads = port.timeouts = 0
+    frames = _take(interface.monitor(duration=5), 3)
+    assert [f.header.tx_id for t, f in frames] == [0, 1, 0]
+    # the line split across reads is joined, and each read takes
+    # every complete line
+    assert frames[1][1].raw_bytes[4:] == frames[0][1].raw_bytes[4:]
+    assert frames[1][0] == frames[2][0]
+    # two reads while monitoring, and one to stop; the monitor's
+    # timeout is set just once (and then the AT timeout, to stop)
+    assert port.reads == 3
+    assert port.timeouts == 2
+    return
+
+if __name__ == "__main__":
+    test_monitor()
+    test_receive_address()
+    test_buffer_full()
+    test_duration()
+    test_bulk_read()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
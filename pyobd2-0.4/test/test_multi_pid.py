@@ -0,0 +1,102 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import testharness
+from testharness import convert_ascii_to_bytes
+import obd.exception
+import obd.protocol
+from obd.interface.base import Interface
+from obd.message import OBDRequest
+
+def create_test_interface():
+    """Return a bare Interface reassembling ISO 15765-4 (11-bit) frames"""
+    interface = Interface("[test]", "test interface")
+    interface.vehicle_protocol = obd.protocol.ISO15765_4(id_length=11)
+    return interface
+
+def receive(request, frames):
+    """Return the OBD responses to the request, given the ASCII frames
+    (with 11-bit CAN headers) received in response"""
+    interface = create_test_interface()
+    raw_frames = [convert_ascii_to_bytes("00000" + f) for f in frames]
+    return interface._return_obd_responses(raw_frames, request)
+
+def test_single_frame():
+    request = OBDRequest(sid=0x01, pid=[0x0C, 0x0D])
+    responses = receive(request, ["7E8 06 41 0C 1A F8 0D 32"])
+    assert [r.pid for r in responses] == [0x0C, 0x0D]
+    assert responses[0].values[0].value == 1726.0
+    assert responses[1].values[0].value == 0x32
+    return
+
+def test_multiple_frames_and_ecus():
+    # the second ECU supports only one of the PIDs, and the fuel trim
+    # PIDs might be one or two bytes long
+    request = OBDRequest(sid=0x01, pid=[0x04, 0x06, 0x0C, 0x0D, 0x05, 0x07])
+    responses = receive(request, ["7E8 10 0F 41 04 33 06 80 0C",
+                                  "7E9 04 41 0C 1A F8 00 00",
+                                  "7E8 21 1A F8 0D 32 05 5A 07",
+                                  "7E8 22 81 82 00 00 00 00 00"])
+    pids = [(r.bus_message.header.tx_id, r.pid) for r in responses]
+    assert sorted(pids) == [(0, 0x04), (0, 0x05), (0, 0x06), (0, 0x07),
+                            (0, 0x0C), (0, 0x0D), (1, 0x0C)]
+    for r in responses:
+        if r.pid == 0x06:
+            assert r.data_bytes == bytearray([0x80])
+        if r.pid == 0x07:
+            assert r.data_bytes == bytearray([0x81, 0x82])
+    return
+
+def test_unsplittable_response():
+    request = OBDRequest(sid=0x01, pid=[0x0C, 0x0D])
+    try:
+        receive(request, ["7E8 06 41 0C 1A F8 11 32"])
+        assert False, "expected DataError"
+    except obd.exception.DataError:
+        pass
+    return
+
+def test_request_limits():
+    try:
+        OBDRequest(sid=0x01, pid=range(1, 8))
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    request = OBDRequest(sid=0x01, pid=[0x0C, 0x0D])
+    assert request.message(obd.protocol.ISO15765_4(id_length=29)) == [0x01, 0x0C, 0x0D]
+    try:
+        request.message(obd.protocol.ISO9141_2())
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    return
+
+if __name__ == "__main__":
+    test_single_frame()
+    test_multiple_frames_and_ecus()
+    test_unsplittable_response()
+    test_request_limits()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,78 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+from testharness import ScriptedPort
+import obd.exception
+from obd.interface.elm import ELM327, _ERROR_SCANNER
+
+_errors = [
+    ("7E8 04 41 0C 1A F8 \r7E9 04 41 0C 1A F8 ", None),
+    ("7E8064100BE3EB811", None),
+    ("?", "unsupported"),
+    ("NO DATA", "no_data"),
+    ("NODATA", "no_data"),
+    ("7E8 03 41 0D FF \rNO DATA", "no_data"),
+    ("SEARCHING...\rBUS BUSY", "data_error"),
+    ("7E8 03 41 0D <DATA ERROR", "frame_error"),
+    ("BUS ERROR", "bus_error"),
+    ("FBERROR", "bus_error"),
+    ("LV RESET", "bus_error"),
+    ("CAN ERROR", "protocol_error"),
+    ("<RX ERROR", "protocol_error"),
+    ("7E8 10 14 49 02 01 31 44 34 \rBUFFER FULL", "buffer_full"),
+    ("ERR94", "elm_error"),
+    ("BUS INIT: ...ERR71", "elm_error"),
+    ]
+
+def test_error_scanner():
+    for response, error in _errors:
+        matched = _ERROR_SCANNER.search(response)
+        if error is None:
+            assert matched is None, response
+        else:
+            assert matched.lastgroup == error, response
+    return
+
+def test_parse_response():
+    elm = ELM327(ScriptedPort({}), "ELM327")
+    assert elm._parse_response("\r\r7E8 03 41 0D FF \r7E9 03 41 0D FF \r\r") == \
+        ["7E8 03 41 0D FF ", "7E9 03 41 0D FF "]
+    try:
+        elm._parse_response("7E8 03 41 0D FF \rNO DATA\r")
+        assert False, "expected DataError"
+    except obd.exception.DataError as e:
+        assert "NO DATA" in str(e)
+    try:
+        elm._parse_response("?")
+        assert False, "expected CommandNotSupported"
+    except obd.exception.CommandNotSupported:
+        pass
+    return
+
+if __name__ == "__main__":
+    test_error_scanner()
+    test_parse_response()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,66 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import testharness
+from testharness import ScriptedPort
+
+import obd.protocol
+from obd.interface.elm import ELM327
+
+_responses = {
+    "ATWS": "\r\rELM327 v1.3a\r\r>",
+    "ATE0": "OK\r\r>",
+    "ATL0": "OK\r\r>",
+    "ATH1": "OK\r\r>",
+    "ATTP": "OK\r\r>",
+    "ATPC": "OK\r\r>",
+    "ATDPN": "A6\r\r>",
+    "0100": "7E8 06 41 00 BE 3E B8 11 \r\r>",
+    }
+
+def test_protocol_cache():
+    port = ScriptedPort(_responses)
+    elm = ELM327(port, "ELM327")
+    protocol = elm.connect_to_vehicle()
+    assert protocol == obd.protocol.ISO15765_4(id_length=11, baud=500000)
+    assert elm.get_protocol() == protocol
+    # the cached protocol can't be changed through the copies returned
+    elm.get_protocol().baud = 250000
+    assert elm.get_protocol() == protocol
+    assert port.commands.count("ATDPN") == 1
+    assert (elm.protocol_hits, elm.protocol_misses) == (3, 1)
+
+    # changing the protocol (or ending the session) invalidates the cache
+    elm.set_protocol(protocol)
+    elm.connect_to_vehicle()
+    assert elm.get_protocol() == protocol
+    assert port.commands.count("ATDPN") == 2
+    assert (elm.protocol_hits, elm.protocol_misses) == (4, 2)
+    return
+
+if __name__ == "__main__":
+    test_protocol_cache()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,143 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import testharness
+import obd.protocol
+from obd.reassembly import StreamReassembler
+
+PROTOCOL = obd.protocol.ISO15765_4(id_length=11)
+
+def _frame(ecu, data):
+    """Return a raw 11-bit CAN frame (with the header padded to 32
+    bits, as the ELM interfaces do) from the ECU at 0x7E8 + ecu"""
+    return bytearray([0x00, 0x00, 0x07, 0xE8 + ecu]) + bytearray(data)
+
+# a VIN response in a first frame and two consecutive frames
+VIN = [[0x10, 0x14, 0x49, 0x02, 0x01, 0x31, 0x44, 0x34],
+       [0x21, 0x47, 0x50, 0x30, 0x30, 0x52, 0x35, 0x35],
+       [0x22, 0x42, 0x31, 0x32, 0x33, 0x34, 0x35, 0x36]]
+VIN_DATA = bytearray([0x49, 0x02, 0x01]) + bytearray("1D4GP00R55B123456")
+
+def test_default_timeouts():
+    assert StreamReassembler(PROTOCOL).timeout == 0.15
+    assert StreamReassembler(obd.protocol.ISO9141_2()).timeout == 0.1
+    return
+
+def test_interleaved():
+    stream = StreamReassembler(PROTOCOL)
+    assert stream.add(_frame(0, VIN[0]), 0.000) == []
+    assert stream.add(_frame(1, [0x03, 0x41, 0x0D, 0x32]), 0.001)[0].data_bytes == \
+        bytearray([0x41, 0x0D, 0x32])
+    assert stream.add(_frame(0, VIN[1]), 0.002) == []
+    assert len(stream) == 1
+    messages = stream.add(_frame(0, VIN[2]), 0.003)
+    assert [m.data_bytes for m in messages] == [VIN_DATA]
+    assert messages[0].header.tx_id == 0
+    assert len(stream) == 0
+    assert (stream.completed, stream.expired) == (2, 0)
+    return
+
+def test_expiry():
+    stream = StreamReassembler(PROTOCOL)
+    stream.add(_frame(0, VIN[0]), 1.0)
+    stream.add(_frame(0, VIN[1]), 1.1)
+    # still within the timeout of the last frame
+    assert stream.expire(1.2) == []
+    # the last frame never arrives; the next frame sees it expire
+    messages = stream.add(_frame(1, [0x02, 0x41, 0x00]), 1.3)
+    assert len(messages) == 2
+    assert messages[0].incomplete
+    assert messages[1].data_bytes == bytearray([0x41, 0x00])
+    assert (stream.completed, stream.expired, len(stream)) == (1, 1, 0)
+    return
+
+def test_restarted_sequence():
+    stream = StreamReassembler(PROTOCOL)
+    stream.add(_frame(0, VIN[0]), 0.0)
+    # a new first frame abandons the partial message
+    messages = stream.add(_frame(0, VIN[0]), 0.01)
+    assert len(messages) == 1 and messages[0].incomplete
+    stream.add(_frame(0, VIN[1]), 0.02)
+    assert [m.data_bytes for m in stream.add(_frame(0, VIN[2]), 0.03)] == [VIN_DATA]
+    return
+
+def test_bounded():
+    stream = StreamReassembler(PROTOCOL, max_pending=4)
+    for ecu in range(8):
+        messages = stream.add(_frame(ecu, VIN[0]), ecu * 0.001)
+        assert len(stream) <= 4
+    assert stream.expired == 4
+    # an endless stream of single frames holds no state
+    for i in range(10000):
+        stream.add(_frame(i % 8, [0x03, 0x41, 0x0C, i & 0xFF]), 1.0 + i * 0.0002)
+    assert len(stream) == 0
+    assert stream.completed == 10000
+    return
+
+def test_flush():
+    stream = StreamReassembler(PROTOCOL)
+    stream.add(_frame(0, VIN[0]))
+    stream.add(_frame(1, VIN[0]))
+    # untimed frames never expire on their own
+    assert stream.expire(1e9) == []
+    assert len(stream.flush()) == 2
+    assert len(stream) == 0
+
+    # nor do they hold up the expiry of timed ones behind them
+    stream.add(_frame(0, VIN[0]))
+    stream.add(_frame(1, VIN[0]), 1.0)
+    messages = stream.expire(2.0)
+    assert len(messages) == 1 and messages[0].header.tx_id == 1
+    assert len(stream) == 1
+    return
+
+def test_single_frame_responses():
+    from testharness import ScriptedPort
+    from obd.interface.elm import ELM327
+    elm = ELM327(ScriptedPort({}), "ELM327")
+    elm.vehicle_protocol = PROTOCOL
+    # single frames from two ECUs are complete messages as received
+    messages = elm._process_obd_response([_frame(0, [0x03, 0x41, 0x0D, 0x32]),
+                                          _frame(1, [0x03, 0x41, 0x0D, 0x33])])
+    assert [(m.header.tx_id, m.data_bytes) for m in messages] == \
+        [(0, bytearray([0x41, 0x0D, 0x32])), (1, bytearray([0x41, 0x0D, 0x33]))]
+    assert elm._reassembler.completed == 0
+    # a multi-frame message alongside them is still reassembled
+    messages = elm._process_obd_response([_frame(1, [0x02, 0x41, 0x00])] +
+                                         [_frame(0, data) for data in VIN])
+    assert [m.data_bytes for m in messages] == [bytearray([0x41, 0x00]), VIN_DATA]
+    assert elm._reassembler.completed == 2
+    return
+
+if __name__ == "__main__":
+    test_default_timeouts()
+    test_interleaved()
+    test_expiry()
+    test_restarted_sequence()
+    test_bounded()
+    test_flush()
+    test_single_frame_responses()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
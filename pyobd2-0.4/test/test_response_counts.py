@@ -0,0 +1,80 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+from testharness import ScriptedPort
+import obd.exception
+from obd.interface.elm import ELM327
+from obd.message import OBDRequest
+
+_responses = {
+    "ATWS": "\r\rELM327 v1.3a\r\r>",
+    "ATE0": "OK\r\r>",
+    "ATL0": "OK\r\r>",
+    "ATH1": "OK\r\r>",
+    "ATDPN": "A6\r\r>",
+    "0100": "SEARCHING...\r7E8 06 41 00 BE 3E B8 11 \r7E9 06 41 00 80 08 00 00 \r\r>",
+    "01 00": "7E8 06 41 00 BE 3E B8 11 \r7E9 06 41 00 80 08 00 00 \r\r>",
+    "01 0C": "7E8 04 41 0C 1A F8 \r7E9 04 41 0C 1A F8 \r\r>",
+    "01 0D": "NO DATA\r\r>",
+    }
+
+def test_response_counts():
+    port = ScriptedPort(dict(_responses))
+    elm = ELM327(port, "ELM327")
+    elm.enable_response_counts()
+    elm.response_counts.VERIFY_INTERVAL = 2
+    elm.connect_to_vehicle()
+
+    # the connection teaches the count for 0100
+    del port.commands[:]
+    elm.send_request(OBDRequest(sid=0x01, pid=0x00))
+    # other requests are first sent without a hint
+    for i in range(4):
+        elm.send_request(OBDRequest(sid=0x01, pid=0x0C))
+    # hints are dropped after an error
+    try:
+        elm.send_request(OBDRequest(sid=0x01, pid=0x0D))
+    except obd.exception.DataError:
+        pass
+    assert port.commands == ["01 00 2", "01 0C", "01 0C 2", "01 0C 2",
+                             "01 0C", "01 0D"]
+    assert elm.response_counts.hinted == 3
+    assert elm.response_counts.verified == 1
+    assert elm.response_counts.mismatches == 0
+
+    # a wrong count is relearned without the hint
+    port.responses["01 0C"] = "7E8 04 41 0C 1A F8 \r\r>"
+    del port.commands[:]
+    for i in range(3):
+        responses = elm.send_request(OBDRequest(sid=0x01, pid=0x0C))
+        assert len(responses) == 1
+    assert port.commands == ["01 0C 2", "01 0C", "01 0C 1"]
+    assert elm.response_counts.mismatches == 1
+    return
+
+if __name__ == "__main__":
+    test_response_counts()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,139 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import testharness
+from testharness import ScriptedPort
+
+import obd.exception
+import obd.interface.search
+import obd.protocol
+from obd.interface.elm import ELM327
+from obd.interface.search import FixedOrderSearch, ProbableFirstSearch
+
+_can_11bit = obd.protocol.ISO15765_4(id_length=11, baud=500000)
+
+_responses = {
+    "ATWS": "\r\rELM327 v1.3a\r\r>",
+    "ATE0": "OK\r\r>",
+    "ATL0": "OK\r\r>",
+    "ATH1": "OK\r\r>",
+    "ATTP": "OK\r\r>",
+    "ATPC": "OK\r\r>",
+    "ATDPN": "A6\r\r>",
+    "ATRV": "12.4V\r\r>",
+    "ATMA": "7DF 02 01 0D 00 00 00 00 00 \r",
+    "": "\r>",
+    "0100": "7E8 06 41 00 BE 3E B8 11 \r\r>",
+    }
+
+def _open(responses={}, strategy=None):
+    port = ScriptedPort(dict(_responses, **responses))
+    elm = ELM327(port, "ELM327")
+    elm.set_search_strategy(strategy or ProbableFirstSearch(precheck=True))
+    elm.open()
+    return elm, port
+
+def test_search_order():
+    elm, port = _open()
+    default_order = elm._protocol_search_order()
+    assert FixedOrderSearch().order(default_order) == default_order
+
+    strategy = ProbableFirstSearch()
+    order = [p for p, delay in strategy.order(default_order)]
+    assert order[0] == _can_11bit
+    assert order[-1] == obd.protocol.PWM()
+
+    # protocols that have connected before are tried first
+    strategy.connected(obd.protocol.VPW())
+    order = [p for p, delay in strategy.order(default_order)]
+    assert order[:2] == [obd.protocol.VPW(), _can_11bit]
+    return
+
+def test_can_traffic():
+    strategy = ProbableFirstSearch(precheck=True)
+    elm, port = _open(strategy=strategy)
+    assert elm.search_for_protocol() == _can_11bit
+    assert "ATMA" in port.commands
+    assert strategy.successes == {str(_can_11bit): 1}
+
+    # only the CAN protocols are tried once traffic is heard
+    order = elm._precheck_protocols(elm._protocol_search_order())
+    assert len(order) == 4
+    for protocol, delay in order:
+        assert isinstance(protocol, obd.protocol.ISO15765_4)
+    return
+
+def test_no_can_traffic():
+    elm, port = _open({"ATMA": ""})
+    search_order = elm._protocol_search_order()
+    assert elm._precheck_protocols(search_order) == search_order
+
+    # ELM327s predating ATRV skip the voltage check
+    elm, port = _open({"ATRV": "?\r\r>"})
+    assert len(elm._precheck_protocols(search_order)) == 4
+    return
+
+def test_no_vehicle():
+    elm, port = _open({"ATRV": "0.3V\r\r>"})
+    try:
+        elm.search_for_protocol()
+        assert False, "expected ConnectionError"
+    except obd.exception.ConnectionError:
+        pass
+    assert "ATTP 6" not in port.commands
+    return
+
+def test_default_strategy():
+    # without a strategy, no precheck, and each interface keeps its own
+    # successes
+    elm, port = _open()
+    elm.set_search_strategy(None)
+    assert elm.search_for_protocol() == _can_11bit
+    assert "ATMA" not in port.commands
+    other, port = _open()
+    other.set_search_strategy(None)
+    assert elm._get_search_strategy().successes == {str(_can_11bit): 1}
+    assert other._get_search_strategy().successes == {}
+
+    # unless a shared default strategy is installed
+    shared = ProbableFirstSearch()
+    obd.interface.search.default_strategy = shared
+    try:
+        elm, port = _open()
+        elm.set_search_strategy(None)
+        elm.search_for_protocol()
+        assert shared.successes == {str(_can_11bit): 1}
+    finally:
+        obd.interface.search.default_strategy = None
+    return
+
+if __name__ == "__main__":
+    test_search_order()
+    test_can_traffic()
+    test_no_can_traffic()
+    test_no_vehicle()
+    test_default_strategy()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,127 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import testharness
+from testharness import convert_ascii_to_bytes
+import obd.exception
+import obd.protocol
+from obd.interface.base import Interface
+from obd.message import OBDRequest, RawRequest
+
+# The data returned by each ECU for each Service $01 PID
+_ecu_data = {
+    0x7E8: {0x00: "BE 3E B8 11", 0x04: "33", 0x05: "5A", 0x0C: "1A F8",
+            0x0D: "32", 0x10: "01 F4", 0x42: "36 B0"},
+    0x7E9: {0x00: "80 08 00 00", 0x0C: "1A F8"},
+    }
+
+class FakeInterface(Interface):
+    """An Interface answering Service $01 requests from _ecu_data,
+    logging each message sent"""
+    def __init__(self, protocol):
+        Interface.__init__(self, "[test]", "fake interface")
+        self.interface_configured = True
+        self.connected_to_vehicle = True
+        self.vehicle_protocol = protocol
+        self.sent = []
+        return
+    def _send_obd_message(self, message, header=None, token=None):
+        self.sent.append(message)
+        frames = []
+        for ecu, data in sorted(_ecu_data.items()):
+            response = "41"
+            for pid in message[1:]:
+                if pid in data:
+                    response += " %02X %s" % (pid, data[pid])
+            if response != "41":
+                header = [0, 0, ecu >> 8, ecu & 0xFF]
+                frames.extend([header + f for f in
+                               segment(convert_ascii_to_bytes(response))])
+        return frames
+
+def segment(data):
+    """Split the data into ISO 15765-2 frames (without padding)"""
+    if len(data) <= 7:
+        return [[len(data)] + data]
+    frames = [[0x10, len(data)] + data[:6]]
+    for i, pos in enumerate(range(6, len(data), 7)):
+        frames.append([0x20 + ((i + 1) & 0x0F)] + data[pos:pos+7])
+    return frames
+
+def test_batching():
+    interface = FakeInterface(obd.protocol.ISO15765_4(id_length=11))
+    pids = [0x04, 0x05, 0x0C, 0x10, 0x0D, 0x10, 0x00, 0x42]
+    requests = [OBDRequest(sid=0x01, pid=pid) for pid in pids]
+    results = interface.send_requests(requests)
+
+    # duplicates dropped, PID-supported PIDs kept apart, 6 PIDs at most
+    assert interface.sent == [[0x01, 0x04, 0x05, 0x0C, 0x10, 0x0D, 0x42],
+                              [0x01, 0x00]]
+    assert sorted(results.keys()) == [(1, 0x00, 0), (1, 0x00, 1),
+                                      (1, 0x04, 0), (1, 0x05, 0),
+                                      (1, 0x0C, 0), (1, 0x0C, 1),
+                                      (1, 0x0D, 0), (1, 0x10, 0),
+                                      (1, 0x42, 0)]
+    assert results[(1, 0x0C, 1)].values[0].value == 1726.0
+    return
+
+def test_request_values():
+    interface = FakeInterface(obd.protocol.ISO15765_4(id_length=11))
+    values = interface.request_values(0x01, [0x0C, 0x0D, 0x11])
+    # one value per PID, from the first ECU; PID $11 is unsupported
+    assert values == {0x0C: 1726.0, 0x0D: 50}
+    assert interface.sent == [[0x01, 0x0C, 0x0D, 0x11]]
+    return
+
+def test_legacy_protocol():
+    interface = FakeInterface(obd.protocol.ISO15765_4(id_length=11))
+    interface.vehicle_protocol = obd.protocol.ISO9141_2()
+    requests = [OBDRequest(sid=0x01, pid=0x0C), OBDRequest(sid=0x01, pid=0x0D),
+                OBDRequest(sid=0x01, pid=0x0C), RawRequest([0x01, 0x05])]
+    assert [r.message(interface.vehicle_protocol)
+            for r in interface._plan_requests(requests)] == \
+        [[0x01, 0x0C], [0x01, 0x0D], [0x01, 0x05]]
+    return
+
+def test_raw_frames_data_error():
+    interface = FakeInterface(obd.protocol.ISO15765_4(id_length=11))
+    frames = [bytearray([0, 0, 0x07, 0xE8, 0x03, 0x41, 0x0D, 0x32])]
+    assert interface._return_raw_frames(frames) == frames
+    # a frame with a byte lost in transmission
+    frames.append([0, 0, 0x07, 0xE9, 0x03, 0x41, None, 0x32])
+    try:
+        interface._return_raw_frames(frames)
+        assert False, "expected DataError"
+    except obd.exception.DataError as e:
+        assert repr(frames[1]) in str(e)
+    return
+
+if __name__ == "__main__":
+    test_batching()
+    test_request_values()
+    test_legacy_protocol()
+    test_raw_frames_data_error()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,197 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import os
+import sys
+import time
+import threading
+
+import testharness
+import obd.exception
+from obd.serialport import SerialPort, RingBuffer
+
+def create_pty_port(reader_thread=False):
+    """Return a SerialPort attached to a new pseudo-terminal, along with
+    the file descriptor of the pty's other end"""
+    try:
+        master, slave = os.openpty()
+    except (AttributeError, OSError):
+        import py.test
+        py.test.skip("pseudo-terminals not supported on %s" % sys.platform)
+    port = SerialPort(os.ttyname(slave), reader_thread=reader_thread)
+    os.close(slave)
+    return port, master
+
+def write_later(fd, data, delay):
+    """Write the given data to the file descriptor after a delay"""
+    timer = threading.Timer(delay, os.write, (fd, data))
+    timer.start()
+    return timer
+
+def test_ring_buffer():
+    ring = RingBuffer(8)
+    ring.extend("abcdef")
+    assert ring.take(4) == "abcd"
+    ring.extend("ghij")  # wraps around the end of the storage
+    assert len(ring) == 6
+    assert ring.find("fg") == 1
+    ring.extend("klm")  # overflows, dropping "ef"
+    assert ring.overruns == 1
+    assert ring.take() == "fghijklm"
+    assert len(ring) == 0
+    return
+
+def test_port_sort_key():
+    names = ["/dev/ttyUSB10", "/dev/ttyACM0", "/dev/ttyUSB2", "/dev/ttyUSB1"]
+    assert sorted(names, key=SerialPort._port_sort_key) == \
+        ["/dev/ttyACM0", "/dev/ttyUSB1", "/dev/ttyUSB2", "/dev/ttyUSB10"]
+    return
+
+def _do_read_test(reader_thread):
+    port, master = create_pty_port(reader_thread)
+    try:
+        # leftover bytes are kept for the next read
+        os.write(master, "OK\r\r>41 00 BE 3E B8 11\r\r>")
+        port.set_timeout(1.0)
+        assert port.read_until_string(">") == "OK\r\r>"
+        assert port.read_until_string(">") == "41 00 BE 3E B8 11\r\r>"
+
+        # the read returns as soon as the awaited string arrives
+        write_later(master, "SEARCHING...\r", 0.05)
+        write_later(master, "41 00 BE 3E B8 11\r\r>", 0.15)
+        port.set_timeout(2.0, 1.0)
+        start = time.time()
+        assert port.read_until_string("") == "S"
+        assert port.read_until_string(">") == "EARCHING...\r41 00 BE 3E B8 11\r\r>"
+        assert time.time() - start < 1.0
+
+        # the interval expires if nothing arrives
+        port.set_timeout(1.0, 0.1)
+        try:
+            port.read_until_string(">")
+            assert False, "expected IntervalTimeout"
+        except obd.exception.IntervalTimeout as e:
+            assert e.response == ""
+
+        # the timeout expires if the awaited string never arrives
+        os.write(master, "NO DATA")
+        port.set_timeout(0.2, 0.5)
+        try:
+            port.read_until_string(">")
+            assert False, "expected ReadTimeout"
+        except obd.exception.ReadTimeout as e:
+            assert e.response == "NO DATA"
+    finally:
+        port.close()
+        os.close(master)
+    return
+
+def test_read_until_string():
+    _do_read_test(reader_thread=False)
+    return
+
+def test_reader_thread():
+    _do_read_test(reader_thread=True)
+    return
+
+class InterruptedSerial(object):
+    """Wraps a pyserial port, holding the read of the given stale data
+    until told to finish, and reporting the data as waiting (or, if not
+    waiting, as arriving during the read)"""
+    def __init__(self, port, data, waiting=True):
+        self._port = port
+        self._data = data
+        self._waiting = waiting
+        self.reading = threading.Event()
+        self.finish = threading.Event()
+        self.finished = threading.Event()
+        return
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+    def inWaiting(self):
+        if self._data is None:
+            return self._port.inWaiting()
+        if not self._waiting:
+            return 0
+        return len(self._data)
+    def read(self, size=1):
+        if self._data is None:
+            return self._port.read(size)
+        self.reading.set()
+        self.finish.wait(5)
+        data, self._data = self._data, None
+        self.finished.set()
+        return data
+
+def test_clear_during_read():
+    port, master = create_pty_port(reader_thread=True)
+    try:
+        serial = InterruptedSerial(port.port, "41 00 BE 3E B8 11\r\r>")
+        port.port = serial
+        assert serial.reading.wait(5)
+        # the bytes the reader already took from the port are stale
+        port.clear_rx_buffer()
+        serial.finish.set()
+        os.write(master, "OK\r\r>")
+        port.set_timeout(1.0)
+        assert port.read_until_string(">") == "OK\r\r>"
+    finally:
+        port.close()
+        os.close(master)
+    return
+
+def test_clear_after_read():
+    port, master = create_pty_port(reader_thread=True)
+    try:
+        serial = InterruptedSerial(port.port, ">", waiting=False)
+        port.port = serial
+        assert serial.reading.wait(5)
+        # the reader reads a late byte of the last reply, but the clear
+        # gets the buffer first
+        port._rx_condition.acquire()
+        try:
+            serial.finish.set()
+            assert serial.finished.wait(5)
+            time.sleep(0.05)  # until the reader waits for the buffer
+            port.clear_rx_buffer()
+        finally:
+            port._rx_condition.release()
+        os.write(master, "OK\r\r>")
+        port.set_timeout(1.0)
+        assert port.read_until_string(">") == "OK\r\r>"
+    finally:
+        port.close()
+        os.close(master)
+    return
+
+if __name__ == "__main__":
+    test_ring_buffer()
+    test_port_sort_key()
+    test_read_until_string()
+    test_reader_thread()
+    test_clear_during_read()
+    test_clear_after_read()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,155 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import os
+import shutil
+import tempfile
+
+import testharness
+import obd.sessionlog
+from obd.sessionlog import SessionIndex
+from obd.serialport import SerialPortPlayback
+
+RECORDING = "iso15765_11bit/test_sids_139_ecusim_can11.txt"
+
+def _copies(directory):
+    """Return the names of a text and a binary copy of the recording"""
+    text_filename = os.path.join(directory, "can11.txt")
+    shutil.copy(RECORDING, text_filename)
+    binary_filename = obd.sessionlog.convert(text_filename,
+                                             os.path.join(directory, "can11.obdlog"))
+    return [text_filename, binary_filename]
+
+def test_request_keys():
+    assert SessionIndex.request_keys("01 00\r") == ["0100"]
+    assert SessionIndex.request_keys("01 0C 0D 1\r") == ["010C", "010D"]
+    assert SessionIndex.request_keys("03\r") == ["03"]
+    assert SessionIndex.request_keys("09 02 5\r") == ["0902"]
+    assert SessionIndex.request_keys("ATZ\r") == []
+    assert SessionIndex.request_keys("\r") == []
+    return
+
+def test_build_index():
+    directory = tempfile.mkdtemp()
+    try:
+        for filename in _copies(directory):
+            index = SessionIndex.build(filename, every=8)
+            log = obd.sessionlog.open_log(filename)
+            records = list(log.records())
+            assert [c[1] for c in index.checkpoints] == [o for o, r in records[::8]]
+            for offset in index.postings["0100"]:
+                timestamp, action, parameters = log.records(offset).next()[1]
+                assert action == "write"
+                assert SessionIndex.request_keys(parameters[0]) == ["0100"]
+            log.close()
+
+            index.save(filename + obd.sessionlog.INDEX_EXTENSION)
+            loaded = SessionIndex.load(filename + obd.sessionlog.INDEX_EXTENSION)
+            assert loaded.checkpoints == index.checkpoints
+            assert loaded.postings == index.postings
+    finally:
+        shutil.rmtree(directory)
+    return
+
+def test_records_between():
+    directory = tempfile.mkdtemp()
+    try:
+        for filename in _copies(directory):
+            log = obd.sessionlog.open_log(filename)
+            records = list(log)
+            log.close()
+            start = records[len(records) // 2][0]
+            end = records[-3][0]
+            expected = [r for r in records if start <= r[0] < end]
+            assert len(expected) > 0
+            assert obd.sessionlog.records_between(filename, start, end) == expected
+            # the first call saved a sidecar index for the later ones
+            assert os.path.exists(filename + obd.sessionlog.INDEX_EXTENSION)
+    finally:
+        shutil.rmtree(directory)
+    return
+
+def test_exchanges():
+    directory = tempfile.mkdtemp()
+    try:
+        for filename in _copies(directory):
+            exchanges = obd.sessionlog.exchanges(filename, 0x01, 0x00)
+            assert len(exchanges) > 0
+            for request, responses in exchanges:
+                assert request[1] == "write"
+                assert SessionIndex.request_keys(request[2][0]) == ["0100"]
+                assert "write" not in [r[1] for r in responses]
+                reads = [r[2][1] for r in responses if r[1] == "read-until"]
+                assert "41 00" in "".join(reads).replace("4100", "41 00")
+            assert obd.sessionlog.exchanges(filename, 0x01, 0x7F) == []
+    finally:
+        shutil.rmtree(directory)
+    return
+
+def test_indexed_writer():
+    directory = tempfile.mkdtemp()
+    try:
+        for filename in _copies(directory)[:1]:
+            log = obd.sessionlog.open_log(filename)
+            for extension in [".txt", obd.sessionlog.BINARY_EXTENSION]:
+                copy = os.path.join(directory, "copy" + extension)
+                writer = obd.sessionlog.create_log(copy, log.port_name, SessionIndex(every=8))
+                for timestamp, action, parameters in log:
+                    writer.log(action, *parameters)
+                writer.close()
+                saved = SessionIndex.load(copy + obd.sessionlog.INDEX_EXTENSION)
+                built = SessionIndex.build(copy, every=8)
+                assert [c[1] for c in saved.checkpoints] == [c[1] for c in built.checkpoints]
+                assert saved.postings == built.postings
+            log.close()
+    finally:
+        shutil.rmtree(directory)
+    return
+
+def test_playback_start_time():
+    directory = tempfile.mkdtemp()
+    try:
+        for filename in _copies(directory):
+            log = obd.sessionlog.open_log(filename)
+            records = list(log)
+            log.close()
+            start = records[-10][0]
+            port = SerialPortPlayback(filename, start_time=start)
+            timestamp, parameters = port.next_log(records[-10][1])
+            assert (timestamp, parameters) == records[-10][0::2]
+            port.logfile.close()
+    finally:
+        shutil.rmtree(directory)
+    return
+
+if __name__ == "__main__":
+    test_request_keys()
+    test_build_index()
+    test_records_between()
+    test_exchanges()
+    test_indexed_writer()
+    test_playback_start_time()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,107 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import os
+import glob
+import shutil
+import tempfile
+
+import testharness
+import obd.interface.elm
+import obd.sessionlog
+from obd.message import OBDRequest
+from obd.serialport import SerialPortPlayback
+
+def _recordings():
+    return sorted(glob.glob(os.path.join("*", "*.txt")))
+
+def test_convert():
+    directory = tempfile.mkdtemp()
+    try:
+        for text_filename in _recordings():
+            binary_filename = os.path.join(directory, "session.obdlog")
+            obd.sessionlog.convert(text_filename, binary_filename)
+            text_log = obd.sessionlog.open_log(text_filename)
+            binary_log = obd.sessionlog.open_log(binary_filename)
+            assert binary_log.port_name == text_log.port_name
+            text_records = list(text_log)
+            binary_records = list(binary_log)
+            assert len(binary_records) == len(text_records) > 0
+            for text_record, binary_record in zip(text_records, binary_records):
+                assert binary_record[1:] == text_record[1:]
+                assert abs(binary_record[0] - text_record[0]) < 1e-6
+            text_log.close()
+            binary_log.close()
+    finally:
+        shutil.rmtree(directory)
+    return
+
+def test_binary_playback():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = obd.sessionlog.convert("iso15765_11bit/test_sids_139_ecusim_can11.txt",
+                                          os.path.join(directory, "can11.obdlog"))
+        port = SerialPortPlayback(filename)
+        interface = obd.interface.elm.create(port)
+        interface.open()
+        interface.set_protocol(None)
+        interface.connect_to_vehicle()
+        responses = interface.send_request(OBDRequest(sid=0x01, pid=0x00))
+        assert len(responses) == 3
+        port.close()
+        assert port.logfile.logfile.closed
+    finally:
+        shutil.rmtree(directory)
+    return
+
+def test_buffered_writes():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, "buffered.obdlog")
+        writer = obd.sessionlog.BinaryLogWriter(filename, "/dev/ttyUSB0",
+                                                buffer_size=100, flush_interval=3600)
+        header_size = os.path.getsize(filename)
+        writer.log("write", "01 0C\r")
+        assert os.path.getsize(filename) == header_size  # still buffered
+        writer.log("read-until", ">", "7E8 04 41 0C 1A F8 \r" * 4 + "\r>", None)
+        assert os.path.getsize(filename) > header_size  # past buffer_size
+        writer.log("set-timeout", 9.9, 3.0)
+        writer.close()
+
+        reader = obd.sessionlog.BinaryLogReader(filename)
+        records = [record[1:] for record in reader]
+        assert records[-1] == ("set-timeout", (9.9, 3.0))
+        assert len(records) == 3
+        reader.close()
+    finally:
+        shutil.rmtree(directory)
+    return
+
+if __name__ == "__main__":
+    test_convert()
+    test_binary_playback()
+    test_buffered_writes()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
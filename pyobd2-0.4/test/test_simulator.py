@@ -0,0 +1,79 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import time
+
+import testharness
+import obd.interface.elm
+from obd.message import OBDRequest
+from obd.serialport import SerialPortSimulator
+
+RECORDING = "iso15765_11bit/test_sids_139_ecusim_can11.txt"
+
+def _values(interface, sid, pid):
+    return [str(r) for r in interface.send_request(OBDRequest(sid=sid, pid=pid))]
+
+def test_any_order():
+    port = SerialPortSimulator(RECORDING)
+    interface = obd.interface.elm.create(port)
+    interface.connect_to_vehicle()
+    # in the reverse of the recorded order, and repeatedly
+    for i in range(3):
+        assert _values(interface, 0x01, 0x0D) == ["VSS=0 km/h (0 mph)"] * 3
+        assert _values(interface, 0x01, 0x05) == ["ECT=-40 deg C (-40 deg F)"] * 2
+    # unrecorded requests aren't answered
+    try:
+        interface.send_request(OBDRequest(sid=0x01, pid=0x5C))
+        assert False, "expected DataError"
+    except obd.exception.DataError:
+        pass
+    return
+
+def test_cycling():
+    port = SerialPortSimulator(RECORDING)
+    port.write("0100\r")
+    first = port.read_until_string(">")
+    port.write("01 00 3\r")  # hints are ignored
+    second = port.read_until_string(">")
+    port.write("0100\r")
+    assert first != second
+    assert port.read_until_string(">") == first
+    return
+
+def test_time_scale():
+    port = SerialPortSimulator(RECORDING, time_scale=0.5)
+    start = time.time()
+    port.write("0100\r")  # took 1.36 s when recorded
+    port.read_until_string(">")
+    elapsed = time.time() - start
+    assert 0.6 < elapsed < 0.8
+    return
+
+if __name__ == "__main__":
+    test_any_order()
+    test_cycling()
+    test_time_scale()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
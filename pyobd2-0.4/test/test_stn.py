@@ -0,0 +1,98 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+
+import testharness
+from testharness import start_emulator, stop_emulator
+import obd.interface.elm
+import obd.protocol
+from obd.message import OBDRequest
+
+def test_chip_identifier():
+    assert obd.interface.elm._chip_identifier("ELM327 v1.3a", "STN1110 v4.2.0") == "STN1110"
+    assert obd.interface.elm._chip_identifier("ELM327 v1.5", "?") == "ELM327"
+    return
+
+def test_stpx_requests():
+    emulator, interface = start_emulator(extended="STN1110 v4.2.0")
+    try:
+        assert isinstance(interface, obd.interface.elm.STN11XX)
+        interface.enable_response_counts()
+        interface.enable_adaptive_timing()
+        interface.connect_to_vehicle()
+        del emulator.commands[:]
+        requests = [OBDRequest(sid=0x01, pid=0x0C), OBDRequest(sid=0x09, pid=0x02)]
+        for i in range(12):
+            responses = interface.send_request(requests[i % 2])
+        assert [str(r) for r in responses] == ["VIN=1D4GP00R55B123456"]
+        # the timing and counts went along with the requests
+        assert [c for c in emulator.commands if not c.startswith("STPX")] == []
+        assert emulator.commands[0] == "STPXD:010C"
+        assert emulator.commands[-1].startswith("STPXD:0902,T:")
+        assert emulator.commands[-1].endswith(",R:3")  # one ECU, three frames
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+def test_set_baudrate():
+    emulator, interface = start_emulator(baud=38400, extended="STN1110 v4.2.0")
+    try:
+        interface.set_baudrate(115200)
+        assert emulator.baud == 115200
+        assert interface.port.get_baudrate() == 115200
+        interface.connect_to_vehicle()
+        assert [str(r) for r in interface.send_request(OBDRequest(sid=0x01, pid=0x0D))] == \
+            ["VSS=50 km/h (31 mph)"] * 2
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+def test_set_baudrate_failed():
+    emulator, interface = start_emulator(baud=38400, extended="STN1110 v4.2.0")
+    try:
+        # the interface switches, but its output is garbled at the new rate
+        emulator.output_limit = 57600
+        try:
+            interface.set_baudrate(115200)
+            assert False, "expected InterfaceError"
+        except obd.interface.elm.InterfaceError as e:
+            assert str(e).endswith("now at 38400")
+        assert "STSBR38400" in emulator.commands
+        assert emulator.baud == 38400
+        assert interface.port.get_baudrate() == 38400
+        interface.connect_to_vehicle()
+        assert [str(r) for r in interface.send_request(OBDRequest(sid=0x01, pid=0x0D))] == \
+            ["VSS=50 km/h (31 mph)"] * 2
+    finally:
+        stop_emulator(emulator, interface)
+    return
+
+if __name__ == "__main__":
+    test_chip_identifier()
+    test_stpx_requests()
+    test_set_baudrate()
+    test_set_baudrate_failed()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
@@ -0,0 +1,124 @@
+#!/usr/bin/env python -3
+########################################################################
+# pyOBD-II -- a Python library for communicating with OBD-II vehicles
+# Copyright (C) 2009 Peter J. Creath
+#
+# This file is part of pyOBD-II ("pyobd2").
+#
+# You can redistribute pyOBD-II and/or modify it under the terms of
+# the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option)
+# any later version.
+#
+# To negotiate alternative licensing terms, please contact the author.
+# See the LICENSE.txt file at the top of the source tree for further
+# information.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyOBD-II.  If not, see <http://www.gnu.org/licenses/>.
+########################################################################
+
+import socket
+import threading
+
+import testharness
+import obd.exception
+import obd.interface.elm
+from obd.serialport import SerialPort, SocketSerial
+
+class StandInServer(object):
+    """A local TCP server standing in for a WiFi ELM327, answering each
+    command from a dict of responses ("?" for anything else)"""
+    def __init__(self, responses):
+        self.responses = responses
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.address = "tcp://127.0.0.1:%d" % self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        return
+    def _serve(self):
+        connection, address = self.listener.accept()
+        pending = ""
+        while True:
+            data = connection.recv(1024)
+            if not data: break
+            pending += data
+            while "\r" in pending:
+                command, pending = pending.split("\r", 1)
+                connection.sendall(self.responses.get(command, "?\r\r>"))
+        connection.close()
+        return
+    def close(self):
+        self.listener.close()
+        return
+
+_responses = {
+    "ATI": "ELM327 v1.5\r\r>",
+    "ATWS": "\r\rELM327 v1.5\r\r>",
+    "ATE0": "OK\r\r>",
+    "ATL0": "OK\r\r>",
+    "ATH1": "OK\r\r>",
+    "ATRV": "12.6V\r\r>",
+    "BULK": "41 00 BE 3E B8 11\r" * 400 + "\r>",
+    }
+
+def test_parse_address():
+    assert SocketSerial.parse_address("tcp://192.168.0.10") == ("192.168.0.10", 35000, 10)
+    assert SocketSerial.parse_address("tcp://elm.local:23?keepalive=0") == ("elm.local", 23, 0)
+    try:
+        SocketSerial.parse_address("tcp://:35000")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    return
+
+def _do_elm_test(reader_thread):
+    server = StandInServer(_responses)
+    port = SerialPort(server.address, reader_thread=reader_thread)
+    try:
+        sock = port.port.socket
+        assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+
+        elm = obd.interface.elm.create(port)
+        assert elm.name == "ELM327"
+        elm.open()
+        assert elm.at_cmd("ATRV") == "12.6V"
+
+        # responses spanning many packets arrive intact
+        assert elm.at_cmd("BULK").count("41 00 BE 3E B8 11") == 400
+
+        # the interval expires if nothing arrives
+        port.set_timeout(1.0, 0.1)
+        try:
+            port.read_until_string(">")
+            assert False, "expected IntervalTimeout"
+        except obd.exception.IntervalTimeout as e:
+            assert e.response == ""
+    finally:
+        port.close()
+        server.close()
+    return
+
+def test_tcp_port():
+    _do_elm_test(reader_thread=False)
+    return
+
+def test_tcp_reader_thread():
+    _do_elm_test(reader_thread=True)
+    return
+
+if __name__ == "__main__":
+    test_parse_address()
+    test_tcp_port()
+    test_tcp_reader_thread()
+
+# vim: softtabstop=4 shiftwidth=4 expandtab
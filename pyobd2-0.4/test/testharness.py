@@ -31,7 +31,10 @@ from optparse import OptionParser
 
 sys.path.append("..")
 import obd
-from obd.serialport import SerialPortPlayback, SerialPortRecorder
+import obd.exception
+import obd.interface.elm
+import obd.protocol
+from obd.serialport import SerialPort, SerialPortPlayback, SerialPortRecorder
 
 verbose = False
 
@@ -81,6 +84,63 @@ def _create_test_port(filename, mimic_timing):
 
     return serial_port
 
+class ScriptedPort(SerialPort):
+    """A SerialPort answering each command from a dict of responses
+    (ignoring any response count hint), logging the commands written"""
+    def __init__(self, responses):
+        self.name = "[scripted]"
+        self.responses = responses
+        self.commands = []
+        self.pending = ""
+        return
+    def write(self, str):
+        command = str.rstrip("\r")
+        self.commands.append(command)
+        words = command.split(" ")
+        if len(words) > 1 and len(words[-1]) == 1:
+            command = " ".join(words[:-1])  # drop the hint
+        self.pending = self.responses[command]
+        return
+    def read_until_string(self, str, last=False):
+        end = self._find_string(self.pending, str, 0, last)
+        if not end:
+            raise obd.exception.ReadTimeout(response=self.pending)
+        result, self.pending = self.pending[:end], self.pending[end:]
+        return result
+    def set_timeout(self, timeout, interval=None):
+        return
+
+def create_emulator(protocol=obd.protocol.ISO15765_4(id_length=11), baud=115200,
+                    extended=None, **options):
+    """Start and return an ELM327Emulator of a sample vehicle using the
+    given protocol (see obd.emulator.sample_vehicle() for the options),
+    skipping the test if pseudo-terminals aren't supported"""
+    try:
+        from obd.emulator import ELM327Emulator, sample_vehicle
+        emulator = ELM327Emulator(sample_vehicle(protocol, **options),
+                                  baud=baud, extended=extended)
+    except (AttributeError, ImportError, OSError):
+        import py.test
+        py.test.skip("pseudo-terminals not supported on %s" % sys.platform)
+    emulator.start()
+    return emulator
+
+def start_emulator(protocol=obd.protocol.ISO15765_4(id_length=11), connect=False, **options):
+    """Start an ELM327Emulator (see create_emulator()) and return it
+    along with an interface attached to it, connected to the vehicle
+    if requested"""
+    emulator = create_emulator(protocol, **options)
+    interface = obd.interface.elm.create(SerialPort(emulator.port_name))
+    if connect:
+        interface.connect_to_vehicle()
+    return emulator, interface
+
+def stop_emulator(emulator, interface):
+    """Close the interface's port and stop the emulator"""
+    interface.port.close()
+    emulator.stop()
+    return
+
 def _get_caller_module_name(offset=0):
     caller = traceback.extract_stack(limit=2+offset)[0]
     filename = caller[0]